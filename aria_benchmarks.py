@@ -0,0 +1,1329 @@
+"""
+ARIA Benchmarks
+Microbenchmarks and regression harnesses for the ARIA voice assistant
+
+Usage:
+    python aria_benchmarks.py router
+    python aria_benchmarks.py recognizers --fixtures path/to/wavs --backends sphinx http
+    python aria_benchmarks.py serve-recognizer --fixtures path/to/wavs
+    python aria_benchmarks.py commands --corpus benchmarks/corpus.jsonl --baseline baseline.json
+    python aria_benchmarks.py weather --delay-ms 80
+    python aria_benchmarks.py math --cases 2000
+    python aria_benchmarks.py store --contacts 100000 --years 5
+    python aria_benchmarks.py contacts --contacts 100000
+    python aria_benchmarks.py wake --fixtures path/to/wavs --engines sphinx vosk
+    python aria_benchmarks.py vad --fixtures path/to/wavs
+    python aria_benchmarks.py server --concurrency 1 4 16 64
+    python aria_benchmarks.py history --days 180 --turns-per-day 300
+    python aria_benchmarks.py semantic --corpus benchmarks/paraphrases.jsonl benchmarks/corpus.jsonl
+    python aria_benchmarks.py plugins --counts 0 50 200
+    python aria_benchmarks.py reminders --counts 1000 10000 50000
+    python aria_benchmarks.py replay --archives sessions/*.zip --baseline replay-baseline.json
+    python aria_benchmarks.py noise --fixtures path/to/noisy-wavs
+"""
+
+import io
+import os
+import sys
+import asyncio
+import math
+import json
+import time
+import wave
+import random
+import datetime
+import hashlib
+import argparse
+import bisect
+import subprocess
+import tempfile
+import threading
+import tracemalloc
+from array import array
+from urllib.parse import parse_qs, urlparse
+from collections import Counter
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+from aria_voice_assistant import (
+    AriaAssistant, AriaServer, ContactResolver, ConversationLog, DataStore, SemanticRouter, FrameCapture, IntentRouter, RECOGNIZER_BACKENDS, WAKE_WORD_SPOTTERS,
+    EnergyVAD, NoiseFloorEstimator, REPLAYED_STAGES, ReminderScheduler, SessionRecorder, SimulatedClock, WeatherClient, compile_spoken_math,
+    create_recognizer_backend, create_vad, create_wake_word_spotter, evaluate_math, frame_rms, load_utterances,
+    percentile, print_headless_report, print_replay_report, reminder_times, requests, sr, tokenize,
+)
+
+
+def _random_word(rng: random.Random, length: int = 6) -> str:
+    """Build a pronounceable-ish random word"""
+    consonants = "bcdfghjklmnprstvwz"
+    vowels = "aeiou"
+    return "".join(rng.choice(consonants if i % 2 == 0 else vowels) for i in range(length))
+
+
+def _legacy_route(commands: Dict[str, List[str]], text: str) -> str:
+    """The substring scan process_command used before the router"""
+    for intent, keywords in commands.items():
+        if any(word in text for word in keywords):
+            return intent
+    return ""
+
+
+def bench_router(args):
+    """Per-utterance routing cost as the keyword set grows"""
+    rng = random.Random(args.seed)
+    vocabulary = [_random_word(rng, rng.randint(4, 9)) for _ in range(20000)]
+    utterances = [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(3, 12)))
+                  for _ in range(args.utterances)]
+
+    print(f"{'phrases':>8} {'build ms':>10} {'router us':>10} {'legacy us':>10}")
+    for size in args.sizes:
+        commands: Dict[str, List[str]] = {}
+        for i in range(size):
+            phrase = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3)))
+            commands.setdefault(f"Intent {i % 50}", []).append(phrase)
+
+        start = time.perf_counter()
+        router = IntentRouter(commands)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for text in utterances:
+            router.rank(text)
+        router_us = (time.perf_counter() - start) / len(utterances) * 1e6
+
+        start = time.perf_counter()
+        for text in utterances:
+            _legacy_route(commands, text)
+        legacy_us = (time.perf_counter() - start) / len(utterances) * 1e6
+
+        print(f"{size:>8} {build_ms:>10.2f} {router_us:>10.2f} {legacy_us:>10.2f}")
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level Levenshtein distance divided by reference length"""
+    ref = reference.lower().split()
+    hyp = hypothesis.lower().split()
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / max(1, len(ref))
+
+
+def load_wav_fixtures(folder: str) -> List[Dict]:
+    """Read name.wav files with optional name.txt reference transcripts"""
+    fixtures = []
+    for wav_path in sorted(Path(folder).glob("*.wav")):
+        reference_path = wav_path.with_suffix(".txt")
+        fixtures.append({
+            "name": wav_path.stem,
+            "path": wav_path,
+            "reference": reference_path.read_text().strip() if reference_path.exists() else "",
+        })
+    if not fixtures:
+        raise SystemExit(f"No .wav fixtures found in {folder}")
+    return fixtures
+
+
+def _pcm_fingerprint(wav_bytes: bytes) -> str:
+    """Hash the PCM frames of a WAV file, ignoring header differences"""
+    with wave.open(io.BytesIO(wav_bytes), "rb") as wav:
+        return hashlib.sha1(wav.readframes(wav.getnframes())).hexdigest()
+
+
+def serve_recognizer(args):
+    """Local stand-in for a recognition service, answering from fixture transcripts"""
+    transcripts = {}
+    if args.fixtures:
+        for fixture in load_wav_fixtures(args.fixtures):
+            transcripts[_pcm_fingerprint(fixture["path"].read_bytes())] = fixture["reference"]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                text = transcripts.get(_pcm_fingerprint(body), args.default_text)
+            except (wave.Error, EOFError):
+                self.send_error(400, "expected WAV audio")
+                return
+            time.sleep(args.delay_ms / 1000)
+            payload = json.dumps({"text": text}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *log_args):
+            pass
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"Stand-in recognizer on http://{args.host}:{args.port}/recognize ({len(transcripts)} transcripts)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def bench_recognizers(args):
+    """Latency and word error rate of each backend over the same WAV fixtures"""
+    fixtures = load_wav_fixtures(args.fixtures)
+    recognizer = sr.Recognizer()
+    clips = []
+    for fixture in fixtures:
+        with sr.AudioFile(str(fixture["path"])) as source:
+            clips.append((fixture, recognizer.record(source)))
+
+    config = {
+        "language": "en-US",
+        "listen_timeout": 30,
+        "recognizer_url": args.url,
+        "vosk_model_path": args.vosk_model,
+        "whisper_model": args.whisper_model,
+    }
+    print(f"{'backend':<10} {'warm s':>7} {'p50 ms':>8} {'p95 ms':>8} {'WER':>6} {'errors':>7}")
+    for name in args.backends:
+        backend = create_recognizer_backend(name, recognizer, config)
+        started = time.perf_counter()
+        try:
+            backend.warm_up()
+        except Exception as e:
+            print(f"{name:<10} unavailable: {e}")
+            continue
+        warm = time.perf_counter() - started
+
+        latencies, errors, word_errors = [], 0, []
+        for fixture, audio in clips:
+            started = time.perf_counter()
+            try:
+                text = backend.recognize(audio)
+            except Exception:
+                text = ""
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+            if fixture["reference"]:
+                word_errors.append(word_error_rate(fixture["reference"], text))
+
+        wer = sum(word_errors) / len(word_errors) if word_errors else float("nan")
+        print(f"{name:<10} {warm:>7.2f} {percentile(latencies, 50):>8.0f} "
+              f"{percentile(latencies, 95):>8.0f} {wer:>6.2f} {errors:>7}")
+
+
+def bench_commands(args):
+    """Replay a text corpus through process_command and check for latency regressions"""
+    corpus = list(load_utterances(args.corpus)) * args.repeat
+    assistant = AriaAssistant(headless=True)
+    # Cold path: every repeat goes through routing and its handler. This is what the regression gate checks;
+    # with the response cache on, most repeats would only time a dict lookup
+    response_cache, assistant.response_cache = assistant.response_cache, None
+    report = assistant.run_headless(corpus, quiet=True)
+    print_headless_report(report)
+
+    assistant.response_cache = response_cache
+    if response_cache is not None:
+        cached = assistant.run_headless(corpus, quiet=True)
+        report["cached"] = {"intents": cached["intents"], "response_cache": cached["response_cache"]}
+        print(f"\nWith the response cache ({cached['response_cache']['hits']} hits of {len(corpus)} commands)")
+        print(f"{'intent':<14} {'cold p95 ms':>12} {'cached p50 ms':>14} {'cached p95 ms':>14}")
+        for intent, stats in cached["intents"].items():
+            cold = report["intents"].get(intent, {}).get("p95_ms", float("nan"))
+            print(f"{intent:<14} {cold:>12.3f} {stats['p50_ms']:>14.3f} {stats['p95_ms']:>14.3f}")
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(report, indent=2))
+        print(f"Saved report to {args.save}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if "cached" not in baseline:
+            print("Baseline predates cold-path measurement (its numbers include cache hits); re-save it with --save")
+        regressions = []
+        for intent, stats in report["intents"].items():
+            previous = baseline["intents"].get(intent)
+            if previous and stats["p95_ms"] > previous["p95_ms"] * (1 + args.tolerance) + args.slack_ms:
+                regressions.append(f"{intent}: p95 {previous['p95_ms']:.3f} -> {stats['p95_ms']:.3f} ms")
+        if baseline.get("intent_accuracy") and (report["intent_accuracy"] or 0) < baseline["intent_accuracy"]:
+            regressions.append(f"intent accuracy {baseline['intent_accuracy']:.1%} -> {report['intent_accuracy']:.1%}")
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+        print("No regressions against baseline")
+
+
+def start_weather_stub(delay_ms: float) -> ThreadingHTTPServer:
+    """Local stand-in for the OpenWeatherMap current-weather endpoint"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            city = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+            time.sleep(delay_ms / 1000)
+            if city.lower() == "atlantis":
+                status, body = 404, {"cod": "404", "message": "city not found"}
+            else:
+                status, body = 200, {"weather": [{"description": "scattered clouds"}],
+                                     "main": {"temp": 20 + len(city), "humidity": 60}}
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *log_args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_weather(args):
+    """Pooled, cached weather client against a local stand-in server"""
+    server = start_weather_stub(args.delay_ms)
+    url = f"http://127.0.0.1:{server.server_port}/data/2.5/weather"
+    cities = ["Jakarta", "Tokyo", "Bandung", "Paris"]
+
+    # Connection reuse: fresh requests.get per call vs a pooled session
+    started = time.perf_counter()
+    for i in range(args.calls):
+        requests.get(url, params={"q": cities[i % len(cities)]}, timeout=5)
+    fresh_ms = (time.perf_counter() - started) / args.calls * 1000
+    session = requests.Session()
+    started = time.perf_counter()
+    for i in range(args.calls):
+        session.get(url, params={"q": cities[i % len(cities)]}, timeout=5)
+    pooled_ms = (time.perf_counter() - started) / args.calls * 1000
+    print(f"uncached request: fresh connection {fresh_ms:.1f} ms, pooled {pooled_ms:.1f} ms")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache_path = Path(cache_dir) / "weather.json"
+        client = WeatherClient("stub-key", url, cache_path, ttl=args.ttl, stale_ttl=60)
+        timings = {"cold": [], "warm": [], "stale": []}
+        for phase in ("cold", "warm"):
+            for city in cities:
+                started = time.perf_counter()
+                client.get(city)
+                timings[phase].append((time.perf_counter() - started) * 1000)
+        time.sleep(args.ttl + 0.05)
+        for city in cities:
+            started = time.perf_counter()
+            client.get(city)
+            timings["stale"].append((time.perf_counter() - started) * 1000)
+        assert client.get("Atlantis") is None
+
+        restarted = WeatherClient("stub-key", url, cache_path, ttl=60)
+        started = time.perf_counter()
+        restarted.get("Jakarta")
+        restart_ms = (time.perf_counter() - started) * 1000
+
+        for phase, values in timings.items():
+            print(f"{phase:<6} lookups: p50 {percentile(values, 50):.2f} ms")
+        print(f"after restart (persisted cache): {restart_ms:.2f} ms")
+        while client._refreshing:
+            time.sleep(0.01)
+        upstream = [value * 1000 for value in client.upstream_latencies]
+        print(f"hit rate {client.hit_rate:.0%} ({client.hits} fresh, {client.stale_hits} stale, "
+              f"{client.misses} misses), upstream p50 {percentile(upstream, 50):.1f} ms")
+    server.shutdown()
+
+
+_ONES = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+         "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen"]
+_TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+
+
+def number_to_words(value: int) -> str:
+    """Spell out 0 <= value < 1,000,000 the way a speech recognizer might"""
+    if value < 20:
+        return _ONES[value]
+    if value < 100:
+        return _TENS[value // 10] + ("" if value % 10 == 0 else " " + _ONES[value % 10])
+    if value < 1000:
+        rest = value % 100
+        return _ONES[value // 100] + " hundred" + ("" if rest == 0 else " and " + number_to_words(rest))
+    rest = value % 1000
+    return number_to_words(value // 1000) + " thousand" + ("" if rest == 0 else " " + number_to_words(rest))
+
+
+def _legacy_calculate(expression: str):
+    """The str.replace + eval calculator, kept here for comparison"""
+    expression = expression.replace('calculate', '').replace('what is', '').replace('what\'s', '').strip()
+    replacements = {
+        'plus': '+', 'add': '+', 'and': '+',
+        'minus': '-', 'subtract': '-', 'take away': '-',
+        'times': '*', 'multiply': '*', 'multiplied by': '*', 'x': '*',
+        'divided by': '/', 'divide': '/', 'over': '/',
+        'squared': '**2', 'cubed': '**3',
+        'to the power of': '**', 'power': '**'
+    }
+    for word, symbol in replacements.items():
+        expression = expression.replace(word, symbol)
+    expression = ' '.join(expression.split())
+    if not all(c in set('0123456789+-*/.() ') for c in expression):
+        raise ValueError("unsupported characters")
+    return eval(expression)
+
+
+def _random_spoken_math(rng: random.Random):
+    """A random spoken expression and its expected value"""
+    operators = [("plus", lambda a, b: a + b), ("minus", lambda a, b: a - b),
+                 ("times", lambda a, b: a * b), ("divided by", lambda a, b: a / b)]
+    left, right = rng.randint(0, 99999), rng.randint(1, 999)
+    word, apply = rng.choice(operators)
+    spell = number_to_words if rng.random() < 0.5 else str
+    return f"what is {spell(left)} {word} {spell(right)}", apply(left, right)
+
+
+def bench_math(args):
+    """Fuzz the spoken-math engine and compare its speed with the legacy eval path"""
+    rng = random.Random(args.seed)
+    cases = [_random_spoken_math(rng) for _ in range(args.cases)]
+
+    results = {"engine": 0, "legacy": 0}
+    for text, expected in cases:
+        for name, evaluate in (("engine", lambda t: evaluate_math(compile_spoken_math(t))),
+                               ("legacy", _legacy_calculate)):
+            try:
+                results[name] += abs(evaluate(text) - expected) < 1e-9 * max(1, abs(expected))
+            except Exception:
+                pass
+    for name, correct in results.items():
+        print(f"{name:<7} correct on {correct}/{len(cases)} fuzz cases ({correct / len(cases):.1%})")
+
+    # Stay within the memo size so the second pass measures cache hits
+    texts = [text for text, _ in cases][:compile_spoken_math.cache_info().maxsize]
+    compile_spoken_math.cache_clear()
+    timings = {}
+    for label, evaluate in (("engine (cold)", lambda t: evaluate_math(compile_spoken_math(t))),
+                            ("engine (memoized)", lambda t: evaluate_math(compile_spoken_math(t))),
+                            ("legacy", _legacy_calculate)):
+        started = time.perf_counter()
+        for text in texts:
+            try:
+                evaluate(text)
+            except Exception:
+                pass
+        timings[label] = (time.perf_counter() - started) / len(texts) * 1e6
+    for label, micros in timings.items():
+        print(f"{label:<18} {micros:>8.1f} us/expression")
+
+    # Pathological inputs must fail fast instead of hanging
+    for text in ("9 to the power of 99999999", "ten to the power of ten to the power of ten",
+                 "one thousand factorial", "two squared squared squared squared squared squared squared squared squared"):
+        started = time.perf_counter()
+        try:
+            evaluate_math(compile_spoken_math(text))
+            outcome = "evaluated"
+        except Exception as e:
+            outcome = type(e).__name__
+        print(f"{(time.perf_counter() - started) * 1e6:>8.1f} us  {outcome:<16} {text}")
+
+
+def _timed(fn, repeat: int = 1) -> float:
+    """Average milliseconds per call"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def bench_store(args):
+    """Indexed data store at large contact and appointment counts"""
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        contacts = {}
+        for i in range(args.contacts):
+            name = f"{_random_word(rng, rng.randint(4, 7)).title()} {_random_word(rng, rng.randint(5, 8)).title()}"
+            contacts[f"contact{i}"] = {"name": name, "phone": f"+62-{i:09d}", "email": f"c{i}@example.com"}
+        start_day = datetime.date.today() - datetime.timedelta(days=365 * args.years // 2)
+        schedule = [
+            {"date": (start_day + datetime.timedelta(days=day)).isoformat(), "time": f"{hour:02d}:00",
+             "title": f"Appointment {day}-{hour}", "location": "Office", "priority": rng.choice(["high", "medium", "low"])}
+            for day in range(365 * args.years) for hour in rng.sample(range(8, 19), args.per_day)
+        ]
+        (folder / "contacts.json").write_text(json.dumps(contacts))
+        (folder / "schedule.json").write_text(json.dumps(schedule))
+        print(f"{len(contacts)} contacts, {len(schedule)} appointments")
+
+        def open_store():
+            return DataStore(folder / "aria.db", folder / "schedule.json", folder / "contacts.json")
+
+        store = open_store()
+        print(f"initial import          {_timed(store.refresh):>9.1f} ms")
+        store.close()
+        store = open_store()
+        print(f"restart (unchanged)     {_timed(store.refresh):>9.3f} ms")
+
+        names = [contact["name"].lower() for contact in rng.sample(list(contacts.values()), 200)]
+        days = [start_day + datetime.timedelta(days=rng.randrange(365 * args.years)) for _ in range(200)]
+        day_iter, name_iter = iter(days * 5), iter(names * 5)
+        print(f"schedule_for(day)       {_timed(lambda: store.schedule_for(next(day_iter)), 1000):>9.3f} ms")
+        print(f"find contact in text    {_timed(lambda: store.find_contacts_in(f'call {next(name_iter)} now'), 1000):>9.3f} ms")
+        print(f"phonetic key lookup     {_timed(lambda: store.contacts_by_phonetic('S530'), 1000):>9.3f} ms")
+        counter = iter(range(10 ** 9))
+        print(f"upsert one contact      {_timed(lambda: store.upsert_contact(f'new{next(counter)}', {'name': 'New Person', 'phone': '', 'email': ''}), 50):>9.3f} ms")
+
+        store.flush()
+        contacts = json.loads((folder / "contacts.json").read_text())
+        contacts["late"] = {"name": "Late Addition", "phone": "", "email": ""}
+        (folder / "contacts.json").write_text(json.dumps(contacts))
+        print(f"hot reload after edit   {_timed(store.refresh):>9.1f} ms")
+        print(f"found edited contact    {bool(store.find_contacts_in('call late addition'))}")
+        store.close()
+
+
+def _misspell(rng: random.Random, name: str) -> str:
+    """Mangle a name the way speech-to-text tends to: respelling, a typo, or a split word"""
+    first = name.split()[0].lower()
+    kind = rng.choice(["respell", "typo", "split"])
+    if kind == "respell":
+        for old, new in (("ph", "f"), ("f", "ph"), ("c", "k"), ("k", "c"), ("ie", "ee"), ("i", "y"), ("s", "z")):
+            if old in first:
+                return first.replace(old, new, 1)
+        kind = "typo"
+    if kind == "typo" and len(first) > 4:
+        i = rng.randrange(1, len(first))
+        return first[:i] + first[i + 1:]
+    cut = max(1, len(first) // 2)
+    return f"{first[:cut]} {first[cut:]}"
+
+
+def bench_contacts(args):
+    """Fuzzy/phonetic contact resolver accuracy and latency at large contact counts"""
+    rng = random.Random(args.seed)
+    names = {f"contact{i}": f"{_random_word(rng, rng.randint(4, 7)).title()} {_random_word(rng, rng.randint(5, 8)).title()}"
+             for i in range(args.contacts)}
+    resolver = ContactResolver()
+    started = time.perf_counter()
+    resolver.update(names)
+    print(f"{len(names)} contacts, index built in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    keys = rng.sample(list(names), args.queries)
+    queries = [(key, f"call {_misspell(rng, names[key])}") for key in keys]
+    latencies, top1, top3 = [], 0, 0
+    for key, query in queries:
+        started = time.perf_counter()
+        ranked = [candidate for candidate, _ in resolver.resolve(query)]
+        latencies.append((time.perf_counter() - started) * 1000)
+        # Random first names collide, so a hit is any contact sharing the intended first name
+        wanted = names[key].split()[0]
+        hits = [names[candidate].split()[0] == wanted for candidate in ranked]
+        top1 += bool(hits[:1] and hits[0])
+        top3 += any(hits)
+    print(f"resolve p50 {percentile(latencies, 50):.3f} ms   p95 {percentile(latencies, 95):.3f} ms   "
+          f"p99 {percentile(latencies, 99):.3f} ms")
+    print(f"top-1 {top1 / len(queries):.1%}   top-3 {top3 / len(queries):.1%} of {len(queries)} misheard names")
+    for key, query in queries[:5]:
+        print(f"  {query!r:<28} -> {[names[candidate] for candidate, _ in resolver.resolve(query)]}")
+
+    names = dict(names, late="Late Addition")
+    names["contact0"] = "Renamed Person"
+    started = time.perf_counter()
+    changed = resolver.update(names)
+    print(f"incremental update ({changed} changed) {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+def bench_wake(args):
+    """False-accept/false-reject rates and CPU cost of the local wake word spotters"""
+    wake_words = args.wake_words
+    if not wake_words:
+        with open("user_preferences.json") as f:
+            wake_words = json.load(f).get("wake_word", [])
+    fixtures = load_wav_fixtures(args.fixtures)
+    recognizer = sr.Recognizer()
+    clips = []
+    for fixture in fixtures:
+        with sr.AudioFile(str(fixture["path"])) as source:
+            audio = recognizer.record(source)
+        # A clip should wake ARIA when its reference transcript contains a wake word
+        reference = f" {' '.join(tokenize(fixture['reference']))} "
+        expected = any(f" {' '.join(tokenize(word))} " in reference for word in wake_words)
+        clips.append((audio, expected, len(audio.frame_data) / (audio.sample_rate * audio.sample_width)))
+    positives = sum(expected for _, expected, _ in clips)
+    audio_seconds = sum(seconds for _, _, seconds in clips)
+    print(f"{len(clips)} clips ({positives} with a wake word, {audio_seconds:.0f}s audio), wake words: {wake_words}")
+
+    print(f"{'engine':<8} {'sens':>5} {'false acc':>10} {'false rej':>10} {'cpu ms/clip':>12} {'x realtime':>11}")
+    for name in args.engines:
+        for sensitivity in args.sensitivity:
+            config = {"language": "en-US", "vosk_model_path": args.vosk_model, "wake_word_sensitivity": sensitivity}
+            spotter = create_wake_word_spotter(name, recognizer, wake_words, config)
+            if spotter is None:
+                print(f"{name:<8} unavailable")
+                break
+            false_accepts = false_rejects = 0
+            cpu_started = time.process_time()
+            for audio, expected, _ in clips:
+                heard = spotter.detect(audio) is not None
+                false_accepts += heard and not expected
+                false_rejects += expected and not heard
+            cpu = time.process_time() - cpu_started
+            negatives = len(clips) - positives
+            print(f"{name:<8} {sensitivity:>5.2f} {false_accepts / max(negatives, 1):>10.1%} "
+                  f"{false_rejects / max(positives, 1):>10.1%} {cpu * 1000 / len(clips):>12.1f} "
+                  f"{audio_seconds / max(cpu, 1e-9):>11.1f}")
+            if name != "sphinx":
+                # Only keyword search has a sensitivity knob
+                break
+
+
+def synthesize_utterance(rng: random.Random, rate: int = 16000):
+    """Voiced "syllables" between stretches of low noise; return (pcm, speech start s, speech end s)"""
+    samples = []
+
+    def noise(seconds):
+        samples.extend(rng.randint(-60, 60) for _ in range(int(seconds * rate)))
+
+    noise(rng.uniform(0.5, 1.0))
+    start = len(samples) / rate
+    for syllable in range(rng.randint(2, 6)):
+        if syllable:
+            noise(rng.uniform(0.04, 0.18))
+        pitch, peak, length = rng.uniform(110, 220), rng.uniform(4000, 8000), int(rng.uniform(0.12, 0.3) * rate)
+        for i in range(length):
+            envelope = peak * math.sin(math.pi * i / length)
+            phase = 2 * math.pi * pitch * i / rate
+            samples.append(int(envelope * (0.6 * math.sin(phase) + 0.3 * math.sin(2 * phase) + 0.1 * math.sin(3 * phase))))
+    end = len(samples) / rate
+    noise(1.5)
+    return array("h", samples).tobytes(), start, end
+
+
+def _speech_bounds(pcm: bytes, rate: int, frame_bytes: int):
+    """Energy oracle for recorded fixtures: first and last frame above 10% of the loudest"""
+    levels = [frame_rms(pcm[i:i + frame_bytes]) for i in range(0, len(pcm) - frame_bytes + 1, frame_bytes)]
+    loud = [i for i, level in enumerate(levels) if level > 0.1 * max(levels)]
+    seconds_per_frame = frame_bytes / 2 / rate
+    return loud[0] * seconds_per_frame, (loud[-1] + 1) * seconds_per_frame
+
+
+def bench_vad(args):
+    """End-of-speech latency of frame-level VAD capture vs recognizer.listen's fixed pause"""
+    rate, frame_ms = 16000, args.frame_ms
+    if args.fixtures:
+        clips = []
+        for fixture in load_wav_fixtures(args.fixtures):
+            with sr.AudioFile(str(fixture["path"])) as source:
+                pcm = sr.Recognizer().record(source).get_raw_data(convert_rate=rate, convert_width=2)
+            clips.append((fixture["name"], pcm) + _speech_bounds(pcm, rate, rate * frame_ms // 1000 * 2))
+    else:
+        rng = random.Random(args.seed)
+        clips = [(f"synthetic{i}",) + synthesize_utterance(rng, rate) for i in range(args.clips)]
+    vad = create_vad(args.aggressiveness)
+    print(f"{len(clips)} clips, VAD: {type(vad).__module__}.{type(vad).__name__}")
+
+    legacy, frames, clipped, cpu, frame_count = [], [], 0, 0.0, 0
+    for name, pcm, speech_start, speech_end in clips:
+        # Before: speech_recognition's energy threshold and fixed pause_threshold
+        recognizer = sr.Recognizer()
+        recognizer.dynamic_energy_threshold = False
+        recognizer.pause_threshold = 0.8
+        wav = io.BytesIO()
+        with wave.open(wav, "wb") as writer:
+            writer.setnchannels(1)
+            writer.setsampwidth(2)
+            writer.setframerate(rate)
+            writer.writeframes(pcm)
+        wav.seek(0)
+        with sr.AudioFile(wav) as source:
+            source.CHUNK = 1024  # sr.Microphone's buffer size, not AudioFile's 4096
+            recognizer.listen(source)
+            legacy.append((source.audio_reader.tell() / rate - speech_end) * 1000)
+
+        # After: frame-level VAD with adaptive trailing silence
+        capture = FrameCapture(vad, sample_rate=rate, frame_ms=frame_ms)
+        started = time.process_time()
+        for index, offset in enumerate(range(0, len(pcm) - capture.frame_bytes + 1, capture.frame_bytes)):
+            utterance = capture.feed(pcm[offset:offset + capture.frame_bytes])
+            if utterance is not None:
+                ended = (offset + capture.frame_bytes) / 2 / rate
+                frames.append((ended - speech_end) * 1000)
+                clipped += ended - len(utterance) / 2 / rate > speech_start + frame_ms / 1000
+                break
+        else:
+            print(f"  {name}: no end of speech detected")
+        cpu += time.process_time() - started
+        frame_count += index + 1
+
+    print(f"{'capture':<22} {'p50 ms':>8} {'p95 ms':>8}   (audio consumed after speech ended)")
+    print(f"{'recognizer.listen':<22} {percentile(legacy, 50):>8.0f} {percentile(legacy, 95):>8.0f}")
+    print(f"{'frame VAD':<22} {percentile(frames, 50):>8.0f} {percentile(frames, 95):>8.0f}")
+    print(f"clipped onsets: {clipped}   VAD cost: {cpu / max(frame_count, 1) * 1e6:.0f} us per {frame_ms} ms frame")
+
+
+class _LegacyEnergyVAD:
+    """The energy VAD before continuous calibration: its floor only followed frames judged silent"""
+
+    def __init__(self, ratio: float = 3.0, min_rms: float = 150.0, adapt: float = 0.05):
+        self.ratio = ratio
+        self.min_rms = min_rms
+        self.adapt = adapt
+        self.noise_floor = None
+
+    def is_speech(self, frame, sample_rate: int) -> bool:
+        rms = frame_rms(frame)
+        if self.noise_floor is None:
+            self.noise_floor = min(rms, self.min_rms)
+        speech = rms > max(self.min_rms, self.noise_floor * self.ratio)
+        if not speech:
+            self.noise_floor += self.adapt * (rms - self.noise_floor)
+        return speech
+
+
+class _FixedThresholdVAD:
+    """A threshold set once, like the recognizer's one-off calibration"""
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+
+    def is_speech(self, frame, sample_rate: int) -> bool:
+        return frame_rms(frame) > self.threshold
+
+
+class _PcmStream:
+    """Microphone-like stream over raw 16-bit PCM"""
+
+    def __init__(self, pcm: bytes):
+        self._pcm = memoryview(pcm)
+        self.position = 0
+
+    def read(self, frames: int) -> bytes:
+        chunk = self._pcm[self.position:self.position + frames * 2]
+        self.position += len(chunk)
+        return bytes(chunk)
+
+
+def synthesize_noisy_session(rng: random.Random, rate: int, utterances: int, levels: List[float]):
+    """
+    Utterances spoken over machinery noise whose level steps through `levels`
+    (one step per equal share of the utterances). Return (pcm, speech
+    intervals in seconds, (start s, noise RMS) per step).
+    """
+    # One second of hum plus hiss at unit RMS, tiled under the whole session
+    hum = [0.7 * math.sin(2 * math.pi * 120 * i / rate) + 0.3 * math.sin(2 * math.pi * 240 * i / rate) + rng.gauss(0, 1)
+           for i in range(rate)]
+    scale = math.sqrt(sum(value * value for value in hum) / rate)
+    hum = [value / scale for value in hum]
+    clean, intervals, steps = [0] * rate, [], []  # a quiet second to calibrate on, as at startup
+    per_step = max(1, utterances // len(levels))
+    level_at = []
+    for number in range(utterances):
+        step = min(number // per_step, len(levels) - 1)
+        if not steps or steps[-1][1] != levels[step]:
+            steps.append((0.0 if not steps else len(clean) / rate, levels[step]))
+        pcm, start, end = synthesize_utterance(rng, rate)
+        offset = len(clean) / rate
+        intervals.append((offset + start, offset + end))
+        clean.extend(array("h", pcm))
+        level_at.append((len(clean), levels[step]))
+        clean.extend([0] * int(rng.uniform(0.5, 2.5) * rate))
+    level_at.insert(0, (rate, levels[0]))
+    mixed, position = array("h"), 0
+    for sample_index, sample in enumerate(clean):
+        if sample_index >= level_at[position][0] and position < len(level_at) - 1:
+            position += 1
+        value = sample + hum[sample_index % rate] * level_at[position][1]
+        mixed.append(int(max(-32768, min(32767, value))))
+    return mixed.tobytes(), intervals, steps
+
+
+def _score_captures(utterances, intervals, max_seconds: float):
+    """Match captured (start, end) spans against reference speech intervals"""
+    complete = cut = merged = missed = 0
+    for start, end in intervals:
+        overlapping = [span for span in utterances if span[0] < end and span[1] > start]
+        if not overlapping:
+            missed += 1
+        elif any(sum(span[0] < other_end and span[1] > other_start for other_start, other_end in intervals) > 1
+                 for span in overlapping):
+            merged += 1
+        elif any(span[0] <= start + 0.05 and span[1] >= end - 0.05 for span in overlapping):
+            complete += 1
+        else:
+            cut += 1
+    false = sum(1 for span_start, span_end in utterances
+                if not any(span_start < end and span_end > start for start, end in intervals))
+    runaway = sum(1 for span_start, span_end in utterances if span_end - span_start >= max_seconds - 0.1)
+    return complete, cut, merged, missed, false, runaway
+
+
+def _noisy_speech_bounds(pcm: bytes, rate: int, frame_bytes: int):
+    """Oracle for noisy fixtures: (noise RMS, first and last frame nearer the loud end than the quiet end)"""
+    levels = [frame_rms(pcm[i:i + frame_bytes]) for i in range(0, len(pcm) - frame_bytes + 1, frame_bytes)]
+    quiet, loud = percentile(levels, 15), percentile(levels, 95)
+    voiced = [i for i, level in enumerate(levels) if level > (quiet + loud) / 2]
+    seconds_per_frame = frame_bytes / 2 / rate
+    return quiet, voiced[0] * seconds_per_frame, (voiced[-1] + 1) * seconds_per_frame
+
+
+def bench_noise(args):
+    """Timeouts, missed and runaway utterances under changing background noise: one-off vs continuous calibration"""
+    rate, frame_ms = 16000, args.frame_ms
+    if args.fixtures:
+        pcm, intervals, steps = bytearray(), [], []
+        for fixture in load_wav_fixtures(args.fixtures):
+            with sr.AudioFile(str(fixture["path"])) as source:
+                clip = sr.Recognizer().record(source).get_raw_data(convert_rate=rate, convert_width=2)
+            offset = len(pcm) / 2 / rate
+            level, start, end = _noisy_speech_bounds(clip, rate, rate * frame_ms // 1000 * 2)
+            if fixture["reference"]:
+                intervals.append((offset + start, offset + end))
+            steps.append((offset, level))
+            pcm += clip
+        pcm = bytes(pcm)
+    else:
+        rng = random.Random(args.seed)
+        pcm, intervals, steps = synthesize_noisy_session(rng, rate, args.utterances, args.levels)
+    seconds = len(pcm) / 2 / rate
+    print(f"{seconds:.0f}s of audio, {len(intervals)} utterances, noise RMS by step: "
+          + ", ".join(f"{level:.0f}" for _, level in steps))
+
+    calibration = frame_rms(pcm[:rate * 2])  # what adjust_for_ambient_noise(duration=1) hears at startup
+    variants = {
+        "fixed 300": lambda: _FixedThresholdVAD(300),
+        "calibrated once": lambda: _FixedThresholdVAD(max(150.0, calibration * 3.0)),
+        "silent-frame EMA": _LegacyEnergyVAD,
+        "noise estimator": lambda: EnergyVAD(NoiseFloorEstimator(
+            window=args.window_seconds * 1000 // frame_ms, percentile=args.percentile, ratio=args.ratio)),
+    }
+    print(f"{'threshold':<18} {'complete':>8} {'cut':>5} {'merged':>6} {'missed':>6} {'false':>6} {'runaway':>7} "
+          f"{'timeouts':>8}")
+    for name, make_vad in variants.items():
+        vad = make_vad()
+        capture = FrameCapture(vad, sample_rate=rate, frame_ms=frame_ms, max_seconds=args.max_seconds)
+        stream, utterances, timeouts = _PcmStream(pcm), [], 0
+        while stream.position < len(pcm):
+            try:
+                audio = capture.capture(stream, timeout=args.timeout)
+            except sr.WaitTimeoutError:
+                timeouts += stream.position < len(pcm)
+                continue
+            end = stream.position / 2 / rate
+            utterances.append((end - len(audio.frame_data) / 2 / rate, end))
+        complete, cut, merged, missed, false, runaway = _score_captures(utterances, intervals, args.max_seconds)
+        print(f"{name:<18} {complete:>8} {cut:>5} {merged:>6} {missed:>6} {false:>6} {runaway:>7} {timeouts:>8}")
+        if isinstance(vad, EnergyVAD):
+            noise = vad.noise
+    if noise.history:
+        tracked = [floor for _, floor, _ in noise.history]
+        print(f"estimated floor ranged {min(tracked):.0f}-{max(tracked):.0f} RMS over {len(tracked)} samples "
+              f"({noise.sample_every * frame_ms} ms apart)")
+
+
+async def _http_call(reader, writer, method: str, path: str, payload: Dict = None):
+    """One keep-alive HTTP/1.1 request; return (status, decoded JSON body)"""
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: aria\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length)) if length else None
+
+
+async def _load_clients(port: int, clients: int, requests_per_client: int, utterances: List[str]):
+    """Simulate concurrent thin clients, each with its own session and connection"""
+    latencies, statuses = [], Counter()
+
+    async def client(number: int):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        status, created = await _http_call(reader, writer, "POST", "/sessions", {"user_name": f"Client {number}"})
+        statuses[status] += 1
+        if status != 201:
+            writer.close()
+            return
+        for i in range(requests_per_client):
+            text = utterances[(number + i) % len(utterances)]
+            started = time.perf_counter()
+            status, _ = await _http_call(reader, writer, "POST", f"/sessions/{created['session_id']}/text", {"text": text})
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] += 1
+        await _http_call(reader, writer, "DELETE", f"/sessions/{created['session_id']}")
+        writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(clients)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def bench_server(args):
+    """Throughput and tail latency of server mode as concurrent clients scale"""
+    assistant = AriaAssistant(headless=True)
+    history = tempfile.TemporaryDirectory()
+    assistant.conversation = ConversationLog(Path(history.name))  # keep load-test turns out of the real history
+    server = AriaServer(assistant)
+    port = server.start_background()
+    utterances = [record["utterance"] for record in load_utterances(args.corpus)]
+    print(f"server on port {port}, {args.requests} requests per client, "
+          f"{assistant.config['server_command_workers']} command workers")
+    print(f"{'clients':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'503s':>6}")
+    for clients in args.concurrency:
+        latencies, statuses, wall = asyncio.run(_load_clients(port, clients, args.requests, utterances))
+        print(f"{clients:>8} {len(latencies) / wall:>9.0f} {percentile(latencies, 50):>8.1f} "
+              f"{percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f} {statuses[503]:>6}")
+    server.stop()
+    assistant.store.close()
+    assistant.conversation.close()
+    history.cleanup()
+
+
+def bench_history(args):
+    """Conversation log: append cost on the hot path, batched fsync throughput and streaming scans"""
+    rng = random.Random(args.seed)
+    utterances = ["what time is it", "what's my schedule", "weather in Tokyo", "call Egi", "what's 12 times 7"]
+    intents = ["Time & Date", "Schedule", "Weather", "Contacts", "Calculator"]
+    start = time.time() - args.days * 86400
+    total = args.days * args.turns_per_day
+    with tempfile.TemporaryDirectory() as folder:
+        log = ConversationLog(Path(folder), args.segment_mb << 20)
+        appends = []
+        started = time.perf_counter()
+        for i in range(total):
+            pick = rng.randrange(len(utterances))
+            turn = {"timestamp": start + i * 86400 / args.turns_per_day, "user": "Taqi",
+                    "utterance": utterances[pick], "intent": intents[pick], "response": "x" * rng.randint(40, 200),
+                    "latencies": {"listen.capture": rng.uniform(300, 900), "command.route": 0.02}}
+            before = time.perf_counter()
+            log.append(turn)
+            appends.append((time.perf_counter() - before) * 1e6)
+        log.flush()
+        wall = time.perf_counter() - started
+        size = sum(path.stat().st_size for path in log.segments())
+        print(f"{total} turns over {args.days} days, {size / 2 ** 20:.1f} MB in {len(log.segments())} segments")
+        print(f"append (hot path)       p50 {percentile(appends, 50):.1f} us, p99 {percentile(appends, 99):.1f} us")
+        print(f"written to disk         {total / wall:,.0f} turns/s in {log.batches} fsynced batches")
+
+        tracemalloc.start()
+        count = 0
+        started = time.perf_counter()
+        for _ in log.iter_turns():
+            count += 1
+        scan_seconds = time.perf_counter() - started
+        _, streaming_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        loaded = [json.loads(line) for path in log.segments() for line in path.read_text().splitlines()]
+        _, loading_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del loaded
+        print(f"full scan (streaming)   {count / scan_seconds:,.0f} turns/s, peak {streaming_peak / 2 ** 20:.1f} MB "
+              f"(load-all peak {loading_peak / 2 ** 20:.1f} MB)")
+        since = time.time() - 7 * 86400
+        print(f"last 7 days             {_timed(lambda: sum(1 for _ in log.iter_turns(since=since))):>9.1f} ms")
+        print(f"newest 20 (reverse)     "
+              f"{_timed(lambda: [turn for turn, _ in zip(log.iter_turns(reverse=True), range(20))]):>9.1f} ms")
+        log.close()
+
+
+def bench_semantic(args):
+    """Keyword routing vs the semantic fallback: accuracy and classification latency on labelled corpora"""
+    assistant = AriaAssistant(headless=True)
+    examples = assistant.semantic_router.examples
+    records = [record for path in args.corpus for record in load_utterances(path) if record.get("intent")]
+    utterances = [record["utterance"] for record in records]
+    print(f"{len(records)} labelled utterances, {sum(map(len, examples.values()))} examples "
+          f"over {len(examples)} intents")
+
+    routers = {}
+    for name, use_numpy in (("numpy", True), ("python", False)):
+        router = SemanticRouter(examples, use_numpy=use_numpy)
+        if use_numpy and not router.use_numpy:
+            print("numpy not installed; skipping the matrix path")
+            continue
+        print(f"fit ({name:<6})            {_timed(router.fit):>9.1f} ms, {len(router.vocabulary)} features")
+        routers[name] = router
+
+    def accuracy(route) -> float:
+        return sum((route(utterance) or "Default") == record["intent"]
+                   for utterance, record in zip(utterances, records)) / len(records)
+
+    router = next(iter(routers.values()))
+    print(f"\n{'threshold':>9} {'keyword':>8} {'semantic':>9} {'keyword+fallback':>17}")
+    for threshold in args.thresholds:
+        router.threshold = threshold
+        print(f"{threshold:>9.2f} {accuracy(assistant.router.best):>8.1%} "
+              f"{accuracy(lambda text: router.classify(text)[0]):>9.1%} "
+              f"{accuracy(lambda text: assistant.router.best(text) or router.classify(text)[0]):>17.1%}")
+    router.threshold = assistant.config["semantic_threshold"]
+
+    print(f"\n{'router':<18} {'p50 us':>8} {'p99 us':>8}")
+    keyword = [_timed(lambda: assistant.router.best(text), args.repeat) * 1000 for text in utterances]
+    print(f"{'keyword':<18} {percentile(keyword, 50):>8.1f} {percentile(keyword, 99):>8.1f}")
+    for name, router in routers.items():
+        single = [_timed(lambda: router.classify(text), args.repeat) * 1000 for text in utterances]
+        batched = _timed(lambda: router.classify_batch(utterances), args.repeat) * 1000 / len(utterances)
+        print(f"{'semantic ' + name:<18} {percentile(single, 50):>8.1f} {percentile(single, 99):>8.1f}"
+              f"   batched {batched:.1f} us/utterance")
+
+    if args.show_errors:
+        router.threshold = assistant.config["semantic_threshold"]
+        print()
+        for text, record in zip(utterances, records):
+            routed = assistant.router.best(text) or router.classify(text)[0] or "Default"
+            if routed != record["intent"]:
+                print(f"{text!r}: expected {record['intent']}, got {routed}")
+
+
+# Runs in a fresh interpreter per plugin count so imports and memory don't carry over
+_PLUGIN_PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+from aria_voice_assistant import AriaAssistant
+assistant = AriaAssistant(headless=True)
+startup = time.perf_counter() - started
+result = {"startup_ms": startup * 1000, "discover_ms": assistant.startup_phases["plugins"] * 1000,
+          "router_ms": assistant.startup_phases["router_build"] * 1000, "intents": len(assistant.commands),
+          "imported": sum(name.startswith("aria_plugin_") for name in sys.modules),
+          "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+if sys.argv[1:] == ["eager"]:
+    started = time.perf_counter()
+    for manifest in assistant.plugins.manifests.values():
+        assistant.plugins.handler(manifest, assistant).resolve()
+    result["eager_ms"] = (time.perf_counter() - started) * 1000
+    result["eager_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+elif assistant.plugins.manifests:
+    manifest = next(iter(assistant.plugins.manifests.values()))
+    command = manifest.keywords[0]
+    for key in ("first_call_ms", "warm_call_ms"):
+        started = time.perf_counter()
+        response, _ = assistant.process_command(command, wait=True)
+        result[key] = (time.perf_counter() - started) * 1000
+    result["routed"] = response.startswith(manifest.intent)
+print(json.dumps(result))
+"""
+
+
+def _write_plugins(folder: Path, count: int, rng: random.Random, payload_kb: int):
+    """Synthetic plugins whose modules are expensive to import, like a real dependency"""
+    for i in range(count):
+        plugin = folder / f"synthetic{i:03d}"
+        plugin.mkdir()
+        words = [_random_word(rng, rng.randint(5, 8)) for _ in range(4)]
+        (plugin / "plugin.json").write_text(json.dumps({
+            "intent": f"Synthetic{i:03d}", "keywords": [f"{words[0]} {i}", words[1]],
+            "examples": [f"please {words[2]} the {words[3]}", f"{words[1]} {words[2]} now"],
+            "handler": "handler:handle",
+        }))
+        (plugin / "handler.py").write_text(
+            f"TABLE = [bytes(1024) for _ in range({payload_kb})]  # stands in for a heavy dependency\n"
+            f"SORTED = sorted(range({payload_kb * 100}), key=lambda n: -n)\n\n"
+            f"def handle(command, assistant):\n"
+            f"    return 'Synthetic{i:03d} handled ' + command, 'neutral'\n")
+
+
+def bench_plugins(args):
+    """Startup time and memory as the plugin count grows, with handlers imported lazily vs eagerly"""
+    rng = random.Random(args.seed)
+    print(f"{'plugins':>7} {'startup ms':>11} {'discover ms':>12} {'router ms':>10} {'RSS MB':>7} "
+          f"{'imported':>9} {'1st call ms':>12} {'warm ms':>8} {'eager ms':>9} {'eager RSS':>10}")
+    for count in args.counts:
+        with tempfile.TemporaryDirectory() as folder:
+            _write_plugins(Path(folder), count, rng, args.payload_kb)
+            environment = dict(os.environ, ARIA_PLUGINS=folder)
+            lazy, eager = (json.loads(subprocess.run([sys.executable, "-c", _PLUGIN_PROBE, *mode], env=environment,
+                                                     capture_output=True, text=True, check=True).stdout.splitlines()[-1])
+                           for mode in ([], ["eager"]))
+        print(f"{count:>7} {lazy['startup_ms']:>11.1f} {lazy['discover_ms']:>12.2f} {lazy['router_ms']:>10.2f} "
+              f"{lazy['rss_mb']:>7.1f} {lazy['imported']:>9} {lazy.get('first_call_ms', 0):>12.2f} "
+              f"{lazy.get('warm_call_ms', 0):>8.3f} {eager['eager_ms']:>9.1f} {eager['eager_rss_mb']:>10.1f}")
+        if count and not lazy["routed"]:
+            print(f"  warning: '{count}' plugin run did not route to the plugin")
+
+
+def bench_reminders(args):
+    """Reminder scheduler: arm/cancel cost at scale, incremental resync, and firing checked on a simulated clock"""
+    rng = random.Random(args.seed)
+    print(f"{'pending':>8} {'arm us':>7} {'move us':>8} {'cancel us':>10} {'list arm us':>12} {'list cancel us':>15}")
+    for count in args.counts:
+        scheduler = ReminderScheduler(lambda key, payload: None, SimulatedClock())
+        keys = [f"r{i}" for i in range(count)]
+        dues = [rng.uniform(0, 30 * 86400) for _ in keys]
+        for key, due in zip(keys, dues):
+            scheduler.schedule(key, due)
+        sample = rng.sample(keys, min(1000, count))
+        arm = _timed(lambda: [scheduler.schedule(f"new{i}", rng.uniform(0, 30 * 86400)) for i in range(1000)])
+        move = _timed(lambda: [scheduler.schedule(key, rng.uniform(0, 30 * 86400)) for key in sample])
+        cancel = _timed(lambda: [scheduler.cancel(key) for key in sample])
+        listed = sorted(zip(dues, keys))
+        extra = [(rng.uniform(0, 30 * 86400), f"new{i}") for i in range(1000)]
+        list_arm = _timed(lambda: [bisect.insort(listed, item) for item in extra])
+        list_cancel = _timed(lambda: [listed.remove(item) for item in extra])
+        print(f"{count:>8} {arm:>7.2f} {move / len(sample) * 1000:>8.2f} {cancel / len(sample) * 1000:>10.2f} "
+              f"{list_arm:>12.2f} {list_cancel:>15.2f}")
+
+    # A large schedule, resynced after a few edits as when schedule.json changes
+    now = datetime.datetime.now().replace(second=0, microsecond=0)
+    leads = {"high": 15, "medium": 10, "low": 5}
+    entries = [{"date": (now.date() + datetime.timedelta(days=rng.randrange(365))).isoformat(),
+                "time": f"{rng.randrange(24):02d}:{rng.randrange(0, 60, 5):02d}", "title": f"Appointment {i}",
+                "location": "Office", "priority": rng.choice(list(leads))} for i in range(args.entries)]
+    # Hand-edited mistakes in schedule.json are skipped rather than breaking the sync
+    malformed = [{"time": "25:00", "title": "Bad hour"}, {"time": "10:75", "title": "Bad minute"},
+                 {"time": "noon", "title": "No time"}, {"date": "2025-02-30", "time": "09:00", "title": "Bad date"}]
+    entries += malformed
+    clock = SimulatedClock(now.timestamp())
+    scheduler = ReminderScheduler(lambda key, payload: None, clock)
+    print(f"\n{len(entries)} schedule entries")
+    print(f"initial sync            {_timed(lambda: scheduler.sync(reminder_times(entries, now, leads))):>9.1f} ms, "
+          f"{len(scheduler)} armed")
+    for entry in rng.sample(entries[:args.entries], args.edits):
+        entry["time"] = f"{rng.randrange(24):02d}:{rng.randrange(0, 60, 5):02d}"
+    del entries[:args.edits // 2]
+    wanted = {}
+    print(f"wanted set from entries {_timed(lambda: wanted.update(reminder_times(entries, now, leads))):>9.1f} ms")
+    changes = []
+    print(f"resync after {args.edits} edits  {_timed(lambda: changes.append(scheduler.sync(wanted))):>9.1f} ms, "
+          f"{changes[0][0]} armed, {changes[0][1]} cancelled")
+
+    # Step a simulated week forward a minute at a time: nothing early, nothing late, in order
+    fired = []
+    scheduler.on_due = lambda key, payload: fired.append((scheduler.fired[key], clock.now(), payload["event"]))
+    expected = sum(1 for due, _ in reminder_times(entries, now, leads).values() if due <= clock.now() + 7 * 86400)
+    start = clock.now()
+    started = time.perf_counter()
+    for _ in range(7 * 24 * 60):
+        clock.advance(60)
+        scheduler.run_due()
+    wall = time.perf_counter() - started
+    # Reminders whose lead time had already begun fire on the first tick
+    on_time = all(0 <= fired_at - max(due, start) <= 60 and fired_at <= event for due, fired_at, event in fired)
+    in_order = all(a[0] <= b[0] for a, b in zip(fired, fired[1:]))
+    skipped = not any(key.endswith(entry["title"]) for entry in malformed for key in scheduler.fired)
+    print(f"simulated week          {wall * 1000:>9.1f} ms, {len(fired)} fired (expected {expected}), "
+          f"within the minute {on_time}, in order {in_order}, malformed entries skipped {skipped}")
+
+    # Real clock: how late the thread wakes for a reminder, with no polling interval to wait out
+    late = []
+    done = threading.Event()
+    scheduler = ReminderScheduler(lambda key, due: (late.append((time.time() - due) * 1000),
+                                                    len(late) == args.wakeups and done.set()))
+    scheduler.start()
+    for i in range(args.wakeups):
+        due = time.time() + 0.05 + i * 0.01
+        scheduler.schedule(f"w{i}", due, due)
+    done.wait(5 + args.wakeups * 0.01)
+    scheduler.stop()
+    print(f"wake-up lateness        p50 {percentile(late, 50):.2f} ms, p99 {percentile(late, 99):.2f} ms "
+          f"over {len(late)} reminders")
+
+
+def _synthesize_session(path: Path, records: List[Dict], rng: random.Random):
+    """A session archive from a text corpus: synthetic audio, the corpus text as transcripts, cloud-like timings"""
+    recorder = SessionRecorder(path, {"recognizer": "synthetic", "capture": "vad", "wake_words": []})
+    for record in records:
+        pcm, _, end = synthesize_utterance(rng)
+        event = recorder.capture(sr.AudioData(pcm, 16000, 2), rng.uniform(0.5, 3.0) + end)
+        event.update(gate=True, transcript=record["utterance"],
+                     recognize_ms=round(rng.lognormvariate(math.log(400), 0.4), 3))
+        recorder.turn({"utterance": record["utterance"], "intent": record.get("intent")})
+    recorder.close()
+
+
+def bench_replay(args):
+    """Replay recorded sessions offline with mocked audio backends and check for latency regressions"""
+    with tempfile.TemporaryDirectory() as folder:
+        archives = args.archives
+        if not archives:
+            archives = [str(Path(folder) / "synthetic.zip")]
+            records = [record for record in load_utterances(args.corpus) if record.get("intent") != "Exit"]
+            _synthesize_session(Path(archives[0]), records, random.Random(args.seed))
+            print(f"Synthesized a {len(records)}-phrase session from {args.corpus}")
+        reports = {}
+        for archive in archives:
+            assistant = AriaAssistant(headless=True, replay=archive, replay_speed=args.speed)
+            report = assistant.run_replay(quiet=True)
+            assistant.handler_runner.shutdown()
+            assistant.plugins.close()
+            assistant.conversation.close()
+            print_replay_report(report)
+            reports[Path(archive).name] = report
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(reports, indent=2))
+        print(f"Saved report to {args.save}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = []
+        for name, report in reports.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            for stage, stats in report["stages"].items():
+                before = previous["stages"].get(stage, {}).get("p95_ms")
+                if stage in REPLAYED_STAGES or before is None or stats["p95_ms"] is None:
+                    continue
+                if stats["p95_ms"] > before * (1 + args.tolerance) + args.slack_ms:
+                    regressions.append(f"{name} {stage}: p95 {before:.3f} -> {stats['p95_ms']:.3f} ms")
+            if (previous.get("intent_agreement") or 0) > (report["intent_agreement"] or 0):
+                regressions.append(f"{name} intent agreement {previous['intent_agreement']:.1%} -> "
+                                   f"{report['intent_agreement'] or 0:.1%}")
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+        print("No regressions against baseline")
+
+
+BENCHMARKS = {
+    "router": bench_router,
+    "recognizers": bench_recognizers,
+    "serve-recognizer": serve_recognizer,
+    "commands": bench_commands,
+    "weather": bench_weather,
+    "math": bench_math,
+    "store": bench_store,
+    "contacts": bench_contacts,
+    "wake": bench_wake,
+    "vad": bench_vad,
+    "server": bench_server,
+    "history": bench_history,
+    "semantic": bench_semantic,
+    "plugins": bench_plugins,
+    "reminders": bench_reminders,
+    "replay": bench_replay,
+    "noise": bench_noise,
+}
+
+
+def main(argv: List[str] = None):
+    """Benchmark entry point"""
+    parser = argparse.ArgumentParser(description="ARIA benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    router = subparsers.add_parser("router", help="intent router vs legacy keyword scan")
+    router.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    router.add_argument("--utterances", type=int, default=2000)
+    router.add_argument("--seed", type=int, default=7)
+
+    recognizers = subparsers.add_parser("recognizers", help="latency/WER of speech-to-text backends")
+    recognizers.add_argument("--fixtures", required=True, help="folder of name.wav + name.txt files")
+    recognizers.add_argument("--backends", nargs="+", default=["sphinx", "vosk", "whisper", "http"],
+                             choices=sorted(RECOGNIZER_BACKENDS))
+    recognizers.add_argument("--url", default="http://127.0.0.1:8765/recognize")
+    recognizers.add_argument("--vosk-model", default="model")
+    recognizers.add_argument("--whisper-model", default="base.en")
+
+    stand_in = subparsers.add_parser("serve-recognizer", help="local stand-in recognition server")
+    stand_in.add_argument("--fixtures", help="answer with the transcript of matching WAV fixtures")
+    stand_in.add_argument("--default-text", default="", help="transcript for unknown audio")
+    stand_in.add_argument("--delay-ms", type=float, default=0.0, help="simulated processing time")
+    stand_in.add_argument("--host", default="127.0.0.1")
+    stand_in.add_argument("--port", type=int, default=8765)
+
+    commands = subparsers.add_parser("commands", help="headless command-handling regression benchmark")
+    commands.add_argument("--corpus", default="benchmarks/corpus.jsonl")
+    commands.add_argument("--repeat", type=int, default=5)
+    commands.add_argument("--save", help="write the report as JSON (use as a future baseline)")
+    commands.add_argument("--baseline", help="compare against a saved report and fail on regressions")
+    commands.add_argument("--tolerance", type=float, default=0.5, help="allowed relative p95 growth")
+    commands.add_argument("--slack-ms", type=float, default=0.5, help="allowed absolute p95 growth")
+
+    weather = subparsers.add_parser("weather", help="weather client against a local stand-in server")
+    weather.add_argument("--delay-ms", type=float, default=80.0, help="simulated upstream latency")
+    weather.add_argument("--calls", type=int, default=20)
+    weather.add_argument("--ttl", type=float, default=0.3, help="cache TTL in seconds")
+
+    spoken_math = subparsers.add_parser("math", help="spoken-math engine fuzz and speed vs legacy eval")
+    spoken_math.add_argument("--cases", type=int, default=2000)
+    spoken_math.add_argument("--seed", type=int, default=11)
+
+    store = subparsers.add_parser("store", help="indexed schedule/contacts store at large sizes")
+    store.add_argument("--contacts", type=int, default=100000)
+    store.add_argument("--years", type=int, default=5)
+    store.add_argument("--per-day", type=int, default=6, help="appointments per day")
+    store.add_argument("--seed", type=int, default=3)
+
+    fuzzy = subparsers.add_parser("contacts", help="fuzzy/phonetic contact resolver at large sizes")
+    fuzzy.add_argument("--contacts", type=int, default=100000)
+    fuzzy.add_argument("--queries", type=int, default=1000)
+    fuzzy.add_argument("--seed", type=int, default=7)
+
+    wake = subparsers.add_parser("wake", help="wake word false-accept/false-reject rates and CPU on WAV fixtures")
+    wake.add_argument("--fixtures", required=True, help="folder of name.wav + name.txt files")
+    wake.add_argument("--engines", nargs="+", default=sorted(WAKE_WORD_SPOTTERS), choices=sorted(WAKE_WORD_SPOTTERS))
+    wake.add_argument("--wake-words", nargs="+", help="default: wake_word from user_preferences.json")
+    wake.add_argument("--sensitivity", type=float, nargs="+", default=[0.6, 0.8, 0.9])
+    wake.add_argument("--vosk-model", default="model")
+
+    vad = subparsers.add_parser("vad", help="end-of-speech latency: frame VAD vs recognizer.listen")
+    vad.add_argument("--fixtures", help="folder of WAV files (default: synthetic utterances)")
+    vad.add_argument("--clips", type=int, default=50)
+    vad.add_argument("--frame-ms", type=int, default=30, choices=[10, 20, 30])
+    vad.add_argument("--aggressiveness", type=int, default=2, choices=[0, 1, 2, 3])
+    vad.add_argument("--seed", type=int, default=7)
+
+    serving = subparsers.add_parser("server", help="load-generate concurrent clients against server mode")
+    serving.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    serving.add_argument("--requests", type=int, default=50, help="requests per client")
+    serving.add_argument("--corpus", default="benchmarks/corpus.jsonl")
+
+    history = subparsers.add_parser("history", help="conversation log append cost, fsync batching and streaming scans")
+    history.add_argument("--days", type=int, default=180)
+    history.add_argument("--turns-per-day", type=int, default=300)
+    history.add_argument("--segment-mb", type=int, default=4)
+    history.add_argument("--seed", type=int, default=5)
+
+    semantic = subparsers.add_parser("semantic", help="semantic intent fallback accuracy and latency vs keywords")
+    semantic.add_argument("--corpus", nargs="+", default=["benchmarks/paraphrases.jsonl", "benchmarks/corpus.jsonl"])
+    semantic.add_argument("--thresholds", type=float, nargs="+", default=[0.3, 0.4, 0.5])
+    semantic.add_argument("--repeat", type=int, default=50)
+    semantic.add_argument("--show-errors", action="store_true")
+
+    plugins = subparsers.add_parser("plugins", help="startup time and memory with many lazily loaded plugins")
+    plugins.add_argument("--counts", type=int, nargs="+", default=[0, 50, 200])
+    plugins.add_argument("--payload-kb", type=int, default=256, help="memory each synthetic handler module allocates")
+    plugins.add_argument("--seed", type=int, default=13)
+
+    reminders = subparsers.add_parser("reminders", help="reminder scheduler scaling, resync cost and simulated-clock firing")
+    reminders.add_argument("--counts", type=int, nargs="+", default=[1000, 10000, 50000])
+    reminders.add_argument("--entries", type=int, default=20000, help="schedule entries for the resync test")
+    reminders.add_argument("--edits", type=int, default=50)
+    reminders.add_argument("--wakeups", type=int, default=50)
+    reminders.add_argument("--seed", type=int, default=17)
+
+    replay = subparsers.add_parser("replay", help="offline end-to-end latency regression suite over recorded sessions")
+    replay.add_argument("--archives", nargs="+", help="session zips from --record (default: synthesize one from --corpus)")
+    replay.add_argument("--corpus", default="benchmarks/corpus.jsonl")
+    replay.add_argument("--speed", type=float, default=0.0, help="1 for real time, 0 for no waiting")
+    replay.add_argument("--save", help="write the reports as JSON (use as a future baseline)")
+    replay.add_argument("--baseline", help="compare against saved reports and fail on regressions")
+    replay.add_argument("--tolerance", type=float, default=0.5, help="allowed relative p95 growth")
+    replay.add_argument("--slack-ms", type=float, default=0.5, help="allowed absolute p95 growth")
+    replay.add_argument("--seed", type=int, default=19)
+
+    noise = subparsers.add_parser("noise", help="missed, runaway and timed-out utterances as background noise changes")
+    noise.add_argument("--fixtures", help="folder of noisy name.wav (+ name.txt) recordings, played back to back")
+    noise.add_argument("--utterances", type=int, default=48)
+    noise.add_argument("--levels", type=float, nargs="+", default=[40, 600, 200, 1000, 60],
+                       help="synthetic noise RMS, stepped through in order")
+    noise.add_argument("--frame-ms", type=int, default=30)
+    noise.add_argument("--timeout", type=float, default=5.0, help="listen timeout in seconds")
+    noise.add_argument("--max-seconds", type=int, default=15)
+    noise.add_argument("--window-seconds", type=int, default=5)
+    noise.add_argument("--percentile", type=float, default=15.0)
+    noise.add_argument("--ratio", type=float, default=2.0)
+    noise.add_argument("--seed", type=int, default=7)
+
+    args = parser.parse_args(argv)
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
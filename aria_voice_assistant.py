@@ -5,74 +5,3734 @@ Version 2.0.0 - Created by Dian
 """
 
 import os
+import re
 import sys
+import argparse
+import bisect
 import time
 import json
+import queue
+import sqlite3
+import shutil
+import hashlib
+import math
+import functools
+import platform
+import subprocess
 import datetime
 import webbrowser
 import threading
+import importlib
+import importlib.util
+import contextlib
+import contextvars
+import inspect
+import io
+import uuid
+import weakref
+import zipfile
+from array import array
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from http import HTTPStatus
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-# Voice and Speech Libraries with error handling
+_MODULE_LOAD_STARTED = time.perf_counter()
+
+# Seconds spent importing each optional library, filled in on first use
+IMPORT_TIMINGS: Dict[str, float] = {}
+
+
+class LazyModule:
+    """Proxy that imports a module the first time one of its attributes is used"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                started = time.perf_counter()
+                self._module = importlib.import_module(self._name)
+                IMPORT_TIMINGS[self._name] = time.perf_counter() - started
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._module or self._load(), attr)
+
+
+def optional_import(name: str, package: str) -> Optional[LazyModule]:
+    """Return a lazy proxy for an installed module, or None with an install hint"""
+    if importlib.util.find_spec(name) is None:
+        print(f"Warning: {name} not installed. Run: pip install {package}")
+        return None
+    return LazyModule(name)
+
+
+# Only server mode needs asyncio; keep it off the startup path
+asyncio = LazyModule("asyncio")
+
+# Voice and Speech Libraries, imported on first use
+sr = optional_import("speech_recognition", "speechrecognition")
+SPEECH_RECOGNITION_AVAILABLE = sr is not None
+
+pyttsx3 = optional_import("pyttsx3", "pyttsx3")
+TTS_AVAILABLE = pyttsx3 is not None
+
+# Environment and HTTP
 try:
-    import speech_recognition as sr  # type: ignore
-    SPEECH_RECOGNITION_AVAILABLE = True
+    from dotenv import load_dotenv  # type: ignore
+    DOTENV_AVAILABLE = True
 except ImportError:
-    print("Warning: speech_recognition not installed. Run: pip install speechrecognition")
-    SPEECH_RECOGNITION_AVAILABLE = False
-    sr = None  # type: ignore
+    print("Warning: python-dotenv not installed. Run: pip install python-dotenv")
+    DOTENV_AVAILABLE = False
+    def load_dotenv():  # type: ignore
+        pass
+
+requests = optional_import("requests", "requests")
+REQUESTS_AVAILABLE = requests is not None
+
+psutil = optional_import("psutil", "psutil")
+PSUTIL_AVAILABLE = psutil is not None
+
+# NumPy speeds up the semantic intent fallback; the pure-Python path is used without it
+numpy = LazyModule("numpy") if importlib.util.find_spec("numpy") is not None else None
+
+# Console colors and formatting
+class Colors:
+    CYAN = '\033[96m'
+    BLUE = '\033[94m'
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    PURPLE = '\033[95m'
+    WHITE = '\033[97m'
+    BOLD = '\033[1m'
+    DIM = '\033[2m'
+    END = '\033[0m'
+
+# Load environment variables
+load_dotenv()
+MODULE_LOAD_SECONDS = time.perf_counter() - _MODULE_LOAD_STARTED
+
+# Tokens that carry little intent on their own ("what is", "how hot")
+ROUTER_WEAK_TOKENS = {"what", "what's", "is", "how", "the", "a", "an", "to", "for", "up", "in", "of", "today",
+                      "it", "please"}
+
+# Keywords several categories share, and the category they mean when they are the utterance's only strong
+# word ("stop", "stop it"). Next to other words ("stop the music", "remind me to stop") they count for none
+# of their categories, and the rest of the utterance decides.
+ROUTER_SHARED_OWNERS = {"stop": "Exit"}
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def split_sentences(text: Union[str, Iterable[str]]) -> Iterator[str]:
+    """Lazily split a response (or a stream of response pieces) into sentences"""
+    pieces = [text] if isinstance(text, str) else text
+    for piece in pieces:
+        for sentence in _SENTENCE_BOUNDARY.split(piece.strip()):
+            if sentence:
+                yield sentence
+
+
+_WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+DAY_WORDS = frozenset(("today", "tomorrow", "yesterday") + _WEEKDAYS)
+
+
+def parse_day(text: str, today: Optional[datetime.date] = None) -> Tuple[datetime.date, str]:
+    """The day a request is about ("tomorrow", "friday") and how to say it; today by default"""
+    today = today or datetime.date.today()
+    words = tokenize(text)
+    if "tomorrow" in words:
+        return today + datetime.timedelta(days=1), "tomorrow"
+    if "yesterday" in words:
+        return today - datetime.timedelta(days=1), "yesterday"
+    for word in words:
+        if word in _WEEKDAYS:
+            ahead = (_WEEKDAYS.index(word) - today.weekday()) % 7
+            return today + datetime.timedelta(days=ahead), word.capitalize() if ahead else "today"
+    return today, "today"
+
+
+# Follow-ups that lean on the previous turn: "and tomorrow?", "what about Paris?", "call her"
+_FOLLOW_UP = re.compile(r"^\s*(?:and|what about|how about)\s+(?P<rest>.+?)[\s?.!]*$", re.IGNORECASE)
+_PRONOUN = re.compile(r"\b(?:him|her|them)\b", re.IGNORECASE)
+
+
+class IntentRouter:
+    """
+    Precompiled keyword router.
+    Builds a token-level Aho-Corasick automaton from the command keywords so
+    every keyword in an utterance is found in a single pass, on word boundaries.
+    """
+
+    def __init__(self, commands: Dict[str, List[str]]):
+        self.intents = list(commands)
+        self._order = {intent: i for i, intent in enumerate(self.intents)}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self.phrases: List[Tuple[str, ...]] = []
+        self._phrase_intents: List[List[str]] = []
+        self._phrase_weights: List[float] = []
+        self._phrase_owners: List[Optional[str]] = []
+
+        phrase_ids: Dict[Tuple[str, ...], int] = {}
+        for intent, keywords in commands.items():
+            for keyword in keywords:
+                tokens = tuple(tokenize(keyword))
+                if not tokens:
+                    continue
+                if tokens not in phrase_ids:
+                    phrase_ids[tokens] = len(self.phrases)
+                    self.phrases.append(tokens)
+                    self._phrase_intents.append([])
+                    self._insert(tokens, phrase_ids[tokens])
+                intents = self._phrase_intents[phrase_ids[tokens]]
+                if intent not in intents:
+                    intents.append(intent)
+
+        # Shared and generic phrases are weaker evidence than specific ones
+        for tokens, intents in zip(self.phrases, self._phrase_intents):
+            weight = sum(0.25 if token in ROUTER_WEAK_TOKENS else 1.0 for token in tokens)
+            self._phrase_weights.append(weight / len(intents))
+            self._phrase_owners.append(ROUTER_SHARED_OWNERS.get(" ".join(tokens)))
+
+        self._build_failure_links()
+
+    def _insert(self, tokens: Tuple[str, ...], phrase_id: int):
+        """Add a phrase to the trie"""
+        state = 0
+        for token in tokens:
+            next_state = self._goto[state].get(token)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][token] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append(phrase_id)
+
+    def _build_failure_links(self):
+        """Compute Aho-Corasick failure links breadth-first"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(token, 0)
+                self._out[next_state].extend(self._out[self._fail[next_state]])
+
+    def _scan(self, text: str):
+        """Yield the id of each distinct phrase found in the text"""
+        seen = set()
+        state = 0
+        for token in tokenize(text):
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            for phrase_id in self._out[state]:
+                if phrase_id not in seen:
+                    seen.add(phrase_id)
+                    yield phrase_id
+
+    def matches(self, text: str) -> List[Tuple[str, ...]]:
+        """Return every keyword phrase found in the text"""
+        return [self.phrases[phrase_id] for phrase_id in self._scan(text)]
+
+    def rank(self, text: str) -> List[Tuple[str, float]]:
+        """Return matching intents with scores, best first"""
+        scores: Dict[str, float] = {}
+        strong = None
+        for phrase_id in self._scan(text):
+            weight = self._phrase_weights[phrase_id]
+            intents = self._phrase_intents[phrase_id]
+            owner = self._phrase_owners[phrase_id]
+            if owner is not None:
+                if strong is None:
+                    strong = [token for token in tokenize(text) if token not in ROUTER_WEAK_TOKENS]
+                if strong != list(self.phrases[phrase_id]):
+                    continue
+                intents = [owner]
+            for intent in intents:
+                scores[intent] = scores.get(intent, 0.0) + weight
+        # Ties go to the category declared first, as the old elif chain did
+        return sorted(scores.items(), key=lambda item: (-item[1], self._order[item[0]]))
+
+    def best(self, text: str) -> Optional[str]:
+        """Return the highest scoring intent, or None"""
+        ranked = self.rank(text)
+        return ranked[0][0] if ranked else None
+
+
+# Paraphrases for the semantic fallback, alongside each intent's keywords.
+# Exit and Cancel are left out: guessing those would end or drop work the user wanted.
+INTENT_EXAMPLES = {
+    "Greetings": ["hello there", "hi aria", "hey there how are you", "good to see you", "howdy",
+                  "greetings", "morning aria", "yo what's up", "nice to meet you"],
+    "Time & Date": ["what time is it", "tell me the time", "what's the time right now", "what day is it",
+                    "what's today's date", "which day of the week is it", "what month is it", "do you know the hour"],
+    "Schedule": ["what's on my agenda", "do i have any meetings", "what am i doing today", "am i busy today",
+                 "what's planned for tomorrow", "any appointments this week", "what does my day look like",
+                 "what's next on my calendar", "when is my next meeting", "do i have plans", "am i free later",
+                 "what's happening this evening", "how's my week looking"],
+    "Weather": ["what's the weather like", "is it raining outside", "will it rain today", "do i need an umbrella",
+                "how warm is it outside", "is it sunny", "is it cold out", "what's the forecast for tomorrow",
+                "should i wear a jacket", "is there a storm coming", "how humid is it", "will it snow",
+                "is it windy", "what's it like outside"],
+    "Search": ["search the web for python", "google best pizza near me", "look up the news", "find information about mars",
+               "search online for recipes", "browse for cheap flights", "can you find me articles about ai",
+               "look something up for me"],
+    "Calculator": ["what is five plus three", "calculate twenty times four", "how much is ten divided by two",
+                   "add seven and eight", "square root of eighty one", "what's twelve percent of fifty",
+                   "multiply nine by six", "subtract four from ten", "do some math for me", "what's 3 plus 4",
+                   "the sum of two and two", "12 minus 5"],
+    "System": ["how is my computer doing", "check system status", "cpu usage", "how much memory is free",
+               "is my laptop running hot", "battery level", "how much disk space do i have", "system performance report",
+               "is my pc slow", "how's the machine holding up"],
+    "Contacts": ["call mom", "phone sophie", "what's egi's number", "send an email to my boss", "how do i reach egi",
+                 "give me sophie's email", "dial my brother", "who is in my contacts", "contact details for egi"],
+    "Media": ["play some music", "put on a song", "play jazz", "i want to listen to taylor swift", "play a video",
+              "pause the music", "play something relaxing", "queue up some rock", "let's hear some beats",
+              "shuffle my playlist"],
+}
+
+
+class SemanticRouter:
+    """
+    Fallback intent classifier for paraphrases the keyword router misses.
+    Example utterances are embedded as L2-normalised TF-IDF vectors over word
+    unigrams and character 3-5 grams (padded per word) and stacked into one
+    matrix. A query goes to the intent of its most similar example (cosine),
+    if the similarity clears the threshold. classify_batch() scores many
+    queries with one matrix product. Without NumPy an inverted index over the
+    same features gives the same scores.
+    """
+
+    NGRAM_SIZES = (3, 4, 5)
+    # Filler that says nothing about the intent ("can you tell me what ...")
+    STOP_WORDS = frozenset("""a an the is are am was be it its i me you your we our to of for on in at by with
+        and or do does did can could would will should please tell show give let lets what whats how hows
+        there this that some any right now just""".split())
+
+    def __init__(self, examples: Dict[str, List[str]], threshold: float = 0.4, use_numpy: bool = True):
+        self.examples = examples
+        self.threshold = threshold
+        self.use_numpy = use_numpy and numpy is not None
+        self.intents: List[str] = []
+        self.vocabulary: Dict[str, int] = {}
+        self.idf: List[float] = []
+        self.fitted = False
+        self._example_intents: List[int] = []
+        self._matrix = None
+        self._postings: Dict[int, List[Tuple[int, float]]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def features(cls, text: str) -> Dict[str, float]:
+        """
+        Word and character n-gram weights. Each word's n-grams together have
+        unit length, like the word itself, so long words don't outvote short ones
+        """
+        counts: Dict[str, float] = {}
+        for word in tokenize(text):
+            for feature, weight in cls._word_features(word):
+                counts[feature] = counts.get(feature, 0.0) + weight
+        return counts
+
+    @classmethod
+    @functools.lru_cache(maxsize=8192)
+    def _word_features(cls, word: str) -> Tuple[Tuple[str, float], ...]:
+        word = word.replace("'", "")
+        if word in cls.STOP_WORDS:
+            return ()
+        if word[0].isdigit():
+            return (("w #", 1.0),)
+        padded = f" {word} "
+        grams = [padded[start:start + size] for size in cls.NGRAM_SIZES for start in range(len(padded) - size + 1)]
+        share = 1 / math.sqrt(len(grams))
+        return (("w " + word, 1.0),) + tuple((gram, share) for gram in grams)
+
+    def fit(self):
+        """Build the vocabulary, IDF weights and example matrix (once; safe to call from any thread)"""
+        with self._lock:
+            if self.fitted:
+                return
+            rows = []
+            for intent, utterances in self.examples.items():
+                self.intents.append(intent)
+                for utterance in utterances:
+                    rows.append(self.features(utterance))
+                    self._example_intents.append(len(self.intents) - 1)
+            frequency: Counter = Counter()
+            for row in rows:
+                frequency.update(row.keys())
+            self.vocabulary = {feature: index for index, feature in enumerate(sorted(frequency))}
+            self.idf = [0.0] * len(self.vocabulary)
+            for feature, index in self.vocabulary.items():
+                self.idf[index] = math.log((1 + len(rows)) / (1 + frequency[feature])) + 1
+            vectors = [self.embed(row) for row in rows]
+            if self.use_numpy:
+                self._matrix = numpy.zeros((len(vectors), len(self.vocabulary)), dtype=numpy.float32)
+                for row, vector in enumerate(vectors):
+                    for index, weight in vector.items():
+                        self._matrix[row, index] = weight
+            else:
+                for row, vector in enumerate(vectors):
+                    for index, weight in vector.items():
+                        self._postings.setdefault(index, []).append((row, weight))
+            self.fitted = True
+
+    def embed(self, text: Union[str, Dict[str, float]]) -> Dict[int, float]:
+        """Sparse unit-length TF-IDF vector (feature index -> weight); unknown features are dropped"""
+        counts = self.features(text) if isinstance(text, str) else text
+        vector = {self.vocabulary[feature]: count * self.idf[self.vocabulary[feature]]
+                  for feature, count in counts.items() if feature in self.vocabulary}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        return {index: weight / norm for index, weight in vector.items()}
+
+    def _answer(self, row: int, score: float) -> Tuple[Optional[str], float]:
+        """The intent of the best-matching example row, if its similarity clears the threshold"""
+        return (self.intents[self._example_intents[row]] if score >= self.threshold else None), score
+
+    def classify_batch(self, texts: List[str]) -> List[Tuple[Optional[str], float]]:
+        """(intent or None, similarity) per text"""
+        self.fit()
+        vectors = [self.embed(text) for text in texts]
+        if self._matrix is None:
+            results = []
+            for vector in vectors:
+                scores = [0.0] * len(self._example_intents)
+                for index, weight in vector.items():
+                    for row, example_weight in self._postings.get(index, ()):
+                        scores[row] += weight * example_weight
+                row = max(range(len(scores)), key=scores.__getitem__)
+                results.append(self._answer(row, scores[row]))
+            return results
+        if len(vectors) == 1:
+            # One query only touches the columns of its own features
+            similarities = (self._matrix[:, list(vectors[0])] @ numpy.fromiter(vectors[0].values(), numpy.float32))[None]
+            row = int(similarities[0].argmax())
+            return [self._answer(row, float(similarities[0, row]))]
+        queries = numpy.zeros((len(vectors), self._matrix.shape[1]), dtype=numpy.float32)
+        rows = [row for row, vector in enumerate(vectors) for _ in vector]
+        columns = [index for vector in vectors for index in vector]
+        queries[rows, columns] = [weight for vector in vectors for weight in vector.values()]
+        similarities = queries @ self._matrix.T
+        rows = similarities.argmax(axis=1)
+        return [self._answer(int(row), float(similarities[i, row])) for i, row in enumerate(rows)]
+
+    def classify(self, text: str) -> Tuple[Optional[str], float]:
+        return self.classify_batch([text])[0]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram.
+    Values are stored in microseconds in log-linear buckets: every power of
+    two is split into 2**SUB_BUCKET_BITS equal sub-buckets, so any value is
+    reported within ~3% while memory grows only with the dynamic range.
+    """
+
+    SUB_BUCKET_BITS = 5
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _index(cls, micros: int) -> int:
+        shift = max(0, micros.bit_length() - cls.SUB_BUCKET_BITS - 1)
+        return (shift << cls.SUB_BUCKET_BITS) + (micros >> shift)
+
+    @classmethod
+    def _bounds(cls, index: int) -> Tuple[int, int]:
+        """Lowest and one-past-highest microsecond value of a bucket"""
+        shift = max(0, (index >> cls.SUB_BUCKET_BITS) - 1)
+        mantissa = index - (shift << cls.SUB_BUCKET_BITS)
+        return mantissa << shift, (mantissa + 1) << shift
+
+    def record(self, seconds: float):
+        index = self._index(max(0, int(seconds * 1e6)))
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def percentile(self, pct: float) -> float:
+        """Value in seconds below which pct percent of samples fall"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, math.ceil(pct / 100 * self.count))
+            seen = 0
+            for index in sorted(self.counts):
+                seen += self.counts[index]
+                if seen >= rank:
+                    low, high = self._bounds(index)
+                    return min((low + high) / 2e6, self.max)
+        return self.max
+
+    def cumulative(self, bounds: Iterable[float]) -> List[int]:
+        """Sample counts at or below each bound (seconds), for Prometheus buckets"""
+        with self._lock:
+            buckets = sorted((self._bounds(index)[1], count) for index, count in self.counts.items())
+        result, seen, position = [], 0, 0
+        for bound in bounds:
+            while position < len(buckets) and buckets[position][0] <= bound * 1e6:
+                seen += buckets[position][1]
+                position += 1
+            result.append(seen)
+        return result
+
+
+class Metrics:
+    """
+    Process-wide timing spans.
+    span() times a block and aggregates it into a LatencyHistogram per name.
+    When tracing is on, every span also becomes a JSONL event, written in
+    batches by a background thread so the timed code never touches the disk.
+    gauge() keeps the latest value of levels such as the noise floor.
+    serve() exposes both in Prometheus text format on localhost.
+    """
+
+    PROMETHEUS_BOUNDS = tuple(0.001 * 2 ** k for k in range(16))
+
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.gauges: Dict[str, float] = {}
+        self.server = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._trace_queue: Optional[queue.SimpleQueue] = None
+        self._trace_thread: Optional[threading.Thread] = None
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes):
+        """Time the enclosed block as `name`, nested under any open span on this thread"""
+        stack = self._local.__dict__.setdefault("stack", [])
+        parent = stack[-1] if stack else None
+        stack.append(name)
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            stack.pop()
+            self.observe(name, time.perf_counter() - started, parent=parent, error=error, **attributes)
+
+    def observe(self, name: str, seconds: float, **attributes):
+        """Record a duration measured elsewhere"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, LatencyHistogram())
+        histogram.record(seconds)
+        collected = getattr(self._local, "collected", None)
+        if collected is not None:
+            collected[name] = collected.get(name, 0.0) + seconds * 1000
+        if self._trace_queue is not None:
+            event = {"ts": round(time.time() - seconds, 6), "span": name, "ms": round(seconds * 1000, 3),
+                     "thread": threading.current_thread().name}
+            event.update((key, value) for key, value in attributes.items() if value is not None)
+            self._trace_queue.put(event)
+
+    def gauge(self, name: str, value: float):
+        """Record the current value of a level such as the noise floor"""
+        self.gauges[name] = value
+        if self._trace_queue is not None:
+            self._trace_queue.put({"ts": round(time.time(), 6), "gauge": name, "value": round(value, 3)})
+
+    @contextlib.contextmanager
+    def collect(self):
+        """Yield a dict that sums span milliseconds by name recorded on this thread in the block"""
+        previous = getattr(self._local, "collected", None)
+        self._local.collected = collected = {}
+        try:
+            yield collected
+        finally:
+            self._local.collected = previous
+
+    def trace_to(self, path: Path):
+        """Append span events to a JSONL file"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._trace_queue = queue.SimpleQueue()
+        self._trace_thread = threading.Thread(target=self._write_trace, args=(path, self._trace_queue),
+                                              daemon=True, name="aria-trace")
+        self._trace_thread.start()
+
+    def _write_trace(self, path: Path, events: "queue.SimpleQueue"):
+        """Drain queued events into the trace file, one write per batch"""
+        with open(path, "a") as f:
+            while True:
+                batch = [events.get()]
+                while not events.empty() and batch[-1] is not None:
+                    batch.append(events.get())
+                closing = batch[-1] is None
+                lines = [json.dumps(event, default=str) for event in batch if event is not None]
+                if lines:
+                    f.write("\n".join(lines) + "\n")
+                    f.flush()
+                if closing:
+                    return
+
+    def prometheus_text(self) -> str:
+        """Histograms in the Prometheus text exposition format"""
+        lines = ["# HELP aria_span_seconds Time spent in each ARIA stage", "# TYPE aria_span_seconds histogram"]
+        for name, histogram in sorted(self.histograms.items()):
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            for bound, count in zip(self.PROMETHEUS_BOUNDS, histogram.cumulative(self.PROMETHEUS_BOUNDS)):
+                lines.append(f'aria_span_seconds_bucket{{span="{label}",le="{bound:g}"}} {count}')
+            lines.append(f'aria_span_seconds_bucket{{span="{label}",le="+Inf"}} {histogram.count}')
+            lines.append(f'aria_span_seconds_sum{{span="{label}"}} {histogram.total:.6f}')
+            lines.append(f'aria_span_seconds_count{{span="{label}"}} {histogram.count}')
+        for name, value in sorted(self.gauges.items()):
+            lines.extend((f"# TYPE aria_{name} gauge", f"aria_{name} {value:.3f}"))
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """Serve /metrics from a background thread"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True, name="aria-metrics").start()
+
+    def report(self):
+        """Print a latency table of every span"""
+        if not self.histograms:
+            return
+        print(f"{Colors.WHITE}{'span':<28} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}{Colors.END}")
+        for name, histogram in sorted(self.histograms.items()):
+            print(f"{Colors.WHITE}{name:<28} {histogram.count:>6} {histogram.percentile(50) * 1000:>8.1f} "
+                  f"{histogram.percentile(95) * 1000:>8.1f} {histogram.percentile(99) * 1000:>8.1f}{Colors.END}")
+
+    def close(self):
+        """Flush the trace file and stop the endpoint"""
+        if self._trace_queue is not None:
+            self._trace_queue.put(None)
+            self._trace_thread.join(timeout=5)
+            self._trace_queue = None
+        if self.server is not None:
+            self.server.shutdown()
+            self.server = None
+
+
+# Shared by every component so spans from all threads land in one place
+METRICS = Metrics()
+
+
+class SamplingProfiler:
+    """
+    Wall-clock stack sampler over every thread.
+    cProfile only sees the thread it was enabled on; this catches the
+    pipeline, render and refresh threads too. Stacks are counted in the
+    collapsed ("folded") format that flame graph tools read.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name="aria-sampler")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write_folded(self, path: Path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top_functions(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """Leaf frames that were on CPU (or blocked) most often"""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+
+def profile_session(session, directory: Path):
+    """Run session() under cProfile plus the sampler and print where the time went"""
+    import cProfile
+    import pstats
+    directory.mkdir(parents=True, exist_ok=True)
+    profiler = cProfile.Profile()
+    sampler = SamplingProfiler()
+    sampler.start()
+    profiler.enable()
+    try:
+        return session()
+    finally:
+        profiler.disable()
+        sampler.stop()
+        profiler.dump_stats(directory / "profile.prof")
+        sampler.write_folded(directory / "profile.folded")
+        print(f"\n{Colors.CYAN}{Colors.BOLD}Profile (main thread, cumulative):{Colors.END}")
+        pstats.Stats(profiler, stream=sys.stdout).sort_stats("cumulative").print_stats(15)
+        print(f"{Colors.CYAN}{Colors.BOLD}Sampled hot spots (all threads):{Colors.END}")
+        total = sum(sampler.stacks.values()) or 1
+        for function, count in sampler.top_functions():
+            print(f"{Colors.WHITE}{count / total:>6.1%}  {function}{Colors.END}")
+        print(f"{Colors.DIM}Saved {directory / 'profile.prof'} and {directory / 'profile.folded'}{Colors.END}")
+
+
+class VoicePipeline:
+    """
+    Overlapped capture -> recognition -> dispatch -> playback engine.
+    Each stage runs on its own thread and hands work to the next through a
+    bounded queue, so the microphone keeps capturing while earlier utterances
+    are still being recognized or spoken.
+    """
+
+    STAGES = ("capture", "recognition", "dispatch", "playback")
+
+    def __init__(self, assistant: "AriaAssistant", queue_size: int = 4, barge_in: bool = False):
+        self.assistant = assistant
+        self.barge_in = barge_in
+        self.audio_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.text_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.speech_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.latencies: Dict[str, deque] = {stage: deque(maxlen=500) for stage in self.STAGES}
+        self.barge_in_count = 0
+        self._threads: List[threading.Thread] = []
+
+    def _record(self, stage: str, started: float):
+        """Record how long a stage took"""
+        self.latencies[stage].append(time.perf_counter() - started)
+
+    def _put(self, target: "queue.Queue", item):
+        """Block until the next stage has room, unless stopping"""
+        while not self.stop_event.is_set():
+            try:
+                target.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, source: "queue.Queue"):
+        """Wait for work from the previous stage, unless stopping"""
+        while not self.stop_event.is_set():
+            try:
+                return source.get(timeout=0.2)
+            except queue.Empty:
+                continue
+        return None
+
+    def _capture_loop(self):
+        """Capture utterances continuously"""
+        while not self.stop_event.is_set():
+            started = time.perf_counter()
+            try:
+                audio = self.assistant.capture_audio()
+            except Exception as e:
+                self.assistant.report_listen_error(e)
+                continue
+            self._record("capture", started)
+
+            # Barge-in: new speech cancels whatever is being said, unless it is only ARIA's own voice
+            if self.barge_in and self.assistant.is_speaking and self.assistant.is_barge_in(audio):
+                self.barge_in_count += 1
+                self.assistant.stop_speaking()
+            self._put(self.audio_queue, audio)
+
+    def _recognition_loop(self):
+        """Turn captured audio into text"""
+        while not self.stop_event.is_set():
+            audio = self._get(self.audio_queue)
+            if audio is None:
+                continue
+            started = time.perf_counter()
+            try:
+                if not self.assistant.passes_wake_gate(audio):
+                    continue
+                text = self.assistant.recognize_audio(audio)
+            except Exception as e:
+                self.assistant.report_listen_error(e)
+                continue
+            finally:
+                self._record("recognition", started)
+            print(f"{Colors.GREEN}{Colors.BOLD}{self.assistant.user_name}:{Colors.END} {Colors.WHITE}{text}{Colors.END}")
+            command = self.assistant.strip_wake_word(text.lower())
+            if not command:
+                self._put(self.speech_queue, (FIXED_RESPONSES["wake_ack"], "happy", False))
+                continue
+            self._put(self.text_queue, command)
+
+    def _dispatch_loop(self):
+        """Route recognized text to a response"""
+        while not self.stop_event.is_set():
+            for response, emotion in self.assistant.pending_speech():
+                self._put(self.speech_queue, (response, emotion, False))
+            try:
+                command = self.text_queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            started = time.perf_counter()
+            try:
+                with self.assistant.conversation_turn(utterance=command):
+                    response, emotion = self.assistant.process_command(command)
+            except Exception as e:
+                print(f"{Colors.RED}Error: {e}{Colors.END}")
+                response, emotion = FIXED_RESPONSES["error"], "concerned"
+            self._record("dispatch", started)
+
+            if response == "goodbye":
+                self._put(self.speech_queue, (self.assistant.goodbye_message(), "happy", True))
+                return
+            self._put(self.speech_queue, (response, emotion, False))
+
+    def _playback_loop(self):
+        """Speak responses in order"""
+        while not self.stop_event.is_set():
+            item = self._get(self.speech_queue)
+            if item is None:
+                continue
+            response, emotion, final = item
+            started = time.perf_counter()
+            try:
+                self.assistant.speak(response, emotion)
+            except Exception as e:
+                print(f"{Colors.RED}Error: {e}{Colors.END}")
+            self._record("playback", started)
+            if final:
+                self.stop_event.set()
+
+    def start(self):
+        """Start all stage threads"""
+        for stage, target in zip(self.STAGES, (self._capture_loop, self._recognition_loop,
+                                               self._dispatch_loop, self._playback_loop)):
+            thread = threading.Thread(target=target, name=f"aria-{stage}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Signal every stage to finish"""
+        self.stop_event.set()
+        self.assistant.stop_speaking()
+
+    def run(self):
+        """Run until the user says goodbye"""
+        self.start()
+        try:
+            while not self.stop_event.wait(0.5):
+                pass
+        finally:
+            self.stop()
+
+    def report(self):
+        """Print per-stage latency statistics"""
+        print(f"{Colors.CYAN}{Colors.BOLD}Pipeline Latency (ms):{Colors.END}")
+        for stage in self.STAGES:
+            samples = [value * 1000 for value in self.latencies[stage]]
+            if samples:
+                print(f"{Colors.WHITE}{stage:<12} n={len(samples):<4} "
+                      f"p50={percentile(samples, 50):.0f} p95={percentile(samples, 95):.0f} "
+                      f"max={max(samples):.0f}{Colors.END}")
+        if self.barge_in:
+            print(f"{Colors.WHITE}Barge-ins: {self.barge_in_count}{Colors.END}")
+
+
+class RecognizerBackend:
+    """
+    Speech-to-text engine behind listen().
+    Subclasses load their models in warm_up() so the cost is paid once at
+    startup, and raise sr.UnknownValueError / sr.RequestError like the
+    speech_recognition recognizers do.
+    """
+
+    name = "base"
+
+    def __init__(self, recognizer, config: Dict):
+        self.recognizer = recognizer
+        self.config = config
+
+    def warm_up(self):
+        """Load models ahead of the first utterance"""
+
+    def recognize(self, audio) -> str:
+        """Return the transcript for an AudioData clip"""
+        raise NotImplementedError
+
+    def _require_text(self, text: str) -> str:
+        """Treat an empty transcript as unintelligible audio"""
+        text = (text or "").strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class GoogleBackend(RecognizerBackend):
+    """Google Web Speech API (needs internet)"""
+
+    name = "google"
+
+    def recognize(self, audio) -> str:
+        return self.recognizer.recognize_google(audio, language=self.config["language"])
+
+
+class SphinxBackend(RecognizerBackend):
+    """CMU PocketSphinx, fully offline"""
+
+    name = "sphinx"
+
+    def warm_up(self):
+        import pocketsphinx  # type: ignore  # noqa: F401
+
+    def recognize(self, audio) -> str:
+        return self._require_text(self.recognizer.recognize_sphinx(audio, language=self.config["language"]))
+
+
+def _vosk_transcript(decoder, audio) -> str:
+    """Decode one utterance with a Vosk KaldiRecognizer and return its text"""
+    # Vosk's cffi binding wants bytes, not the memoryview slices FrameCapture hands out
+    decoder.AcceptWaveform(bytes(audio.get_raw_data(convert_rate=16000, convert_width=2)))
+    return json.loads(decoder.FinalResult()).get("text", "")
+
+
+class VoskBackend(RecognizerBackend):
+    """Vosk/Kaldi offline model, loaded once"""
+
+    name = "vosk"
+
+    def __init__(self, recognizer, config: Dict):
+        super().__init__(recognizer, config)
+        self.model = None
+
+    def warm_up(self):
+        from vosk import Model, SetLogLevel  # type: ignore
+        SetLogLevel(-1)
+        self.model = Model(self.config["vosk_model_path"])
+
+    def recognize(self, audio) -> str:
+        from vosk import KaldiRecognizer  # type: ignore
+        if self.model is None:
+            self.warm_up()
+        return self._require_text(_vosk_transcript(KaldiRecognizer(self.model, 16000), audio))
+
+
+class WhisperBackend(RecognizerBackend):
+    """faster-whisper (whisper.cpp-class CPU inference), loaded once"""
+
+    name = "whisper"
+
+    def __init__(self, recognizer, config: Dict):
+        super().__init__(recognizer, config)
+        self.model = None
+
+    def warm_up(self):
+        from faster_whisper import WhisperModel  # type: ignore
+        self.model = WhisperModel(self.config["whisper_model"], device="cpu", compute_type="int8")
+
+    def recognize(self, audio) -> str:
+        import numpy as np  # type: ignore
+        if self.model is None:
+            self.warm_up()
+        pcm = np.frombuffer(audio.get_raw_data(convert_rate=16000, convert_width=2), dtype=np.int16)
+        segments, _ = self.model.transcribe(pcm.astype(np.float32) / 32768.0,
+                                            language=self.config["language"].split("-")[0], beam_size=1)
+        return self._require_text(" ".join(segment.text for segment in segments))
+
+
+class HttpBackend(RecognizerBackend):
+    """
+    POSTs WAV audio to a recognition server and reads {"text": ...} back.
+    Point it at a local stand-in (python aria_benchmarks.py serve-recognizer)
+    or a self-hosted engine.
+    """
+
+    name = "http"
+
+    def recognize(self, audio) -> str:
+        import urllib.request
+        import urllib.error
+        request = urllib.request.Request(
+            self.config["recognizer_url"],
+            data=audio.get_wav_data(),
+            headers={"Content-Type": "audio/wav"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.config["listen_timeout"]) as response:
+                text = json.loads(response.read().decode("utf-8")).get("text", "")
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            raise sr.RequestError(f"recognition server unavailable: {e}")
+        return self._require_text(text)
+
+
+RECOGNIZER_BACKENDS = {
+    backend.name: backend
+    for backend in (GoogleBackend, SphinxBackend, VoskBackend, WhisperBackend, HttpBackend)
+}
+
+
+def create_recognizer_backend(name: str, recognizer, config: Dict) -> RecognizerBackend:
+    """Instantiate a recognizer backend by name"""
+    try:
+        return RECOGNIZER_BACKENDS[name](recognizer, config)
+    except KeyError:
+        raise ValueError(f"Unknown recognizer backend '{name}'. Choose from: {', '.join(RECOGNIZER_BACKENDS)}")
+
+
+class WakeWordSpotter:
+    """
+    Cheap local keyword spotter that gates full recognition.
+    Every captured phrase is checked against the wake words before it is
+    sent to the (possibly cloud) recognizer, so background chatter costs a
+    local keyword search instead of a full transcription.
+    """
+
+    name = "base"
+
+    def __init__(self, recognizer, wake_words: List[str], config: Dict):
+        self.recognizer = recognizer
+        self.wake_words = sorted({word.lower().strip() for word in wake_words if word.strip()}, key=len, reverse=True)
+        self.config = config
+
+    def warm_up(self):
+        """Load models ahead of the first phrase"""
+
+    def detect(self, audio) -> Optional[str]:
+        """Return the wake word heard in an AudioData clip, or None"""
+        raise NotImplementedError
+
+    def _match(self, hypothesis: str) -> Optional[str]:
+        """First wake word contained in a keyword-search hypothesis"""
+        hypothesis = f" {' '.join(tokenize(hypothesis))} "
+        return next((word for word in self.wake_words if f" {word} " in hypothesis), None)
+
+
+class SphinxSpotter(WakeWordSpotter):
+    """PocketSphinx keyword search (keyphrase thresholds from wake_word_sensitivity)"""
+
+    name = "sphinx"
+
+    def warm_up(self):
+        import pocketsphinx  # type: ignore  # noqa: F401
+
+    def detect(self, audio) -> Optional[str]:
+        sensitivity = self.config["wake_word_sensitivity"]
+        try:
+            hypothesis = self.recognizer.recognize_sphinx(
+                audio, language=self.config["language"],
+                keyword_entries=[(word, sensitivity) for word in self.wake_words])
+        except sr.UnknownValueError:
+            return None
+        return self._match(hypothesis)
+
+
+class VoskSpotter(WakeWordSpotter):
+    """Vosk decoder restricted to a grammar of the wake words"""
+
+    name = "vosk"
+
+    def __init__(self, recognizer, wake_words: List[str], config: Dict):
+        super().__init__(recognizer, wake_words, config)
+        self.model = None
+
+    def warm_up(self):
+        from vosk import Model, SetLogLevel  # type: ignore
+        SetLogLevel(-1)
+        self.model = Model(self.config["vosk_model_path"])
+
+    def detect(self, audio) -> Optional[str]:
+        from vosk import KaldiRecognizer  # type: ignore
+        if self.model is None:
+            self.warm_up()
+        decoder = KaldiRecognizer(self.model, 16000, json.dumps(self.wake_words + ["[unk]"]))
+        return self._match(_vosk_transcript(decoder, audio))
+
+
+WAKE_WORD_SPOTTERS = {
+    "sphinx": SphinxSpotter,
+    "vosk": VoskSpotter,
+}
+
+
+def create_wake_word_spotter(name: str, recognizer, wake_words: List[str], config: Dict) -> Optional[WakeWordSpotter]:
+    """Build and warm up a spotter; "auto" takes the first engine that loads, None if none does"""
+    names = list(WAKE_WORD_SPOTTERS) if name == "auto" else [name]
+    for candidate in names:
+        if candidate not in WAKE_WORD_SPOTTERS:
+            raise ValueError(f"Unknown wake word engine '{candidate}'. Choose from: auto, {', '.join(WAKE_WORD_SPOTTERS)}")
+        spotter = WAKE_WORD_SPOTTERS[candidate](recognizer, wake_words, config)
+        try:
+            spotter.warm_up()
+            return spotter
+        except Exception:
+            continue
+    return None
+
+
+def frame_rms(frame) -> float:
+    """Root-mean-square level of a 16-bit PCM frame"""
+    samples = memoryview(frame).cast("h")
+    if not len(samples):
+        return 0.0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+
+def frame_levels(audio, frame_ms: int) -> Iterator[float]:
+    """RMS level of each whole frame_ms frame of captured AudioData"""
+    pcm = audio.get_raw_data(convert_width=2)
+    step = audio.sample_rate * frame_ms // 1000 * 2
+    for offset in range(0, len(pcm) - step + 1, step):
+        yield frame_rms(pcm[offset:offset + step])
+
+
+class NoiseFloorEstimator:
+    """
+    Running estimate of the background noise level and the speech threshold.
+    The levels of the last `window` frames are kept in a ring plus a sorted
+    copy, so a low percentile of them costs O(log n) per frame. Speech seldom
+    fills a whole window, so the quiet end of it is the noise ("minimum
+    statistics"); that keeps the estimate moving when the room gets louder,
+    where averaging only frames already judged silent would stall. The
+    percentile is smoothed with an EMA, and the threshold is `ratio` times
+    the floor, never below min_threshold. Every `sample_every` frames the
+    floor and threshold are published as gauges and kept in `history`.
+    """
+
+    def __init__(self, window: int = 165, percentile: float = 15.0, smoothing: float = 0.05, ratio: float = 2.0,
+                 min_threshold: float = 150.0, sample_every: int = 33, history: int = 600):
+        self.window = window
+        self.percentile = percentile
+        self.smoothing = smoothing
+        self.ratio = ratio
+        self.min_threshold = min_threshold
+        self.sample_every = sample_every
+        self.floor: Optional[float] = None
+        self.updates = 0
+        self.history: deque = deque(maxlen=history)
+        self._ring: deque = deque()
+        self._sorted: List[float] = []
+
+    @property
+    def threshold(self) -> float:
+        return max(self.min_threshold, (self.floor or 0.0) * self.ratio)
+
+    def seed(self, floor: float):
+        """Start from a calibrated floor instead of the first frames"""
+        self.floor = floor
+
+    def update(self, level: float) -> float:
+        """Add one frame's RMS level; return the speech threshold"""
+        if len(self._ring) == self.window:
+            del self._sorted[bisect.bisect_left(self._sorted, self._ring.popleft())]
+        self._ring.append(level)
+        bisect.insort(self._sorted, level)
+        quiet = self._sorted[int(len(self._sorted) * self.percentile / 100)]
+        self.floor = quiet if self.floor is None else self.floor + self.smoothing * (quiet - self.floor)
+        self.updates += 1
+        if self.updates % self.sample_every == 0:
+            self.history.append((time.time(), self.floor, self.threshold))
+            METRICS.gauge("noise_floor_rms", self.floor)
+            METRICS.gauge("speech_threshold_rms", self.threshold)
+        return self.threshold
+
+
+class EnergyVAD:
+    """
+    Energy voice-activity detector, used when webrtcvad is missing.
+    A frame is speech when it is louder than the noise estimator's current
+    threshold; every frame updates the estimate.
+    """
+
+    def __init__(self, noise: Optional[NoiseFloorEstimator] = None):
+        self.noise = noise or NoiseFloorEstimator()
+
+    def is_speech(self, frame, sample_rate: int) -> bool:
+        rms = frame_rms(frame)
+        # Judge against the threshold from before this frame, so a loud onset cannot raise its own bar
+        speech = rms > self.noise.threshold
+        self.noise.update(rms)
+        return speech
+
+
+def create_vad(aggressiveness: int = 2, noise: Optional[NoiseFloorEstimator] = None):
+    """WebRTC VAD if installed, otherwise the adaptive energy detector"""
+    try:
+        import webrtcvad  # type: ignore
+    except ImportError:
+        return EnergyVAD(noise)
+    return webrtcvad.Vad(aggressiveness)
+
+
+class FrameRing:
+    """Fixed number of PCM frames in one preallocated bytearray, oldest overwritten first"""
+
+    def __init__(self, frame_bytes: int, capacity: int):
+        self.frame_bytes = frame_bytes
+        self.capacity = capacity
+        self._view = memoryview(bytearray(frame_bytes * capacity))
+        self._head = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def push(self, frame):
+        offset = self._head * self.frame_bytes
+        self._view[offset:offset + self.frame_bytes] = frame
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def clear(self):
+        self._head = self._count = 0
+
+    def copy_into(self, target: memoryview, offset: int = 0) -> int:
+        """Copy the frames oldest-first into target; return the end offset"""
+        start = (self._head - self._count) % self.capacity
+        first = min(self._count, self.capacity - start) * self.frame_bytes
+        second = self._count * self.frame_bytes - first
+        begin = start * self.frame_bytes
+        target[offset:offset + first] = self._view[begin:begin + first]
+        target[offset + first:offset + first + second] = self._view[:second]
+        return offset + first + second
+
+
+class FrameCapture:
+    """
+    Frame-level utterance capture with voice-activity endpointing.
+    PCM frames go into preallocated storage: a small ring keeps the pre-roll
+    so the first syllable survives onset detection, and utterances are
+    assembled in a rotating set of fixed buffers. An utterance ends after a
+    trailing silence that grows with its length (min_silence_ms plus a tenth
+    of the utterance, capped at max_silence_ms), and is handed on as a
+    memoryview slice of its buffer. Each buffer is reused `buffers`
+    utterances later; copy the audio if it must outlive that. Every frame
+    also updates a NoiseFloorEstimator (the energy VAD's own, when it has
+    one), so the noise floor is tracked continuously without pausing capture.
+    """
+
+    ONSET_RATIO = 0.6
+
+    def __init__(self, vad, sample_rate: int = 16000, sample_width: int = 2, frame_ms: int = 30,
+                 onset_ms: int = 150, pre_roll_ms: int = 300, min_silence_ms: int = 240,
+                 max_silence_ms: int = 800, max_seconds: int = 15, buffers: int = 8,
+                 noise: Optional[NoiseFloorEstimator] = None):
+        self.vad = vad
+        # Energy VADs track the noise floor themselves; otherwise measure it here
+        self._measure_noise = getattr(vad, "noise", None) is None
+        self.noise = (noise or NoiseFloorEstimator()) if self._measure_noise else vad.noise
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.frame_ms = frame_ms
+        self.frame_bytes = sample_rate * frame_ms // 1000 * sample_width
+        self.min_silence_ms = min_silence_ms
+        self.max_silence_ms = max_silence_ms
+        self.pre_roll = FrameRing(self.frame_bytes, max(pre_roll_ms, onset_ms) // frame_ms)
+        self._onset: deque = deque(maxlen=max(1, onset_ms // frame_ms))
+        self._buffers = [memoryview(bytearray(self.frame_bytes * (max_seconds * 1000 // frame_ms)))
+                         for _ in range(buffers)]
+        self._next_buffer = 0
+        self.endpoint_latencies: deque = deque(maxlen=500)
+        self.reset()
+
+    def reset(self):
+        """Forget any partial utterance"""
+        self.pre_roll.clear()
+        self._onset.clear()
+        self._target: Optional[memoryview] = None
+        self._length = 0
+        self._silence_ms = 0
+
+    @property
+    def in_speech(self) -> bool:
+        return self._target is not None
+
+    def feed(self, frame: bytes) -> Optional[memoryview]:
+        """Consume one frame; return the utterance once its end is detected"""
+        speech = self.vad.is_speech(frame, self.sample_rate)
+        if self._measure_noise:
+            self.noise.update(frame_rms(frame))
+        if self._target is None:
+            self.pre_roll.push(frame)
+            self._onset.append(speech)
+            if len(self._onset) < self._onset.maxlen or sum(self._onset) < self.ONSET_RATIO * self._onset.maxlen:
+                return None
+            # Speech started: the utterance begins with the pre-roll
+            self._target = self._buffers[self._next_buffer]
+            self._next_buffer = (self._next_buffer + 1) % len(self._buffers)
+            self._length = self.pre_roll.copy_into(self._target)
+            self._silence_ms = 0
+            return None
+
+        end = self._length + len(frame)
+        if end > len(self._target):
+            return self._finish()
+        self._target[self._length:end] = frame
+        self._length = end
+        self._silence_ms = 0 if speech else self._silence_ms + self.frame_ms
+        spoken_ms = self._length // self.frame_bytes * self.frame_ms
+        if self._silence_ms >= min(self.max_silence_ms, self.min_silence_ms + spoken_ms // 10):
+            return self._finish()
+        return None
+
+    def _finish(self) -> memoryview:
+        utterance = self._target[:self._length]
+        self.endpoint_latencies.append(self._silence_ms)
+        self.reset()
+        return utterance
+
+    def capture(self, stream, timeout: Optional[float] = None):
+        """Read frames from an open audio stream until an utterance ends; return AudioData"""
+        self.reset()
+        samples_per_frame = self.frame_bytes // self.sample_width
+        waited_ms = 0
+        while True:
+            frame = stream.read(samples_per_frame)
+            if len(frame) < self.frame_bytes:
+                if self._target is not None:
+                    return sr.AudioData(self._finish(), self.sample_rate, self.sample_width)
+                raise sr.WaitTimeoutError("audio stream ended before a phrase started")
+            utterance = self.feed(frame)
+            if utterance is not None:
+                return sr.AudioData(utterance, self.sample_rate, self.sample_width)
+            if self._target is None:
+                waited_ms += self.frame_ms
+                if timeout and waited_ms >= timeout * 1000:
+                    raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+
+
+# Responses that never change; pre-rendered into the TTS cache at startup
+FIXED_RESPONSES = {
+    "error": "I encountered an error. Let me try again.",
+    "manual_exit": "Goodbye! Exiting gracefully.",
+    "help": "I can help with time, weather, schedule, calculations, web search, and more. What would you like to do?",
+    "search_prompt": "What would you like me to search for? Try saying 'search for Python programming'",
+    "play_prompt": "What would you like me to play? Try saying 'play some jazz music' or 'play Taylor Swift'",
+    "media_controls": "I can't control media playback directly yet, but you can use your keyboard spacebar to pause/play most media players!",
+    "media_help": "I can help you find music on YouTube! Try saying 'play [song name]' or 'play [artist name]'",
+    "no_schedule": "You have no appointments scheduled for today.",
+    "wake_ack": "Yes?",
+    "weather_ack": "Checking the weather...",
+    "system_ack": "Checking your system...",
+    "browser_ack": "Opening your browser...",
+    "working_ack": "One moment...",
+    "nothing_to_cancel": "There's nothing to cancel.",
+}
+
+
+class AudioPlayer:
+    """Plays rendered audio files with whatever the platform provides"""
+
+    def __init__(self):
+        self._process: Optional[subprocess.Popen] = None
+        self.command: Optional[List[str]] = None
+        self.winsound = None
+        if os.name == 'nt':
+            import winsound  # type: ignore
+            self.winsound = winsound
+        else:
+            for player in (["afplay"], ["paplay"], ["aplay", "-q"]):
+                if shutil.which(player[0]):
+                    self.command = player
+                    break
+
+    @property
+    def available(self) -> bool:
+        return self.winsound is not None or self.command is not None
+
+    def play(self, path: Path):
+        """Play a file and block until it finishes or is stopped"""
+        if self.winsound is not None:
+            self.winsound.PlaySound(str(path), self.winsound.SND_FILENAME)
+        elif self.command is not None:
+            self._process = subprocess.Popen(self.command + [str(path)],
+                                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self._process.wait()
+            self._process = None
+
+    def stop(self):
+        """Interrupt playback"""
+        if self.winsound is not None:
+            self.winsound.PlaySound(None, self.winsound.SND_PURGE)
+        elif self._process is not None:
+            self._process.terminate()
+
+
+class TTSCache:
+    """
+    Disk cache of synthesized speech.
+    Files are keyed by text plus voice/rate/volume and evicted least recently
+    used first once the directory grows past max_bytes.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.render_seconds = 0.0
+        self._lock = threading.Lock()
+        self._total_bytes = sum(path.stat().st_size for path in self.directory.glob("*.wav"))
+
+    @staticmethod
+    def key(text: str, voice: str, rate: int, volume: float) -> str:
+        """Stable cache key for a phrase and voice settings"""
+        return hashlib.sha1(f"{voice}|{rate}|{volume}|{text}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Path]:
+        """Return the cached file for a key, marking it recently used"""
+        path = self.directory / f"{key}.wav"
+        try:
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def render(self, engine, text: str, key: str) -> Path:
+        """Synthesize text to a cache file with pyttsx3 save_to_file"""
+        path = self.directory / f"{key}.wav"
+        partial = self.directory / f"{key}.part.wav"
+        started = time.perf_counter()
+        engine.save_to_file(text, str(partial))
+        engine.runAndWait()
+        os.replace(partial, path)
+        self.render_seconds += time.perf_counter() - started
+        with self._lock:
+            self._total_bytes += path.stat().st_size
+        self.evict()
+        return path
+
+    def evict(self):
+        """Delete least recently used files until the cache fits max_bytes"""
+        with self._lock:
+            if self._total_bytes <= self.max_bytes:
+                return
+            files = sorted(self.directory.glob("*.wav"), key=lambda path: path.stat().st_mtime)
+            for path in files:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                try:
+                    size = path.stat().st_size
+                    path.unlink()
+                    self._total_bytes -= size
+                except OSError:
+                    pass
+
+    @property
+    def seconds_saved(self) -> float:
+        """Estimated synthesis time avoided by cache hits"""
+        renders = max(1, self.misses)
+        return self.hits * self.render_seconds / renders
+
+
+class NullTTS:
+    """Silent stand-in for the pyttsx3 engine in headless mode"""
+
+    def say(self, text: str):
+        pass
+
+    def runAndWait(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def save_to_file(self, text: str, path: str):
+        pass
+
+    def getProperty(self, name: str):
+        return None
+
+    def setProperty(self, name: str, value):
+        pass
+
+
+def load_utterances(source: str) -> Iterator[Dict]:
+    """
+    Read utterances from stdin ("-"), a text file (one per line) or a JSONL
+    corpus of {"utterance": ..., "intent": ...} records
+    """
+    stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    try:
+        for line in stream:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                yield {"utterance": record["utterance"].lower(), "intent": record.get("intent")}
+            else:
+                yield {"utterance": line.lower(), "intent": None}
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+class SessionRecorder:
+    """
+    Records a voice session into a zip archive for offline replay.
+    Every captured phrase is stored as raw PCM (audio/000001.pcm) and listed
+    in manifest.json with its sample format, how long capture took, the wake
+    word decision and the transcript or recognition error with its timing;
+    the finished turns follow. PCM is copied on the capturing thread, since
+    FrameCapture reuses its buffers, and compressed by a background thread.
+    """
+
+    def __init__(self, path: Path, info: Dict):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.manifest = {"version": 1, "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                         **info, "events": [], "turns": []}
+        self._started = time.monotonic()
+        self._events: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._archive = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aria-recorder")
+        self._lock = threading.Lock()
+
+    def capture(self, audio, seconds: float, error: Optional[Exception] = None) -> Dict:
+        """Record a captured phrase, or a capture that failed"""
+        event = {"at": round(time.monotonic() - self._started, 3), "capture_ms": round(seconds * 1000, 3)}
+        if error is not None:
+            event["error"] = type(error).__name__
+        with self._lock:
+            event["index"] = len(self.manifest["events"])
+            self.manifest["events"].append(event)
+        if audio is not None:
+            name = f"audio/{event['index']:06d}.pcm"
+            event.update(audio=name, sample_rate=audio.sample_rate, sample_width=audio.sample_width)
+            self._writer.submit(self._archive.writestr, name, bytes(audio.frame_data))
+            self._events[audio] = event
+        return event
+
+    def event_for(self, audio) -> Optional[Dict]:
+        """The event recorded for a captured phrase"""
+        return self._events.get(audio)
+
+    def turn(self, turn: Dict):
+        with self._lock:
+            self.manifest["turns"].append(turn)
+
+    def close(self):
+        """Finish writing the audio and add the manifest"""
+        self._writer.shutdown(wait=True)
+        turns = [{key: value for key, value in turn.items() if not key.startswith("_")}
+                 for turn in self.manifest["turns"]]
+        self._archive.writestr("manifest.json", json.dumps({**self.manifest, "turns": turns}, indent=1, default=str))
+        self._archive.close()
+
+
+class SessionArchive:
+    """
+    A recorded session opened for replay.
+    Stands in for the microphone: capture() hands out the recorded phrases in
+    order, each after the time it originally took to capture divided by speed
+    (0 replays as fast as possible), and raises recorded capture timeouts.
+    Turns answered during the replay are collected in `turns`.
+    """
+
+    def __init__(self, path: Path, speed: float = 1.0):
+        self.path = path
+        self.speed = speed
+        self._archive = zipfile.ZipFile(path)
+        self.manifest = json.loads(self._archive.read("manifest.json"))
+        self.events: List[Dict] = self.manifest["events"]
+        self.position = 0
+        self.turns: List[Dict] = []
+        self._events: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    @property
+    def remaining(self) -> int:
+        return len(self.events) - self.position
+
+    def wait(self, milliseconds: Optional[float]):
+        """Take as long as a recorded stage did, at replay speed"""
+        if self.speed > 0 and milliseconds:
+            time.sleep(milliseconds / 1000 / self.speed)
+
+    def capture(self):
+        """The next recorded phrase as AudioData"""
+        event = self.events[self.position]
+        self.position += 1
+        self.wait(event.get("capture_ms"))
+        if "audio" not in event:
+            raise sr.WaitTimeoutError(f"recorded capture error: {event.get('error')}")
+        audio = sr.AudioData(self._archive.read(event["audio"]), event["sample_rate"], event["sample_width"])
+        self._events[audio] = event
+        return audio
+
+    def event_for(self, audio) -> Dict:
+        return self._events[audio]
+
+    def turn(self, turn: Dict):
+        self.turns.append(turn)
+
+    def close(self):
+        self._archive.close()
+
+
+class ReplayBackend(RecognizerBackend):
+    """Answers with the transcript recorded for each phrase, after the recorded recognition time"""
+
+    name = "replay"
+
+    def __init__(self, archive: SessionArchive, config: Dict):
+        super().__init__(None, config)
+        self.archive = archive
+
+    def recognize(self, audio) -> str:
+        event = self.archive.event_for(audio)
+        self.archive.wait(event.get("recognize_ms"))
+        if "transcript" in event:
+            return event["transcript"]
+        error = getattr(sr, event.get("error", ""), sr.UnknownValueError)
+        raise error("recorded recognition error")
+
+
+class ReplaySpotter(WakeWordSpotter):
+    """Repeats the recorded wake word decision for each phrase"""
+
+    name = "replay"
+
+    def __init__(self, archive: SessionArchive, wake_words: List[str], config: Dict):
+        super().__init__(None, wake_words, config)
+        self.archive = archive
+
+    def detect(self, audio) -> Optional[str]:
+        event = self.archive.event_for(audio)
+        self.archive.wait(event.get("wake_ms"))
+        return self.wake_words[0] if event.get("gate", True) else None
+
+
+class PacedTTS(NullTTS):
+    """Silent TTS that takes as long as speaking at `rate` words per minute would, divided by speed"""
+
+    def __init__(self, rate: int, speed: float = 1.0):
+        self.rate = rate
+        self.speed = speed
+        self._words = 0
+
+    def say(self, text: str):
+        self._words += len(text.split())
+
+    def runAndWait(self):
+        words, self._words = self._words, 0
+        if self.speed > 0:
+            time.sleep(words * 60 / self.rate / self.speed)
+
+
+# Stages a replay reproduces from the recording rather than measuring
+REPLAYED_STAGES = ("listen.capture", "listen.wake_word", "listen.recognize", "speak.playback")
+
+
+def response_ms(latencies: Dict[str, float]) -> float:
+    """Time from the end of an utterance to ARIA's first audio, from a turn's stage latencies"""
+    return sum(ms for stage, ms in latencies.items() if stage not in ("listen.capture", "speak.playback"))
+
+
+def print_headless_report(report: Dict):
+    """Print throughput, per-intent latency and response distribution"""
+    print(f"\n{Colors.CYAN}{Colors.BOLD}Headless Run:{Colors.END}")
+    print(f"{Colors.WHITE}Utterances: {report['utterances']}  "
+          f"Throughput: {report['throughput']:.0f} utterances/sec{Colors.END}")
+    if report["labelled"]:
+        print(f"{Colors.WHITE}Intent accuracy: {report['intent_accuracy']:.1%} of {report['labelled']} labelled{Colors.END}")
+    
+    print(f"{Colors.DIM}{'intent':<14} {'n':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}{Colors.END}")
+    for intent, stats in report["intents"].items():
+        print(f"{Colors.WHITE}{intent:<14} {stats['count']:>6} {stats['p50_ms']:>8.3f} "
+              f"{stats['p95_ms']:>8.3f} {stats['p99_ms']:>8.3f}{Colors.END}")
+    
+    if report.get("response_cache") and sum(report["response_cache"].values()):
+        cache = report["response_cache"]
+        print(f"{Colors.WHITE}Response cache: {cache['hits']} hits of "
+              f"{cache['hits'] + cache['misses']} cacheable commands{Colors.END}")
+    
+    print(f"{Colors.DIM}Most common responses:{Colors.END}")
+    for response, count in report["responses"]:
+        print(f"{Colors.WHITE}{count:>6}  {response[:70]}{Colors.END}")
+
+
+def print_replay_report(report: Dict):
+    """Print recorded vs replayed stage latencies for a replayed session"""
+    print(f"\n{Colors.CYAN}{Colors.BOLD}Replay of {report['archive']}:{Colors.END}")
+    print(f"{Colors.WHITE}{report['events']} phrases, {report['turns']} turns in {report['wall_seconds']:.2f}s "
+          f"at speed {report['speed'] or 'max'} (recorded session {report['recorded_seconds']:.1f}s){Colors.END}")
+    if report["compared"]:
+        print(f"{Colors.WHITE}Same intent as recorded: {report['intent_agreement']:.1%} "
+              f"of {report['compared']} turns{Colors.END}")
+    print(f"{Colors.DIM}{'stage':<20} {'recorded p50':>13} {'p95':>8} {'replayed p50':>13} {'p95':>8}{Colors.END}")
+    def cell(value: Optional[float], width: int) -> str:
+        return f"{value:>{width}.2f}" if value is not None else f"{'-':>{width}}"
+
+    for stage, stats in report["stages"].items():
+        marker = "*" if stage in REPLAYED_STAGES else " "
+        print(f"{Colors.WHITE}{stage:<19}{marker} {cell(stats['recorded_p50_ms'], 13)} {cell(stats['recorded_p95_ms'], 8)} "
+              f"{cell(stats['p50_ms'], 13)} {cell(stats['p95_ms'], 8)}{Colors.END}")
+    print(f"{Colors.DIM}* played back from the recording at replay speed{Colors.END}")
+
+
+# Collects URLs opened while a handler runs, so cached responses can replay them
+_URL_CAPTURE: "contextvars.ContextVar[Optional[List[str]]]" = contextvars.ContextVar("aria_url_capture", default=None)
+
+# The conversation turn being answered, filled in by process_command
+_TURN: "contextvars.ContextVar[Optional[Dict]]" = contextvars.ContextVar("aria_turn", default=None)
+
+
+def _day_period(now: datetime.datetime) -> int:
+    return 0 if now.hour < 12 else 1 if now.hour < 17 else 2
+
+
+class ResponseCache:
+    """
+    LRU memo of handler results for intents whose answer depends only on the
+    utterance, a time bucket and the data files it reads.
+    Each key carries the version of every table its policy reads, so
+    invalidate() after a schedule/contacts reload makes old answers
+    unreachable (and drops them). URLs a handler opened are stored with the
+    entry and opened again on a hit.
+    """
+
+    # intent -> (time bucket of "now" or None, tables the answer reads)
+    POLICIES = {
+        "Greetings": (_day_period, ()),
+        "Time & Date": (lambda now: now.strftime("%Y%m%d%H%M"), ()),
+        "Schedule": (lambda now: now.date().isoformat(), ("schedule",)),
+        "Contacts": (None, ("contacts",)),
+        "Calculator": (None, ()),
+        "Search": (None, ()),
+        "Media": (None, ()),
+    }
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self.versions: Counter = Counter()
+        self.hits = self.misses = self.evictions = self.invalidated = 0
+        self.seconds_saved = 0.0
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(command: str) -> str:
+        """Case, spacing and trailing punctuation don't change the answer; operators do"""
+        return " ".join(command.lower().split()).strip(" .?!,")
+
+    def key(self, command: str, intent: Optional[str], user: str = "") -> Optional[tuple]:
+        """Cache key for a routed command, or None if its intent is not memoizable"""
+        policy = self.POLICIES.get(intent)
+        if policy is None:
+            return None
+        bucket, tables = policy
+        return (self.normalize(command), intent, user, bucket(datetime.datetime.now()) if bucket else None,
+                tuple(self.versions[table] for table in tables))
+
+    def get(self, key: tuple) -> Optional[tuple]:
+        """(response, emotion, urls) for a hit, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.seconds_saved += entry[3]
+        return entry[:3]
+
+    def put(self, key: tuple, response: str, emotion: str, urls: List[str], cost: float):
+        with self._lock:
+            self._entries[key] = (response, emotion, tuple(urls), cost)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_stream(self, key: tuple, pieces: Iterable[str], emotion: str, urls: List[str],
+                      cost: float) -> Iterator[str]:
+        """Pass a streamed response through, caching it once it has been fully consumed"""
+        collected = []
+        iterator = iter(pieces)
+        while True:
+            started = time.perf_counter()
+            try:
+                piece = next(iterator)
+            except StopIteration:
+                break
+            cost += time.perf_counter() - started
+            collected.append(piece)
+            yield piece
+        self.put(key, " ".join(collected), emotion, urls, cost)
+
+    def invalidate(self, tables: Iterable[str]):
+        """Bump table versions after a reload and drop the answers that read them"""
+        tables = set(tables)
+        with self._lock:
+            for table in tables:
+                self.versions[table] += 1
+            stale = [key for key in self._entries if tables & set(self.POLICIES[key[1]][1])]
+            for key in stale:
+                del self._entries[key]
+            self.invalidated += len(stale)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class IntentHandler:
+    """
+    A registered intent handler: a sync or async function of the command
+    returning (response, emotion). Handlers without a deadline run inline;
+    the rest run off the voice loop and, if they overrun, ARIA speaks the
+    acknowledgement while the work continues. A handler may be given as a
+    loader instead, which is called to import the function on first use.
+    """
+
+    def __init__(self, function=None, deadline: Optional[float] = None, acknowledgement: Optional[str] = None,
+                 activity: str = "", loader=None):
+        self.function = function
+        self.deadline = deadline
+        self.acknowledgement = acknowledgement
+        self.activity = activity
+        self.loader = loader
+        self.is_async = inspect.iscoroutinefunction(function)
+        self._lock = threading.Lock()
+
+    def resolve(self) -> "IntentHandler":
+        """Load a lazily imported handler function"""
+        if self.function is None:
+            with self._lock:
+                if self.function is None:
+                    function = self.loader()
+                    self.is_async = inspect.iscoroutinefunction(function)
+                    self.function = function
+        return self
+
+
+class PluginManifest:
+    """An intent plugin as declared in its plugin.json (the handler module is not imported)"""
+
+    def __init__(self, path: Path, data: Dict):
+        self.path = path
+        self.name = re.sub(r"\W", "_", data.get("name", path.parent.name))
+        self.intent = data["intent"]
+        self.keywords = list(data.get("keywords", []))
+        self.examples = list(data.get("examples", []))
+        module, _, function = data["handler"].partition(":")
+        self.module_path = path.parent / (module.replace(".", "/") + ".py")
+        self.function_name = function or "handle"
+        self.deadline = data.get("deadline")
+        self.acknowledgement = data.get("acknowledgement")
+        self.activity = data.get("activity", f"the {self.intent.lower()} request")
+        self.handler: Optional[IntentHandler] = None
+
+
+class PluginRegistry:
+    """
+    Intent plugins found in plugins/<name>/plugin.json.
+    A manifest names the intent, its keywords and example phrasings, and the
+    handler as "module:function" relative to the plugin folder; the function
+    is called as handler(command, assistant) and returns (response, emotion).
+    refresh() reads manifests only, and each plugin's module is imported the
+    first time its intent is routed. Manifests whose files haven't changed
+    keep their (possibly loaded) handler across refreshes.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.manifests: Dict[str, PluginManifest] = {}
+        self.loaded: List[str] = []
+        self._signatures: Dict[Path, tuple] = {}
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _signature(path: Path) -> tuple:
+        """mtimes of a manifest and the module next to it"""
+        stamps = []
+        for candidate in (path, *path.parent.glob("*.py")):
+            try:
+                stamps.append(candidate.stat().st_mtime_ns)
+            except OSError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def refresh(self) -> bool:
+        """Re-read added, changed or removed manifests; True if anything changed"""
+        signatures = {path: self._signature(path) for path in sorted(self.directory.glob("*/plugin.json"))}
+        if signatures == self._signatures:
+            return False
+        previous = {manifest.path: manifest for manifest in self.manifests.values()}
+        manifests: Dict[str, PluginManifest] = {}
+        for path, signature in signatures.items():
+            manifest = previous.get(path) if self._signatures.get(path) == signature else None
+            if manifest is None:
+                try:
+                    manifest = PluginManifest(path, json.loads(path.read_text(encoding="utf-8")))
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"{Colors.YELLOW}Skipping plugin {path.parent.name}: {e}{Colors.END}")
+                    continue
+            if manifest.intent in manifests:
+                print(f"{Colors.YELLOW}Skipping plugin {manifest.name}: intent '{manifest.intent}' "
+                      f"is already provided by {manifests[manifest.intent].name}{Colors.END}")
+                continue
+            manifests[manifest.intent] = manifest
+        self.manifests = manifests
+        self._signatures = signatures
+        return True
+
+    def handler(self, manifest: PluginManifest, assistant: "AriaAssistant") -> IntentHandler:
+        """The plugin's IntentHandler, importing its module on first use"""
+        if manifest.handler is None:
+            manifest.handler = IntentHandler(deadline=manifest.deadline, acknowledgement=manifest.acknowledgement,
+                                             activity=manifest.activity,
+                                             loader=lambda: functools.partial(self.load(manifest), assistant=assistant))
+        return manifest.handler
+
+    def load(self, manifest: PluginManifest):
+        """Import a plugin's handler module and return its handler function"""
+        module_name = f"aria_plugin_{manifest.name}"
+        spec = importlib.util.spec_from_file_location(module_name, manifest.module_path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        started = time.perf_counter()
+        spec.loader.exec_module(module)
+        IMPORT_TIMINGS[module_name] = time.perf_counter() - started
+        self.loaded.append(manifest.name)
+        return getattr(module, manifest.function_name)
+
+    def watch(self, interval: float, on_change):
+        """Poll for plugin changes on a background thread and call on_change() after each"""
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    if self.refresh():
+                        on_change()
+                except Exception as e:
+                    print(f"{Colors.RED}Plugin reload error: {e}{Colors.END}")
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=run, name="aria-plugin-watch", daemon=True)
+            self._watcher.start()
+
+    def close(self):
+        self._stop.set()
+
+
+class PendingRequest:
+    """A handler that overran its deadline and is still working"""
+
+    def __init__(self, intent: str, handler: IntentHandler, future: Future):
+        self.intent = intent
+        self.handler = handler
+        self.future = future
+        self.stale = False
+
+
+class HandlerRunner:
+    """
+    Runs intent handlers with per-intent deadlines.
+    Sync handlers go to a thread pool and async ones to a private event loop
+    thread, both with the caller's context variables. run() waits up to the
+    handler's deadline and otherwise leaves a PendingRequest whose answer is
+    collected later from late_results(). A newer request for the same intent,
+    or cancel(), makes a pending one stale: async handlers are cancelled and
+    a sync handler's eventual answer is dropped.
+    """
+
+    def __init__(self, workers: int = 4):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="aria-handler")
+        self.pending: Dict[str, PendingRequest] = {}
+        self.overruns: Counter = Counter()
+        self.cancelled = self.late = 0
+        self._finished: "queue.Queue[tuple]" = queue.Queue()
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _event_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True, name="aria-handler-loop").start()
+            return self._loop
+
+    def submit(self, handler: IntentHandler, *args) -> Future:
+        """Start a handler off the calling thread"""
+        context = contextvars.copy_context()
+        if not handler.is_async:
+            return self.executor.submit(context.run, handler.function, *args)
+
+        async def in_context():
+            for variable, value in context.items():
+                variable.set(value)
+            return await handler.function(*args)
+
+        return asyncio.run_coroutine_threadsafe(in_context(), self._event_loop())
+
+    def run(self, intent: str, handler: IntentHandler, *args, wait: bool = False) -> Optional[tuple]:
+        """The handler's (response, emotion), or None if it overran its deadline and is still pending"""
+        self.cancel(intent)
+        handler.resolve()
+        if not handler.is_async and (handler.deadline is None or wait):
+            return handler.function(*args)
+        future = self.submit(handler, *args)
+        try:
+            return future.result(timeout=None if wait else handler.deadline)
+        except FutureTimeoutError:
+            pass
+        request = PendingRequest(intent, handler, future)
+        with self._lock:
+            self.pending[intent] = request
+            self.overruns[intent] += 1
+        future.add_done_callback(lambda _: self._complete(request))
+        return None
+
+    def _complete(self, request: PendingRequest):
+        with self._lock:
+            if self.pending.get(request.intent) is request:
+                del self.pending[request.intent]
+            if request.stale or request.future.cancelled():
+                return
+            self.late += 1
+        try:
+            result = request.future.result()
+        except Exception as e:
+            print(f"{Colors.RED}Error: {e}{Colors.END}")
+            result = (FIXED_RESPONSES["error"], "concerned")
+        self._finished.put(result)
+
+    def cancel(self, intent: Optional[str] = None) -> List[PendingRequest]:
+        """Mark pending requests (all, or one intent's) stale; returns the ones cancelled"""
+        with self._lock:
+            stale = [request for name, request in self.pending.items() if intent is None or name == intent]
+            for request in stale:
+                request.stale = True
+                del self.pending[request.intent]
+            self.cancelled += len(stale)
+        for request in stale:
+            request.future.cancel()
+        return stale
+
+    def late_results(self) -> List[tuple]:
+        """(response, emotion) of pending requests that have finished since the last call"""
+        results = []
+        while True:
+            try:
+                results.append(self._finished.get_nowait())
+            except queue.Empty:
+                return results
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def reminder_times(entries: Iterable[Dict], now: datetime.datetime,
+                   lead_minutes: Dict[str, float]) -> Dict[str, Tuple[float, Dict]]:
+    """
+    Reminders wanted for schedule entries that have not started yet, keyed by
+    day, time and title: {key: (due timestamp, payload)}. Undated ("today",
+    "daily") entries repeat, so both today's and tomorrow's occurrences count
+    """
+    wanted = {}
+    today = now.date()
+    cutoff = now.timestamp()
+    repeats = [today, today + datetime.timedelta(days=1)]
+    for entry in entries:
+        try:
+            hour, minute = map(int, str(entry.get("time", "")).split(":"))
+            at = datetime.time(hour, minute)
+            date = str(entry.get("date") or "today")
+            days = repeats if date in ("today", "daily") else [datetime.date.fromisoformat(date)]
+        except ValueError:
+            continue
+        lead = lead_minutes.get(entry.get("priority"), lead_minutes["medium"]) * 60
+        title = entry.get("title", "Appointment")
+        for day in days:
+            event = datetime.datetime.combine(day, at).timestamp()
+            if event <= cutoff:
+                continue
+            wanted[f"{day} {hour:02d}:{minute:02d} {title}"] = (
+                event - lead, {"title": title, "location": entry.get("location"), "event": event})
+    return wanted
+
+
+class IndexedHeap:
+    """
+    Binary min-heap of keyed entries ordered by due time.
+    A key -> position index lets an entry be removed or moved in O(log n)
+    instead of being left behind as a tombstone.
+    """
+
+    def __init__(self):
+        self._items: List[list] = []  # [due, sequence, key, payload]
+        self._index: Dict[str, int] = {}
+        self._sequence = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def keys(self) -> List[str]:
+        return list(self._index)
+
+    def get(self, key: str) -> Optional[Tuple[float, object]]:
+        """(due, payload) for a key, or None"""
+        position = self._index.get(key)
+        if position is None:
+            return None
+        item = self._items[position]
+        return item[0], item[3]
+
+    def peek(self) -> Optional[Tuple[float, str, object]]:
+        """(due, key, payload) of the earliest entry, or None"""
+        if not self._items:
+            return None
+        due, _, key, payload = self._items[0]
+        return due, key, payload
+
+    def push(self, key: str, due: float, payload: object = None):
+        """Add an entry, or move an existing key to its new due time"""
+        self._sequence += 1
+        position = self._index.get(key)
+        if position is None:
+            self._items.append([due, self._sequence, key, payload])
+            self._index[key] = len(self._items) - 1
+            self._sift_up(len(self._items) - 1)
+            return
+        item = self._items[position]
+        earlier = due < item[0]
+        item[0], item[1], item[3] = due, self._sequence, payload
+        if earlier:
+            self._sift_up(position)
+        else:
+            self._sift_down(position)
+
+    def pop(self) -> Tuple[float, str, object]:
+        """Remove and return the earliest (due, key, payload)"""
+        due, key, payload = self.peek()
+        self.remove(key)
+        return due, key, payload
+
+    def remove(self, key: str) -> Optional[Tuple[float, object]]:
+        """Remove a key; returns its (due, payload), or None if absent"""
+        position = self._index.pop(key, None)
+        if position is None:
+            return None
+        item = self._items[position]
+        last = self._items.pop()
+        if position < len(self._items):
+            self._items[position] = last
+            self._index[last[2]] = position
+            self._sift_up(position)
+            self._sift_down(self._index[last[2]])
+        return item[0], item[3]
+
+    def _sift_up(self, position: int):
+        items, index = self._items, self._index
+        item = items[position]
+        while position:
+            parent = (position - 1) >> 1
+            if items[parent][:2] <= item[:2]:
+                break
+            items[position] = items[parent]
+            index[items[position][2]] = position
+            position = parent
+        items[position] = item
+        index[item[2]] = position
+
+    def _sift_down(self, position: int):
+        items, index = self._items, self._index
+        size = len(items)
+        item = items[position]
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and items[child + 1][:2] < items[child][:2]:
+                child += 1
+            if item[:2] <= items[child][:2]:
+                break
+            items[position] = items[child]
+            index[items[position][2]] = position
+            position = child
+        items[position] = item
+        index[item[2]] = position
+
+
+class SystemClock:
+    """Wall-clock time for the reminder scheduler"""
+
+    def now(self) -> float:
+        return time.time()
+
+    def wait(self, condition: threading.Condition, timeout: Optional[float]):
+        condition.wait(timeout)
+
+    def attach(self, condition: threading.Condition):
+        pass
+
+
+class SimulatedClock:
+    """
+    Manually advanced clock for exercising the reminder scheduler.
+    Time only moves on advance(), which wakes every attached scheduler, so a
+    day of reminders can be checked in milliseconds and without flakiness.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.time = start
+        self._conditions: List[threading.Condition] = []
+
+    def now(self) -> float:
+        return self.time
+
+    def wait(self, condition: threading.Condition, timeout: Optional[float]):
+        # Only advance() or a newly armed reminder can change what is due
+        condition.wait()
+
+    def attach(self, condition: threading.Condition):
+        self._conditions.append(condition)
+
+    def advance(self, seconds: float):
+        self.time += seconds
+        for condition in self._conditions:
+            with condition:
+                condition.notify_all()
+
+
+class ReminderScheduler:
+    """
+    Fires reminders at their due time from one background thread.
+    Pending reminders live in an IndexedHeap, so arming, moving and cancelling
+    one is O(log n). The thread sleeps on a condition until the earliest due
+    time, or until an earlier reminder is armed, rather than polling. sync()
+    diffs a full set of wanted reminders against the armed and already fired
+    ones and only touches those that changed. The clock is injectable so a
+    SimulatedClock can drive it.
+    """
+
+    def __init__(self, on_due: Callable[[str, object], None], clock=None):
+        self.on_due = on_due
+        self.clock = clock or SystemClock()
+        self.heap = IndexedHeap()
+        self.fired: Dict[str, float] = {}
+        self.fired_count = 0
+        self._condition = threading.Condition()
+        self.clock.attach(self._condition)
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def _notify_if_earlier(self, head: Optional[tuple]):
+        top = self.heap.peek()
+        if top is not None and (head is None or top[0] < head[0]):
+            self._condition.notify()
+
+    def schedule(self, key: str, due: float, payload: object = None):
+        """Arm a reminder, or move an armed one"""
+        with self._condition:
+            head = self.heap.peek()
+            self.fired.pop(key, None)
+            self.heap.push(key, due, payload)
+            self._notify_if_earlier(head)
+
+    def cancel(self, key: str) -> bool:
+        """Disarm a reminder; True if it was pending"""
+        with self._condition:
+            return self.heap.remove(key) is not None
+
+    def sync(self, wanted: Dict[str, Tuple[float, object]]) -> Tuple[int, int]:
+        """Make the pending reminders match wanted ({key: (due, payload)}); returns (armed, cancelled)"""
+        with self._condition:
+            head = self.heap.peek()
+            removed = [key for key in self.heap.keys() if key not in wanted]
+            for key in removed:
+                self.heap.remove(key)
+            # Reminders already spoken stay quiet unless their due time moved
+            self.fired = {key: due for key, due in self.fired.items() if key in wanted}
+            armed = 0
+            for key, (due, payload) in wanted.items():
+                if self.fired.get(key) == due or self.heap.get(key) == (due, payload):
+                    continue
+                self.fired.pop(key, None)
+                self.heap.push(key, due, payload)
+                armed += 1
+            self._notify_if_earlier(head)
+        return armed, len(removed)
+
+    def run_due(self) -> int:
+        """Fire every reminder due by now, earliest first; returns how many fired"""
+        now = self.clock.now()
+        due = []
+        with self._condition:
+            while self.heap and self.heap.peek()[0] <= now:
+                when, key, payload = self.heap.pop()
+                self.fired[key] = when
+                due.append((key, payload))
+            self.fired_count += len(due)
+        for key, payload in due:
+            try:
+                self.on_due(key, payload)
+            except Exception as e:
+                print(f"{Colors.RED}Reminder error: {e}{Colors.END}")
+        return len(due)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    head = self.heap.peek()
+                    delay = None if head is None else head[0] - self.clock.now()
+                    if delay is not None and delay <= 0:
+                        break
+                    self.clock.wait(self._condition, delay)
+                if self._stopped:
+                    return
+            self.run_due()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="aria-reminders", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+
+class WeatherClient:
+    """
+    OpenWeatherMap client with a pooled HTTP session and a per-city TTL cache
+    persisted across restarts. Entries past their TTL but within stale_ttl are
+    answered immediately while a background refresh fetches a new copy
+    (stale-while-revalidate).
+    """
+
+    def __init__(self, api_key: str, base_url: str, cache_path: Path,
+                 ttl: float = 600, stale_ttl: float = 3600, timeout: float = 5):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.cache_path = Path(cache_path)
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.upstream_latencies: deque = deque(maxlen=500)
+        self._session = None
+        self._lock = threading.Lock()
+        self._refreshing: set = set()
+        self._cache: Dict[str, Dict] = self._load_cache()
+
+    def _load_cache(self) -> Dict[str, Dict]:
+        """Read persisted weather entries"""
+        try:
+            with open(self.cache_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self):
+        """Write the cache atomically"""
+        with self._lock:
+            snapshot = json.dumps(self._cache)
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            partial = self.cache_path.with_suffix(".part")
+            partial.write_text(snapshot)
+            os.replace(partial, self.cache_path)
+        except OSError:
+            pass
+
+    @property
+    def session(self):
+        """Shared keep-alive session, created on first use"""
+        if self._session is None:
+            self._session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+        return self._session
+
+    def _fetch(self, city: str) -> Optional[Dict]:
+        """Query the upstream API; None when it does not know the city"""
+        started = time.perf_counter()
+        with METRICS.span("weather.http"):
+            response = self.session.get(self.base_url, params={"q": city, "appid": self.api_key, "units": "metric"},
+                                        timeout=self.timeout)
+        self.upstream_latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        weather = {
+            "description": data['weather'][0]['description'],
+            "temp": data['main']['temp'],
+            "humidity": data['main']['humidity'],
+        }
+        with self._lock:
+            self._cache[city.lower()] = {"fetched_at": time.time(), "weather": weather}
+        self._save_cache()
+        return weather
+
+    def _refresh(self, city: str):
+        """Background revalidation of a stale entry"""
+        try:
+            self._fetch(city)
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(city.lower())
+
+    def refresh_async(self, city: str):
+        """Start a background refresh unless one is already running"""
+        with self._lock:
+            if city.lower() in self._refreshing:
+                return
+            self._refreshing.add(city.lower())
+        threading.Thread(target=self._refresh, args=(city,), name="aria-weather-refresh", daemon=True).start()
+
+    def prefetch(self, city: str):
+        """Warm the cache for a city without blocking"""
+        with self._lock:
+            entry = self._cache.get(city.lower())
+        if entry is None or time.time() - entry["fetched_at"] > self.ttl:
+            self.refresh_async(city)
+
+    def get(self, city: str) -> Optional[Dict]:
+        """Weather for a city from cache or upstream; raises on network failure"""
+        with self._lock:
+            entry = self._cache.get(city.lower())
+        if entry is not None:
+            age = time.time() - entry["fetched_at"]
+            if age <= self.ttl:
+                self.hits += 1
+                return entry["weather"]
+            if age <= self.stale_ttl:
+                self.stale_hits += 1
+                self.refresh_async(city)
+                return entry["weather"]
+        self.misses += 1
+        return self._fetch(city)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.stale_hits + self.misses
+        return (self.hits + self.stale_hits) / total if total else 0.0
+
+
+class CalculationError(ValueError):
+    """Spoken math that cannot be parsed or evaluated"""
+
+
+class MathVocabularyError(CalculationError):
+    """Spoken math containing words the calculator does not know"""
+
+
+class MathRangeError(CalculationError):
+    """Spoken math whose result would be too large to compute"""
+
+
+class MathDomainError(CalculationError):
+    """Spoken math that parsed but asks for an undefined operation; the message is spoken"""
+
+
+_MATH_WORDS = re.compile(r"\d+(?:\.\d+)?|[a-z']+|[-+*/^%()×÷]")
+
+_SMALL_NUMBERS = {
+    "zero": 0, "oh": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19, "twenty": 20,
+    "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+_SCALES = {"thousand": 10 ** 3, "million": 10 ** 6, "billion": 10 ** 9, "trillion": 10 ** 12}
+
+# Spoken operator phrases, matched longest first
+_MATH_PHRASES = {
+    "plus": ("op", "+"), "+": ("op", "+"), "add": ("verb", "add"), "and": ("and", "+"),
+    "minus": ("op", "-"), "-": ("op", "-"), "take away": ("op", "-"), "subtract": ("verb", "subtract"),
+    "times": ("op", "*"), "x": ("op", "*"), "*": ("op", "*"), "×": ("op", "*"),
+    "multiplied by": ("op", "*"), "multiply": ("verb", "multiply"),
+    "divided by": ("op", "/"), "over": ("op", "/"), "/": ("op", "/"), "÷": ("op", "/"), "divide": ("verb", "divide"),
+    "mod": ("op", "%"), "modulo": ("op", "%"),
+    "to the power of": ("op", "^"), "raised to the power of": ("op", "^"), "raised to": ("op", "^"),
+    "power": ("op", "^"), "^": ("op", "^"),
+    "percent of": ("op", "pctof"), "% of": ("op", "pctof"),
+    "squared": ("post", "squared"), "cubed": ("post", "cubed"), "percent": ("post", "percent"),
+    "%": ("post", "percent"), "factorial": ("post", "factorial"),
+    "square root of": ("func", "sqrt"), "square root": ("func", "sqrt"), "root of": ("func", "sqrt"),
+    "sqrt": ("func", "sqrt"), "cube root of": ("func", "cbrt"), "cube root": ("func", "cbrt"),
+    "sine of": ("func", "sin"), "sine": ("func", "sin"), "sin": ("func", "sin"),
+    "cosine of": ("func", "cos"), "cosine": ("func", "cos"), "cos": ("func", "cos"),
+    "tangent of": ("func", "tan"), "tangent": ("func", "tan"), "tan": ("func", "tan"),
+    "log of": ("func", "log"), "log": ("func", "log"), "logarithm of": ("func", "log"),
+    "natural log of": ("func", "ln"), "natural log": ("func", "ln"), "ln": ("func", "ln"),
+    "absolute value of": ("func", "abs"), "abs": ("func", "abs"),
+    "negative": ("neg", "-"), "(": ("lparen", "("), ")": ("rparen", ")"),
+    "by": ("conj", "by"), "to": ("conj", "to"), "from": ("conj", "from"),
+}
+_MATH_PHRASE_LENGTH = max(len(phrase.split()) for phrase in _MATH_PHRASES)
+_MATH_FILLER = {"calculate", "compute", "what", "what's", "whats", "is", "the", "of", "please", "equals",
+                "equal", "how", "much", "value", "result", "answer", "me", "tell", "math", "a"}
+
+_BINDING_POWER = {"+": 10, "-": 10, "*": 20, "/": 20, "%": 20, "pctof": 20, "^": 30}
+MAX_RESULT_DIGITS = 300
+# Largest n whose factorial stays within MAX_RESULT_DIGITS (lgamma(n + 1) is ln n!)
+MAX_FACTORIAL = max(n for n in range(1000) if math.lgamma(n + 1) / math.log(10) <= MAX_RESULT_DIGITS)
+
+
+def _is_number_word(word: str) -> bool:
+    return word in _SMALL_NUMBERS or word in _SCALES or word == "hundred"
+
+
+def _read_number(words: List[str], start: int) -> Tuple[Union[int, float], int]:
+    """Read a spoken/written number starting at words[start]; return value and next index"""
+    total, current, index = 0, 0, start
+    fraction = ""
+    while index < len(words):
+        word = words[index]
+        following = words[index + 1] if index + 1 < len(words) else ""
+        if word[0].isdigit() and index == start:
+            current = float(word) if "." in word else int(word)
+        elif word in _SMALL_NUMBERS and (index == start or words[index - 1] not in _SMALL_NUMBERS
+                                         or _SMALL_NUMBERS[words[index - 1]] >= 20 > _SMALL_NUMBERS[word] > 0):
+            current += _SMALL_NUMBERS[word]
+        elif word == "a" and index == start and (following == "hundred" or following in _SCALES):
+            current = 1
+        elif word == "hundred" and index > start:
+            current = (current or 1) * 100
+        elif word in _SCALES and index > start:
+            total += (current or 1) * _SCALES[word]
+            current = 0
+        elif word == "and" and index > start and words[index - 1] in ("hundred", *_SCALES) and following in _SMALL_NUMBERS:
+            pass
+        elif word == "point" and following in _SMALL_NUMBERS and _SMALL_NUMBERS[following] < 10:
+            index += 1
+            while index < len(words) and words[index] in _SMALL_NUMBERS and _SMALL_NUMBERS[words[index]] < 10:
+                fraction += str(_SMALL_NUMBERS[words[index]])
+                index += 1
+            break
+        else:
+            break
+        index += 1
+    value = total + current
+    if fraction:
+        value = value + float("0." + fraction)
+    return value, index
+
+
+def tokenize_spoken_math(text: str) -> List[Tuple[str, Union[str, int, float]]]:
+    """Turn spoken math into (kind, value) tokens"""
+    words = _MATH_WORDS.findall(re.sub(r"(?<=\d),(?=\d{3})", "", text.lower()))
+    tokens: List[Tuple[str, Union[str, int, float]]] = []
+    index = 0
+    while index < len(words):
+        word = words[index]
+        if word[0].isdigit() or word in _SMALL_NUMBERS or (
+                word == "a" and index + 1 < len(words) and _is_number_word(words[index + 1])):
+            value, index = _read_number(words, index)
+            tokens.append(("num", value))
+            continue
+        for length in range(min(_MATH_PHRASE_LENGTH, len(words) - index), 0, -1):
+            phrase = " ".join(words[index:index + length])
+            if phrase in _MATH_PHRASES:
+                tokens.append(_MATH_PHRASES[phrase])
+                index += length
+                break
+        else:
+            if word not in _MATH_FILLER:
+                raise MathVocabularyError(f"unknown word '{word}'")
+            index += 1
+    return tokens
+
+
+class _MathParser:
+    """Pratt parser from spoken-math tokens to a tuple AST"""
+
+    def __init__(self, tokens: List[Tuple[str, Union[str, int, float]]]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def advance(self):
+        token = self.peek()
+        if token is None:
+            raise CalculationError("unexpected end of expression")
+        self.position += 1
+        return token
+
+    def left_binding_power(self, token) -> int:
+        kind, value = token
+        if kind == "op":
+            return _BINDING_POWER[value]
+        if kind == "and":
+            return _BINDING_POWER["+"]
+        if kind == "post":
+            return 40
+        return 0
+
+    def parse(self):
+        node = self.expression(0)
+        if self.peek() is not None:
+            raise CalculationError(f"unexpected '{self.peek()[1]}'")
+        return node
+
+    def expression(self, right_binding_power: int):
+        left = self.prefix(self.advance())
+        while self.peek() is not None and self.left_binding_power(self.peek()) > right_binding_power:
+            left = self.infix(self.advance(), left)
+        return left
+
+    def prefix(self, token):
+        kind, value = token
+        if kind == "num":
+            return ("num", value)
+        if kind == "neg" or (kind == "op" and value == "-"):
+            return ("neg", self.expression(25))
+        if kind == "op" and value == "+":
+            return self.expression(25)
+        if kind == "func":
+            return ("call", value, self.expression(35))
+        if kind == "lparen":
+            node = self.expression(0)
+            if self.advance()[0] != "rparen":
+                raise CalculationError("missing closing parenthesis")
+            return node
+        if kind == "verb":
+            # "add 5 and 3", "subtract 3 from 10", "multiply 4 by 2", "divide 10 by 5"
+            first = self.expression(_BINDING_POWER["+"])
+            separator = self.advance()
+            if separator[0] not in ("and", "conj"):
+                raise CalculationError(f"expected a second number after '{value}'")
+            second = self.expression(_BINDING_POWER["+"])
+            if value == "add":
+                return ("bin", "+", first, second)
+            if value == "subtract":
+                return ("bin", "-", second, first) if separator[1] == "from" else ("bin", "-", first, second)
+            return ("bin", "*" if value == "multiply" else "/", first, second)
+        raise CalculationError(f"unexpected '{value}'")
+
+    def infix(self, token, left):
+        kind, value = token
+        if kind == "post":
+            return ("post", value, left)
+        if kind == "and":
+            return ("bin", "+", left, self.expression(_BINDING_POWER["+"]))
+        # Powers are right-associative
+        power = _BINDING_POWER[value] - (1 if value == "^" else 0)
+        return ("bin", value, left, self.expression(power))
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_spoken_math(text: str):
+    """Parse spoken math into an AST (memoized)"""
+    tokens = tokenize_spoken_math(text)
+    if not any(kind == "num" for kind, _ in tokens):
+        raise CalculationError("no numbers in expression")
+    return _MathParser(tokens).parse()
+
+
+def _power(base: Union[int, float], exponent: Union[int, float]) -> Union[int, float]:
+    """Exponentiation that refuses results too large to compute quickly"""
+    if abs(base) > 1 and abs(exponent) * math.log10(abs(base)) > MAX_RESULT_DIGITS:
+        raise MathRangeError("result too large")
+    if base < 0 and exponent != int(exponent):
+        raise MathDomainError("I can't raise a negative number to a fractional power.")
+    return base ** exponent
+
+
+def evaluate_math(node) -> Union[int, float]:
+    """Evaluate a spoken-math AST with a fixed set of operations"""
+    kind = node[0]
+    if kind == "num":
+        return node[1]
+    if kind == "neg":
+        return -evaluate_math(node[1])
+    if kind == "bin":
+        op, left, right = node[1], evaluate_math(node[2]), evaluate_math(node[3])
+        if op == "+":
+            return left + right
+        if op == "-":
+            return left - right
+        if op == "*":
+            return left * right
+        if op == "/":
+            return left / right
+        if op == "%":
+            return left % right
+        if op == "pctof":
+            return left / 100 * right
+        return _power(left, right)
+    if kind == "post":
+        value = evaluate_math(node[2])
+        if node[1] == "squared":
+            return _power(value, 2)
+        if node[1] == "cubed":
+            return _power(value, 3)
+        if node[1] == "percent":
+            return value / 100
+        if value != int(value) or value < 0:
+            raise MathDomainError("Factorials are only defined for whole numbers that aren't negative.")
+        if value > MAX_FACTORIAL:
+            raise MathRangeError("result too large")
+        return math.factorial(int(value))
+    # Function call
+    name, value = node[1], evaluate_math(node[2])
+    if name == "sqrt":
+        if value < 0:
+            raise MathDomainError("I can't take the square root of a negative number.")
+        return math.sqrt(value)
+    if name == "cbrt":
+        return math.copysign(abs(value) ** (1 / 3), value)
+    if name in ("sin", "cos", "tan"):
+        return getattr(math, name)(math.radians(value))
+    if name in ("log", "ln"):
+        if value <= 0:
+            raise MathDomainError("Logarithms are only defined for positive numbers.")
+        return math.log10(value) if name == "log" else math.log(value)
+    return abs(value)
+
+
+def format_number(value: Union[int, float]) -> str:
+    """Render a result the way it should be spoken"""
+    if isinstance(value, float):
+        if value.is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        return f"{value:.4f}".rstrip("0").rstrip(".")
+    return str(value)
+
+
+class TelemetrySampler:
+    """
+    Background sampler of CPU, memory, battery, disk and network stats.
+    Each metric lives in a preallocated array('d') ring buffer, so readings
+    are answered instantly and trends cost no allocation per sample.
+    """
+
+    FIELDS = ("timestamp", "cpu", "memory", "disk", "battery", "plugged", "net_sent", "net_recv")
+
+    def __init__(self, interval: float = 2.0, length: int = 300):
+        self.interval = interval
+        self.length = length
+        self._buffers = {field: array('d', [0.0]) * length for field in self.FIELDS}
+        self._index = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_net = None
+
+    def sample(self):
+        """Take one reading and append it to the ring"""
+        now = time.time()
+        # interval=None measures since the previous call instead of sleeping
+        cpu = psutil.cpu_percent(interval=None)
+        memory = psutil.virtual_memory().percent
+        disk = psutil.disk_usage(os.path.abspath(os.sep)).percent
+        battery = plugged = float("nan")
+        try:
+            info = psutil.sensors_battery()
+            if info is not None:
+                battery, plugged = float(info.percent), float(bool(info.power_plugged))
+        except Exception:
+            pass
+        
+        net = psutil.net_io_counters()
+        sent_rate = recv_rate = 0.0
+        if self._last_net is not None:
+            elapsed = max(now - self._last_net[0], 1e-6)
+            sent_rate = (net.bytes_sent - self._last_net[1]) / elapsed
+            recv_rate = (net.bytes_recv - self._last_net[2]) / elapsed
+        self._last_net = (now, net.bytes_sent, net.bytes_recv)
+
+        with self._lock:
+            for field, value in zip(self.FIELDS, (now, cpu, memory, disk, battery, plugged, sent_rate, recv_rate)):
+                self._buffers[field][self._index] = value
+            self._index = (self._index + 1) % self.length
+            self._count = min(self._count + 1, self.length)
+
+    def _run(self):
+        psutil.cpu_percent(interval=None)
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception:
+                pass
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start sampling on a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="aria-telemetry", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        """Most recent sample, or None before the first one"""
+        with self._lock:
+            if not self._count:
+                return None
+            index = (self._index - 1) % self.length
+            return {field: self._buffers[field][index] for field in self.FIELDS}
+
+    def average(self, field: str, seconds: float) -> Tuple[Optional[float], float]:
+        """Mean of a metric over the last seconds, and the span actually covered"""
+        with self._lock:
+            now = time.time()
+            total, count, oldest = 0.0, 0, now
+            for offset in range(1, self._count + 1):
+                index = (self._index - offset) % self.length
+                timestamp = self._buffers["timestamp"][index]
+                if now - timestamp > seconds:
+                    break
+                total += self._buffers[field][index]
+                count += 1
+                oldest = timestamp
+        return (total / count if count else None), now - oldest
+
+
+_SOUNDEX_CODES = {**dict.fromkeys("bfpv", "1"), **dict.fromkeys("cgjkqsxz", "2"), **dict.fromkeys("dt", "3"),
+                  "l": "4", **dict.fromkeys("mn", "5"), "r": "6"}
+
+
+def soundex(word: str) -> str:
+    """Classic four-character Soundex code"""
+    codes = _SOUNDEX_CODES
+    letters = [c for c in word.lower() if c.isalpha()]
+    if not letters:
+        return ""
+    result = letters[0].upper()
+    previous = codes.get(letters[0], "")
+    for letter in letters[1:]:
+        code = codes.get(letter, "")
+        if code and code != previous:
+            result += code
+            if len(result) == 4:
+                break
+        if letter not in "hw":
+            previous = code
+    return result.ljust(4, "0")
+
+
+_PHONETIC_PATTERN = re.compile(r"(?P<soft>c(?=[eiy]))|sch|ph|ck|sh|ch|th|dg|gh|[cqxzv]|w(?![aeiou])|(?<=.)h(?![aeiou])")
+_PHONETIC_SUBSTITUTES = {"sch": "x", "ph": "f", "ck": "k", "sh": "x", "ch": "x", "th": "0", "dg": "j", "gh": "",
+                         "c": "k", "q": "k", "x": "ks", "z": "s", "v": "f", "w": "", "h": ""}
+_REPEATED_LETTERS = re.compile(r"(.)\1+")
+_NON_LETTERS = re.compile(r"[^a-z]+")
+_DROP_VOWELS = str.maketrans("", "", "aeiouy")
+
+
+@functools.lru_cache(maxsize=65536)
+def phonetic_key(word: str) -> str:
+    """Metaphone-style consonant skeleton: "Sophie", "sofie" and "so fee" all give "sf" """
+    word = _NON_LETTERS.sub("", word.lower())
+    word = _PHONETIC_PATTERN.sub(lambda m: "s" if m.group("soft") else _PHONETIC_SUBSTITUTES[m.group()], word)
+    word = _REPEATED_LETTERS.sub(r"\1", word)
+    return word[:1] + word[1:].translate(_DROP_VOWELS)
+
+
+def edit_distance(a: str, b: str, bound: int = None) -> int:
+    """Levenshtein distance between two strings, or bound + 1 once it must exceed bound"""
+    if len(a) < len(b):
+        a, b = b, a
+    if bound is not None and len(a) - len(b) > bound:
+        return bound + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if bound is not None and min(current) > bound:
+            return bound + 1
+        previous = current
+    return previous[-1]
+
+
+class ContactResolver:
+    """
+    Fuzzy, phonetic contact-name matcher.
+    Each distinct name form (first name, last name, full name, nickname key)
+    is indexed by phonetic key, Soundex code and character trigram, so
+    speech-to-text variants such as "sofie" or "so fee" still find Sophie.
+    Lookups try the narrowest index first and rank the few surviving forms
+    by edit distance. update() re-indexes only contacts whose name changed.
+    """
+
+    # Words in a contacts request that are never part of a name
+    IGNORED = {"call", "contact", "phone", "email", "reach", "please", "my", "to", "the", "what", "what's",
+               "is", "for", "info", "information", "number", "a", "an", "me", "give", "can", "you", "of", "and"}
+    MAX_GRAM_POSTINGS = 2000
+
+    def __init__(self):
+        self._names: Dict[str, str] = {}
+        self._key_forms: Dict[str, List[str]] = {}
+        self._form_keys: Dict[str, set] = {}
+        self._form_codes: Dict[str, Tuple[str, str]] = {}
+        self._by_phonetic: Dict[str, set] = {}
+        self._by_soundex: Dict[str, set] = {}
+        self._by_gram: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _grams_of(form: str) -> set:
+        padded = f" {form} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    @staticmethod
+    def _surface_forms(key: str, name: str) -> List[str]:
+        parts = [part for part in tokenize(name) if len(part) > 1]
+        forms = set(parts)
+        if len(parts) > 1:
+            forms.add("".join(parts))
+        if key.isalpha():
+            forms.add(key.lower())
+        return list(forms)
+
+    def _add(self, key: str, name: str):
+        forms = self._surface_forms(key, name)
+        self._names[key] = name
+        self._key_forms[key] = forms
+        for form in forms:
+            keys = self._form_keys.get(form)
+            if keys:
+                keys.add(key)
+                continue
+            self._form_keys[form] = {key}
+            codes = self._form_codes[form] = (phonetic_key(form), soundex(form))
+            self._by_phonetic.setdefault(codes[0], set()).add(form)
+            self._by_soundex.setdefault(codes[1], set()).add(form)
+            for gram in self._grams_of(form):
+                self._by_gram.setdefault(gram, set()).add(form)
+
+    def _remove(self, key: str):
+        self._names.pop(key, None)
+        for form in self._key_forms.pop(key, []):
+            keys = self._form_keys[form]
+            keys.discard(key)
+            if keys:
+                continue
+            del self._form_keys[form]
+            phonetic, sound = self._form_codes.pop(form)
+            self._by_phonetic[phonetic].discard(form)
+            self._by_soundex[sound].discard(form)
+            for gram in self._grams_of(form):
+                self._by_gram[gram].discard(form)
+
+    def update(self, names: Dict[str, str]) -> int:
+        """Sync the index with a key -> name mapping; return how many entries changed"""
+        with self._lock:
+            changed = 0
+            for key in [key for key in self._names if key not in names]:
+                self._remove(key)
+                changed += 1
+            for key, name in names.items():
+                if self._names.get(key) != name:
+                    self._remove(key)
+                    self._add(key, name)
+                    changed += 1
+            return changed
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _candidate_forms(self, span: str) -> Iterable[str]:
+        if span in self._form_keys:
+            return (span,)
+        forms = self._by_phonetic.get(phonetic_key(span)) or self._by_soundex.get(soundex(span))
+        if forms:
+            return forms
+        # Nothing sounds alike: fall back to forms sharing the most selective trigrams
+        counts: Counter = Counter()
+        for gram in self._grams_of(span):
+            postings = self._by_gram.get(gram, ())
+            if len(postings) <= self.MAX_GRAM_POSTINGS:
+                counts.update(postings)
+        return [form for form, _ in counts.most_common(50)]
+
+    def resolve(self, text: str, limit: int = 3, threshold: float = 0.6) -> List[Tuple[str, float]]:
+        """Return (key, score) candidates for a name mentioned in text, best first"""
+        words = [word[:-2] if word.endswith("'s") else word for word in tokenize(text)]
+        words = [word for word in words if word not in self.IGNORED]
+        spans = {"".join(words[i:i + n]) for n in (1, 2, 3) for i in range(len(words) - n + 1)}
+        best: Dict[str, float] = {}
+        with self._lock:
+            for span in spans:
+                span_key = phonetic_key(span)
+                for form in self._candidate_forms(span):
+                    # Largest edit distance that can still reach the threshold
+                    sounds_alike = self._form_codes[form][0] == span_key
+                    longest = max(len(span), len(form))
+                    bound = int(longest * (1 - (threshold - 0.3 * sounds_alike) / 0.7))
+                    distance = edit_distance(span, form, bound)
+                    if distance > bound:
+                        continue
+                    score = 0.7 * (1 - distance / longest) + 0.3 * sounds_alike
+                    for key in self._form_keys[form]:
+                        if score > best.get(key, 0.0):
+                            best[key] = score
+        ranked = sorted(((key, score) for key, score in best.items() if score >= threshold),
+                        key=lambda item: -item[1])
+        return ranked[:limit]
+
+
+class DataStore:
+    """
+    Indexed storage for schedule and contacts.
+    schedule.json and contacts.json stay the editable source: they are
+    imported into SQLite (indexed by date/time, name and Soundex key) when
+    their size or mtime changes, including while ARIA is running. Writes
+    through the API go to SQLite in one transaction and the JSON file is
+    re-exported atomically in the background.
+    """
+
+    def __init__(self, db_path: Path, schedule_path: Path, contacts_path: Path):
+        self.schedule_path = Path(schedule_path)
+        self.contacts_path = Path(contacts_path)
+        self.on_change: List = []
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._export_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aria-store-export")
+        self._pending_exports: set = set()
+        self._rejected: Dict[Path, Tuple[int, int]] = {}
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS schedule (
+                id INTEGER PRIMARY KEY, date TEXT NOT NULL DEFAULT '', time TEXT NOT NULL DEFAULT '',
+                title TEXT, location TEXT, priority TEXT, data TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS schedule_date_time ON schedule (date, time);
+            CREATE TABLE IF NOT EXISTS contacts (
+                key TEXT PRIMARY KEY, name TEXT, name_lower TEXT, phonetic TEXT, data TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS contacts_name ON contacts (name_lower);
+            CREATE INDEX IF NOT EXISTS contacts_phonetic ON contacts (phonetic);
+            CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER);
+        """)
+
+    def _signature(self, path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _is_current(self, path: Path) -> bool:
+        row = self.db.execute("SELECT mtime_ns, size FROM sources WHERE path = ?", (str(path),)).fetchone()
+        return row is not None and (row["mtime_ns"], row["size"]) == self._signature(path)
+
+    def _mark_current(self, path: Path):
+        signature = self._signature(path)
+        if signature is not None:
+            self.db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)", (str(path), *signature))
+
+    def refresh(self) -> set:
+        """Re-import any JSON source that changed on disk; return the changed tables"""
+        changed = set()
+        with self._lock:
+            for table, path, validate, importer in (
+                    ("schedule", self.schedule_path, self._valid_schedule, self._import_schedule),
+                    ("contacts", self.contacts_path, self._valid_contacts, self._import_contacts)):
+                signature = self._signature(path)
+                if signature is None or self._rejected.get(path) == signature or self._is_current(path):
+                    continue
+                try:
+                    with open(path, 'r') as f:
+                        data = json.load(f)
+                    rows = validate(data)
+                except (OSError, ValueError) as e:
+                    # Keep serving the last good copy rather than overwriting the user's file;
+                    # warn once per version of the file, not on every watcher pass
+                    print(f"{Colors.YELLOW}Could not read {path} ({e}); keeping previous data{Colors.END}")
+                    self._rejected[path] = signature
+                    continue
+                if len(rows) < len(data):
+                    print(f"{Colors.YELLOW}Skipped {len(data) - len(rows)} malformed entries in {path}{Colors.END}")
+                with self.db:
+                    importer(rows)
+                    self._mark_current(path)
+                changed.add(table)
+        if changed:
+            for listener in self.on_change:
+                listener(changed)
+        return changed
+
+    @staticmethod
+    def _valid_schedule(data) -> List[Dict]:
+        """Appointments that can be imported; ValueError if the file is not a list"""
+        if not isinstance(data, list):
+            raise ValueError("expected a list of appointments")
+        return [entry for entry in data if isinstance(entry, dict) and
+                not any(isinstance(entry.get(field), (dict, list)) for field in ("title", "location", "priority"))]
+
+    @staticmethod
+    def _valid_contacts(data) -> Dict[str, Dict]:
+        """Contacts that can be imported; ValueError if the file is not an object"""
+        if not isinstance(data, dict):
+            raise ValueError("expected an object of contacts")
+        return {key: contact for key, contact in data.items()
+                if isinstance(contact, dict) and isinstance(contact.get("name", key), str)}
+
+    @staticmethod
+    def _schedule_row(entry: Dict) -> Tuple:
+        return (str(entry.get("date", "")), str(entry.get("time", "")), entry.get("title"),
+                entry.get("location"), entry.get("priority"), json.dumps(entry))
+
+    @staticmethod
+    def _contact_row(key: str, contact: Dict, data: Optional[str] = None) -> Tuple:
+        name = contact.get("name", key)
+        return (key, name, name.lower(), soundex(name), data or json.dumps(contact))
+
+    def _import_schedule(self, entries: List[Dict]):
+        self.db.execute("DELETE FROM schedule")
+        self.db.executemany("INSERT INTO schedule (date, time, title, location, priority, data) VALUES (?, ?, ?, ?, ?, ?)",
+                            (self._schedule_row(entry) for entry in entries))
+
+    def _import_contacts(self, contacts: Dict[str, Dict]):
+        # Only touch rows that changed, so editing one contact stays cheap
+        existing = dict(self.db.execute("SELECT key, data FROM contacts"))
+        removed = existing.keys() - contacts.keys()
+        self.db.executemany("DELETE FROM contacts WHERE key = ?", ((key,) for key in removed))
+        changed = []
+        for key, contact in contacts.items():
+            data = json.dumps(contact)
+            if existing.get(key) != data:
+                changed.append(self._contact_row(key, contact, data))
+        self.db.executemany("INSERT OR REPLACE INTO contacts VALUES (?, ?, ?, ?, ?)", changed)
+
+    def watch(self, interval: float = 2.0):
+        """Hot-reload changed JSON files on a background thread"""
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"{Colors.RED}Data reload error: {e}{Colors.END}")
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=run, name="aria-store-watch", daemon=True)
+            self._watcher.start()
+
+    def close(self):
+        self._stop.set()
+        self._export_pool.shutdown(wait=True)
+        with self._lock:
+            self.db.close()
+
+    # Schedule
+    def schedule_for(self, day: datetime.date) -> List[Dict]:
+        """Entries on a given date plus undated ("today"/"daily") ones, by time"""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT data FROM schedule WHERE date IN (?, '', 'today', 'daily') ORDER BY time",
+                (day.isoformat(),)).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def upcoming_schedule(self, day: datetime.date) -> List[Dict]:
+        """Entries dated on or after a day plus undated ones"""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT data FROM schedule WHERE date >= ? OR date IN ('', 'today', 'daily')",
+                (day.isoformat(),)).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def all_schedule(self) -> List[Dict]:
+        with self._lock:
+            rows = self.db.execute("SELECT data FROM schedule ORDER BY id").fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def add_appointment(self, entry: Dict):
+        """Insert one appointment atomically and re-export schedule.json"""
+        with self._lock, self.db:
+            self.db.execute("INSERT INTO schedule (date, time, title, location, priority, data) VALUES (?, ?, ?, ?, ?, ?)",
+                            self._schedule_row(entry))
+        self._schedule_export(self.schedule_path, self.all_schedule)
+        for listener in self.on_change:
+            listener({"schedule"})
+
+    # Contacts
+    def all_contacts(self) -> Dict[str, Dict]:
+        with self._lock:
+            rows = self.db.execute("SELECT key, data FROM contacts").fetchall()
+        return {row["key"]: json.loads(row["data"]) for row in rows}
+
+    def contact_count(self) -> int:
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+    def contact_names(self, limit: int = 5) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self.db.execute("SELECT name FROM contacts ORDER BY name LIMIT ?", (limit,))]
+
+    def contact_name_map(self) -> Dict[str, str]:
+        """Contact names by key, without decoding the full records"""
+        with self._lock:
+            return dict(self.db.execute("SELECT key, name FROM contacts"))
+
+    def get_contact(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self.db.execute("SELECT data FROM contacts WHERE key = ?", (key,)).fetchone()
+        return dict(json.loads(row["data"]), key=key) if row else None
+
+    def contacts_by_phonetic(self, code: str) -> List[Dict]:
+        with self._lock:
+            rows = self.db.execute("SELECT key, data FROM contacts WHERE phonetic = ?", (code,)).fetchall()
+        return [dict(json.loads(row["data"]), key=row["key"]) for row in rows]
+
+    def find_contacts_in(self, text: str) -> List[Dict]:
+        """Contacts whose key or full name appears in the text, in order of mention"""
+        words = [word[:-2] if word.endswith("'s") else word for word in tokenize(text)]
+        spans = [" ".join(words[i:i + n]) for n in (3, 2, 1) for i in range(len(words) - n + 1)]
+        if not spans:
+            return []
+        placeholders = ", ".join("?" * len(spans))
+        with self._lock:
+            rows = self.db.execute(
+                f"SELECT key, name_lower, data FROM contacts WHERE name_lower IN ({placeholders}) "
+                f"OR key IN ({placeholders})", spans + spans).fetchall()
+        position = {span: text.find(span) for span in spans}
+        rows = sorted(rows, key=lambda row: min(position.get(row["name_lower"], len(text)),
+                                                position.get(row["key"], len(text))))
+        return [dict(json.loads(row["data"]), key=row["key"]) for row in rows]
+
+    def upsert_contact(self, key: str, contact: Dict):
+        """Insert or update one contact atomically and re-export contacts.json"""
+        with self._lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO contacts VALUES (?, ?, ?, ?, ?)", self._contact_row(key, contact))
+        self._schedule_export(self.contacts_path, self.all_contacts)
+        for listener in self.on_change:
+            listener({"contacts"})
+
+    def _schedule_export(self, path: Path, snapshot):
+        """Queue a JSON export, coalescing bursts of writes into one"""
+        with self._lock:
+            if path in self._pending_exports:
+                return
+            self._pending_exports.add(path)
+        self._export_pool.submit(self._export, path, snapshot)
+    
+    def flush(self):
+        """Wait for queued JSON exports to finish"""
+        self._export_pool.submit(lambda: None).result()
+    
+    def _export(self, path: Path, snapshot):
+        """Rewrite a JSON source atomically and remember it as current"""
+        with self._lock:
+            self._pending_exports.discard(path)
+        partial = path.with_suffix(".part")
+        with open(partial, 'w') as f:
+            json.dump(snapshot(), f, indent=2)
+        os.replace(partial, path)
+        with self._lock, self.db:
+            self._mark_current(path)
+
+
+class ConversationLog:
+    """
+    Conversation history as numbered JSONL segments in one directory.
+    append() only adds the turn to the in-memory ring of recent turns and a
+    queue; a writer thread drains the queue in batches of up to batch_size
+    turns, with one write and one fsync per batch (at most flush_interval
+    seconds after the first turn of a batch arrives). A segment is
+    closed once it passes segment_bytes, and the oldest segments beyond
+    max_segments are deleted (0 keeps everything). iter_turns() streams the
+    segments a line at a time, skipping whole segments outside the time range.
+    """
+
+    def __init__(self, directory: Path, segment_bytes: int = 4 << 20, max_segments: int = 0,
+                 ring_size: int = 20, flush_interval: float = 1.0, batch_size: int = 512):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.recent: deque = deque(maxlen=ring_size)
+        self.written = self.batches = 0
+        self._queue: "queue.Queue[Optional[Dict]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def segments(self) -> List[Path]:
+        """Segment files, oldest first"""
+        return sorted(self.directory.glob("*.jsonl"))
+
+    def append(self, turn: Dict, persist: bool = True):
+        """Remember a turn for follow-ups and queue it for the log"""
+        self.recent.append(turn)
+        if not persist:
+            return
+        with self._lock:
+            if self._thread is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._thread = threading.Thread(target=self._write, daemon=True, name="aria-history")
+                self._thread.start()
+        self._queue.put(turn)
+
+    def _open_segment(self, path: Optional[Path] = None):
+        if path is None:
+            existing = self.segments()
+            number = int(existing[-1].stem) + 1 if existing else 1
+            path = self.directory / f"{number:08d}.jsonl"
+        return open(path, "a", encoding="utf-8")
+
+    def _write(self):
+        """Drain queued turns into the current segment, one write and fsync per batch"""
+        existing = self.segments()
+        f = self._open_segment(existing[-1] if existing else None)
+        try:
+            while True:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                while batch[-1] is not None and len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                    except queue.Empty:
+                        break
+                closing = batch[-1] is None
+                lines = [json.dumps(turn, default=str) for turn in batch if turn is not None]
+                if lines:
+                    f.write("\n".join(lines) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                    self.written += len(lines)
+                    self.batches += 1
+                    if f.tell() >= self.segment_bytes:
+                        f.close()
+                        f = self._open_segment()
+                        self._prune()
+                for _ in batch:
+                    self._queue.task_done()
+                if closing:
+                    return
+        finally:
+            f.close()
+
+    def _prune(self):
+        if self.max_segments:
+            for path in self.segments()[:-self.max_segments]:
+                path.unlink(missing_ok=True)
+
+    def flush(self):
+        """Wait until every queued turn is on disk"""
+        self._queue.join()
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    @staticmethod
+    def _first_timestamp(path: Path) -> Optional[float]:
+        with open(path, "r", encoding="utf-8") as f:
+            line = f.readline()
+        return json.loads(line).get("timestamp") if line.endswith("\n") else None
+
+    def iter_turns(self, since: Optional[float] = None, until: Optional[float] = None,
+                   reverse: bool = False) -> Iterator[Dict]:
+        """
+        Stream logged turns between two timestamps, oldest first (or newest
+        first with reverse; that reads one segment at a time into memory)
+        """
+        segments = self.segments()
+        starts = [self._first_timestamp(path) for path in segments]
+        chosen = []
+        for index, path in enumerate(segments):
+            following = starts[index + 1] if index + 1 < len(starts) else None
+            if since is not None and following is not None and following < since:
+                continue
+            if until is not None and starts[index] is not None and starts[index] > until:
+                break
+            chosen.append(path)
+        for path in reversed(chosen) if reverse else chosen:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    lines = reversed(f.readlines()) if reverse else f
+                    for line in lines:
+                        # A line without its newline is still being written
+                        if not line.endswith("\n") or not line.strip():
+                            continue
+                        turn = json.loads(line)
+                        stamp = turn.get("timestamp", 0)
+                        if (since is None or stamp >= since) and (until is None or stamp <= until):
+                            yield turn
+            except FileNotFoundError:
+                continue
+
+
+# The current server-mode session; None for the local microphone user
+CURRENT_SESSION: "contextvars.ContextVar[Optional[Session]]" = contextvars.ContextVar("aria_session", default=None)
+
+
+class ServerOverloaded(RuntimeError):
+    """A worker pool's queue is full"""
+
+
+class BadRequest(ValueError):
+    """A request body the server cannot parse; answered with 400"""
+
+
+class Session:
+    """Per-client state in server mode"""
+
+    def __init__(self, session_id: str, user_name: str, preferences: Dict, history_length: int = 50):
+        self.id = session_id
+        self.user_name = user_name
+        self.preferences = preferences
+        self.history: deque = deque(maxlen=history_length)
+        self.opened_urls: List[str] = []
+        self.created = self.last_seen = time.time()
+        self.lock = asyncio.Lock()
+
+    def state(self) -> Dict:
+        return {"session_id": self.id, "user_name": self.user_name, "preferences": self.preferences,
+                "created": self.created, "last_seen": self.last_seen, "history": list(self.history)}
+
+
+class BoundedPool:
+    """
+    Thread pool with a hard cap on queued work.
+    run() raises ServerOverloaded instead of queueing past max_pending, so a
+    traffic spike turns into fast 503s rather than unbounded latency.
+    """
+
+    def __init__(self, name: str, workers: int, max_pending: int):
+        self.name = name
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"aria-{name}")
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+
+    async def run(self, function, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ServerOverloaded(self.name)
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AriaServer:
+    """
+    Multi-session front end: one process, many thin clients.
+    Speaks JSON over HTTP/1.1 with keep-alive, using only asyncio streams:
+        POST   /sessions               {"user_name", "preferences"} -> {"session_id"}
+        GET    /sessions/<id>          state and recent history
+        DELETE /sessions/<id>
+        POST   /sessions/<id>/text     {"text"} -> {"response", "emotion", "intent", "ms", "open_urls"}
+        POST   /sessions/<id>/audio    WAV body -> the same plus "transcript"
+        POST   /speak                  {"text"} -> audio/wav
+        GET    /metrics, GET /healthz
+    Commands, recognition and speech synthesis share preloaded engines on
+    separate bounded pools. Turns within a session are handled in order.
+    """
+
+    def __init__(self, assistant: "AriaAssistant"):
+        self.assistant = assistant
+        config = assistant.config
+        per_worker = config["server_queue_per_worker"]
+        self.pools = {
+            "command": BoundedPool("command", config["server_command_workers"],
+                                   config["server_command_workers"] * per_worker),
+            "recognition": BoundedPool("recognition", config["server_recognition_workers"],
+                                       config["server_recognition_workers"] * per_worker),
+            "tts": BoundedPool("tts", 1, per_worker),
+        }
+        self.sessions: Dict[str, Session] = {}
+        self.recognition_backend: Optional[RecognizerBackend] = None
+        self.tts_cache = TTSCache(Path(config["tts_cache_dir"]), config["tts_cache_max_mb"] * 1024 * 1024)
+        self._tts_engine = None
+        self.port: Optional[int] = None
+        self._loop = None
+        self._stopped = None
+
+    def load_engines(self):
+        """Warm up the shared recognizer once for every session"""
+        if not SPEECH_RECOGNITION_AVAILABLE:
+            return
+        name = self.assistant.config["recognizer_backend"]
+        backend = create_recognizer_backend(name, sr.Recognizer(), self.assistant.config)
+        try:
+            backend.warm_up()
+            self.recognition_backend = backend
+        except Exception as e:
+            print(f"{Colors.YELLOW}Recognizer '{name}' unavailable for audio sessions ({e}){Colors.END}")
+
+    # Work done on the pools
+    def _process(self, session: Session, text: str) -> Dict:
+        token = CURRENT_SESSION.set(session)
+        try:
+            started = time.perf_counter()
+            urls_before = len(session.opened_urls)
+            with self.assistant.conversation_turn(session=session.id, utterance=text) as turn:
+                response, emotion = self.assistant.process_command(text, wait=True)
+                if not isinstance(response, str):
+                    response = " ".join(split_sentences(response))
+            if response == "goodbye":
+                response = self.assistant.goodbye_message()
+            elapsed = (time.perf_counter() - started) * 1000
+        finally:
+            CURRENT_SESSION.reset(token)
+        return {"response": response, "emotion": emotion, "intent": turn["intent"], "ms": round(elapsed, 3),
+                "open_urls": session.opened_urls[urls_before:]}
+
+    def _recognize(self, wav: bytes) -> str:
+        try:
+            with sr.AudioFile(io.BytesIO(wav)) as source:
+                audio = self.recognition_backend.recognizer.record(source)
+        except ValueError as e:
+            raise BadRequest(f"unreadable audio: {e}") from e
+        with METRICS.span("listen.recognize", backend=self.recognition_backend.name):
+            return self.recognition_backend.recognize(audio)
+
+    def _synthesize(self, text: str) -> bytes:
+        # pyttsx3 engines belong to the thread that made them: the single TTS worker
+        if self._tts_engine is None:
+            self._tts_engine = pyttsx3.init()
+            self._tts_engine.setProperty('rate', self.assistant.config['voice_rate'])
+        key = TTSCache.key(text, str(self._tts_engine.getProperty('voice')), self.assistant.config['voice_rate'], 1.0)
+        path = self.tts_cache.get(key)
+        if path is None:
+            with METRICS.span("speak.render"):
+                path = self.tts_cache.render(self._tts_engine, text, key)
+        return path.read_bytes()
+
+    # HTTP
+    @staticmethod
+    def _text(payload: Dict) -> str:
+        """The request's "text" field"""
+        if "text" not in payload:
+            raise BadRequest("missing 'text'")
+        text = payload["text"]
+        if not isinstance(text, str):
+            raise BadRequest("'text' must be a string")
+        return text
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, Union[Dict, bytes], str]:
+        parts = [part for part in path.split("?")[0].split("/") if part]
+        if parts == ["healthz"] and method == "GET":
+            return 200, {"status": "ok", "sessions": len(self.sessions),
+                         "pending": {name: pool.pending for name, pool in self.pools.items()}}, "application/json"
+        if parts == ["metrics"] and method == "GET":
+            return 200, METRICS.prometheus_text().encode(), "text/plain; version=0.0.4"
+        try:
+            payload = json.loads(body) if body and parts[-1:] != ["audio"] else {}
+        except ValueError as e:
+            raise BadRequest(f"invalid JSON: {e}") from e
+        if not isinstance(payload, dict):
+            raise BadRequest("body must be a JSON object")
 
-try:
-    import pyttsx3  # type: ignore
-    TTS_AVAILABLE = True
-except ImportError:
-    print("Warning: pyttsx3 not installed. Run: pip install pyttsx3")
-    TTS_AVAILABLE = False
-    pyttsx3 = None  # type: ignore
+        if parts == ["sessions"] and method == "POST":
+            if len(self.sessions) >= self.assistant.config["server_max_sessions"]:
+                raise ServerOverloaded("sessions")
+            user_name, preferences = payload.get("user_name", ""), payload.get("preferences", {})
+            if not isinstance(user_name, str):
+                raise BadRequest("'user_name' must be a string")
+            if not isinstance(preferences, dict):
+                raise BadRequest("'preferences' must be a JSON object")
+            # Sessions start from the client's own settings, never the local user's preferences file
+            session = Session(uuid.uuid4().hex, user_name or self.assistant.user_name, preferences)
+            self.sessions[session.id] = session
+            return 201, {"session_id": session.id}, "application/json"
+        if parts == ["speak"] and method == "POST":
+            if not TTS_AVAILABLE:
+                return 501, {"error": "text-to-speech is not installed"}, "application/json"
+            return 200, await self.pools["tts"].run(self._synthesize, self._text(payload)), "audio/wav"
 
-# Environment and HTTP
-try:
-    from dotenv import load_dotenv  # type: ignore
-    load_dotenv()
-    DOTENV_AVAILABLE = True
-except ImportError:
-    print("Warning: python-dotenv not installed. Run: pip install python-dotenv")
-    DOTENV_AVAILABLE = False
-    def load_dotenv():  # type: ignore
-        pass
+        if len(parts) < 2 or parts[0] != "sessions" or parts[1] not in self.sessions:
+            return 404, {"error": "unknown session" if parts[:1] == ["sessions"] else "not found"}, "application/json"
+        session = self.sessions[parts[1]]
+        session.last_seen = time.time()
+        if len(parts) == 2 and method == "GET":
+            return 200, session.state(), "application/json"
+        if len(parts) == 2 and method == "DELETE":
+            del self.sessions[session.id]
+            return 200, {"deleted": session.id}, "application/json"
+        if parts[2:] == ["text"] and method == "POST":
+            async with session.lock:
+                return 200, await self.pools["command"].run(self._process, session, self._text(payload).lower()), "application/json"
+        if parts[2:] == ["audio"] and method == "POST":
+            if self.recognition_backend is None:
+                return 501, {"error": "no speech recognizer loaded"}, "application/json"
+            async with session.lock:
+                try:
+                    transcript = await self.pools["recognition"].run(self._recognize, body)
+                except sr.UnknownValueError:
+                    return 422, {"error": "could not understand audio"}, "application/json"
+                except sr.RequestError as e:
+                    return 502, {"error": f"speech recognizer unavailable: {e}"}, "application/json"
+                result = await self.pools["command"].run(self._process, session, transcript.lower())
+            return 200, dict(result, transcript=transcript), "application/json"
+        return 405, {"error": f"{method} not allowed here"}, "application/json"
 
-try:
-    import requests  # type: ignore
-    REQUESTS_AVAILABLE = True
-except ImportError:
-    print("Warning: requests not installed. Run: pip install requests")
-    REQUESTS_AVAILABLE = False
-    requests = None  # type: ignore
+    async def _handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one keep-alive connection"""
+        max_body = self.assistant.config["server_max_body_mb"] * 1024 * 1024
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                keep_alive = headers.get("connection", "").lower() != "close" and length <= max_body
+                if length > max_body:
+                    status, payload, content_type = 413, {"error": "request body too large"}, "application/json"
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        with METRICS.span(f"server.{method}"):
+                            status, payload, content_type = await self._route(method, target, body)
+                    except ServerOverloaded as e:
+                        status, payload, content_type = 503, {"error": f"{e} queue is full, retry shortly"}, "application/json"
+                    except BadRequest as e:
+                        status, payload, content_type = 400, {"error": f"bad request: {e}"}, "application/json"
+                    except Exception as e:
+                        status, payload, content_type = 500, {"error": str(e)}, "application/json"
 
-try:
-    import psutil  # type: ignore
-    PSUTIL_AVAILABLE = True
-except ImportError:
-    print("Warning: psutil not installed. Run: pip install psutil")
-    PSUTIL_AVAILABLE = False
-    psutil = None  # type: ignore
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                head = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", f"Content-Type: {content_type}",
+                        f"Content-Length: {len(data)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                if status == 503:
+                    head.append("Retry-After: 1")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
 
-# Console colors and formatting
-class Colors:
-    CYAN = '\033[96m'
-    BLUE = '\033[94m'
-    GREEN = '\033[92m'
-    YELLOW = '\033[93m'
-    RED = '\033[91m'
-    PURPLE = '\033[95m'
-    WHITE = '\033[97m'
-    BOLD = '\033[1m'
-    DIM = '\033[2m'
-    END = '\033[0m'
+    async def _expire_sessions(self):
+        """Drop sessions that have been idle longer than server_session_ttl"""
+        while True:
+            await asyncio.sleep(60)
+            cutoff = time.time() - self.assistant.config["server_session_ttl"]
+            for session_id in [key for key, session in self.sessions.items() if session.last_seen < cutoff]:
+                del self.sessions[session_id]
+
+    async def serve(self, host: str, port: int, ready: Optional[threading.Event] = None):
+        """Accept clients until stop() is called"""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        self.port = server.sockets[0].getsockname()[1]
+        expiry = asyncio.ensure_future(self._expire_sessions())
+        if ready is not None:
+            ready.set()
+        async with server:
+            await self._stopped.wait()
+        expiry.cancel()
+        for pool in self.pools.values():
+            pool.shutdown()
+
+    def start_background(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Run the server on its own event loop thread; return the bound port"""
+        ready = threading.Event()
+        threading.Thread(target=lambda: asyncio.run(self.serve(host, port, ready)), daemon=True,
+                         name="aria-server").start()
+        ready.wait()
+        return self.port
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
 
-# Load environment variables
-load_dotenv()
 
 class AriaAssistant:
     """
@@ -80,22 +3740,50 @@ class AriaAssistant:
     Professional Voice Assistant with Elegant Features
     """
     
-    def __init__(self):
+    # How "what about <rest>?" expands after a turn of each intent (default: previous command + rest)
+    FOLLOW_UP_TEMPLATES = {"Weather": "weather in {rest}", "Contacts": "contact {rest}"}
+    
+    def __init__(self, pipeline: bool = False, barge_in: bool = False, recognizer_backend: Optional[str] = None,
+                 headless: bool = False, fast_start: bool = False, startup_profile: bool = False,
+                 wake_word: bool = True, capture: Optional[str] = None, metrics_port: Optional[int] = None,
+                 trace_file: Optional[str] = None, record: Optional[str] = None, replay: Optional[str] = None,
+                 replay_speed: float = 1.0):
         # Check required dependencies
-        if not SPEECH_RECOGNITION_AVAILABLE:
+        if not headless and not SPEECH_RECOGNITION_AVAILABLE:
             print(f"{Colors.RED}❌ Speech Recognition not available. Please install: pip install speechrecognition{Colors.END}")
             sys.exit(1)
         
-        if not TTS_AVAILABLE:
+        if not headless and not TTS_AVAILABLE:
             print(f"{Colors.RED}❌ Text-to-Speech not available. Please install: pip install pyttsx3{Colors.END}")
             sys.exit(1)
         
-        self.user_name = "Dian"
+        self._user_name = "Dian"
         self.assistant_name = "ARIA"
         self.version = "2.0.0"
         self.is_listening = False
         self.is_speaking = False
         self.conversation_count = 0
+        self.pipeline: Optional[VoicePipeline] = None
+        self.player = AudioPlayer()
+        self.tts_cache: Optional[TTSCache] = None
+        # pyttsx3 engines belong to the thread that made them: the engine is created and driven on this one worker
+        self.tts_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aria-tts")
+        self.speech_interrupted = threading.Event()
+        self.first_audio_latencies: deque = deque(maxlen=500)
+        self.opened_urls: List[str] = []
+        self.startup_phases: Dict[str, float] = {}
+        self.wake_spotter: Optional[WakeWordSpotter] = None
+        self.frame_capture: Optional[FrameCapture] = None
+        self.noise: Optional[NoiseFloorEstimator] = None
+        self.wake_stats: Counter = Counter()
+        self.awake_until = 0.0
+        self.reminders: Optional[ReminderScheduler] = None
+        self.notifications: "queue.Queue[tuple]" = queue.Queue()
+        self.reminders_spoken = 0
+        self.last_turn_ended = 0.0
+        self.recorder: Optional[SessionRecorder] = None
+        self.replay: Optional[SessionArchive] = None
+        self._setup_threads: List[threading.Thread] = []
         self.session_start_time = datetime.datetime.now()
         
         # Configuration
@@ -103,21 +3791,105 @@ class AriaAssistant:
             "voice_rate": 180,
             "voice_volume": 0.9,
             "listen_timeout": 5,
+            "server_command_workers": 8,
+            "server_recognition_workers": 2,
+            "server_queue_per_worker": 4,
+            "server_session_ttl": 1800,
+            "server_max_sessions": 10000,
+            "server_max_body_mb": 10,
+            "metrics_port": metrics_port or int(os.getenv("ARIA_METRICS_PORT", "0")),
+            "trace_file": trace_file or os.getenv("ARIA_TRACE", ""),
+            "capture": capture or os.getenv("ARIA_CAPTURE", "vad"),
+            "vad_aggressiveness": 2,
+            "vad_frame_ms": 30,
+            "vad_pre_roll_ms": 300,
+            "vad_min_silence_ms": 240,
+            "vad_max_silence_ms": 800,
+            "vad_max_seconds": 15,
+            "noise_window_seconds": 5,
+            "noise_percentile": 15.0,
+            "noise_ratio": 2.0,
+            "headless": headless,
+            "fast_start": fast_start,
+            "startup_profile": startup_profile,
+            "startup_cache": ".aria_cache/startup.json",
+            "startup_cache_max_age_hours": 12,
+            "pipeline": pipeline,
+            "barge_in": barge_in,
+            "barge_in_ratio": 2.0,
+            "barge_in_min_ms": 300,
+            "language": "en-US",
+            "recognizer_backend": recognizer_backend or os.getenv("ARIA_RECOGNIZER", "google"),
+            "recognizer_url": os.getenv("ARIA_RECOGNIZER_URL", "http://127.0.0.1:8765/recognize"),
+            "vosk_model_path": os.getenv("VOSK_MODEL_PATH", "model"),
+            "whisper_model": os.getenv("WHISPER_MODEL", "base.en"),
+            "preferences_file": "user_preferences.json",
+            "wake_word": wake_word,
+            "wake_word_engine": os.getenv("ARIA_WAKE_ENGINE", "auto"),
+            "wake_word_sensitivity": 0.8,
+            "wake_window_seconds": 8,
+            "tts_cache": True,
+            "tts_cache_dir": ".aria_cache/tts",
+            "tts_cache_max_mb": 50,
             "weather_api_key": os.getenv("WEATHER_API_KEY", "") if DOTENV_AVAILABLE else "",
             "openai_api_key": os.getenv("OPENAI_API_KEY", "") if DOTENV_AVAILABLE else "",
+            "weather_url": os.getenv("WEATHER_API_URL", "http://api.openweathermap.org/data/2.5/weather"),
+            "weather_cache": ".aria_cache/weather.json",
+            "weather_ttl": 600,
+            "weather_stale_ttl": 3600,
+            "default_city": "Jakarta",
+            "telemetry_interval": 2.0,
+            "telemetry_length": 300,
+            "telemetry_trend_seconds": 300,
+            "data_store": ".aria_cache/aria.db",
+            "data_watch_interval": 2.0,
+            "contact_ambiguity_margin": 0.05,
+            "response_cache": True,
+            "response_cache_entries": 512,
+            "handler_workers": 4,
+            "handler_deadlines": {"Weather": 1.0, "System": 0.5, "Search": 0.5, "Media": 0.5},
+            "history_dir": "conversation_history",
+            "history_segment_mb": 4,
+            "history_max_segments": 0,
+            "history_context_turns": 20,
+            "history_flush_seconds": 1.0,
+            "semantic_routing": True,
+            "semantic_threshold": 0.4,
+            "plugin_dir": os.getenv("ARIA_PLUGINS", "plugins"),
+            "plugin_watch_interval": 2.0,
+            "reminders": True,
+            "reminder_lead_minutes": {"high": 15, "medium": 10, "low": 5},
+            "reminder_quiet_seconds": 3,
+            "record": record or "",
+            "record_dir": "sessions",
         }
         
-        # Initialize components
-        self.setup_speech_recognition()
-        self.setup_text_to_speech()
+        # Initialize components (null audio I/O when headless)
+        self.setup_metrics()
+        self.preferences = self.load_preferences()
+        self.startup_cache = self.load_startup_cache()
+        if headless:
+            self.tts = NullTTS()
+        else:
+            self.start_engines()
+        if replay:
+            self.setup_replay(Path(replay), replay_speed)
+        
+        self.setup_weather()
+        
+        self.telemetry = TelemetrySampler(self.config['telemetry_interval'], self.config['telemetry_length'])
+        if PSUTIL_AVAILABLE:
+            self.telemetry.start()
         
         # Load data
-        self.schedule = self.load_schedule()
-        self.contacts = self.load_contacts()
-        self.reminders = []
+        self.response_cache = ResponseCache(self.config["response_cache_entries"]) if self.config["response_cache"] else None
+        with self.startup_phase("data_load"):
+            self.setup_data_store()
+        if not headless and self.config["reminders"]:
+            self.setup_reminders()
         
         # Features
-        self.commands = {
+        self.builtin_commands = {
             "Greetings": ["hello", "hi", "hey", "good morning", "good afternoon", "good evening"],
             "Time & Date": ["time", "clock", "date", "today", "what time", "current time"],
             "Schedule": ["schedule", "agenda", "appointments", "meetings", "calendar"],
@@ -127,8 +3899,166 @@ class AriaAssistant:
             "System": ["system", "computer", "performance", "cpu", "memory", "battery"],
             "Contacts": ["call", "contact", "phone", "email", "reach"],
             "Media": ["play", "music", "pause", "stop", "song", "video"],
-            "Exit": ["quit", "exit", "bye", "goodbye", "stop", "close"]
+            "Cancel": ["cancel", "never mind", "nevermind", "forget it", "stop that"],
+            "Exit": ["quit", "exit", "bye", "goodbye", "stop", "stop listening", "close"]
+        }
+        
+        # Slow handlers get a deadline, after which ARIA acknowledges and keeps working
+        deadlines = self.config["handler_deadlines"]
+        self.builtin_handlers: Dict[Optional[str], IntentHandler] = {
+            "Greetings": IntentHandler(self.handle_greetings),
+            "Time & Date": IntentHandler(self.handle_time),
+            "Schedule": IntentHandler(self.handle_schedule),
+            "Weather": IntentHandler(self.handle_weather, deadlines.get("Weather"), FIXED_RESPONSES["weather_ack"],
+                                     "checking the weather"),
+            "Search": IntentHandler(self.handle_search, deadlines.get("Search"), FIXED_RESPONSES["browser_ack"],
+                                    "opening the search"),
+            "Calculator": IntentHandler(self.handle_calculator),
+            "System": IntentHandler(self.handle_system, deadlines.get("System"), FIXED_RESPONSES["system_ack"],
+                                    "checking your system"),
+            "Contacts": IntentHandler(self.handle_contacts),
+            "Media": IntentHandler(self.handle_media, deadlines.get("Media"), FIXED_RESPONSES["browser_ack"],
+                                   "opening YouTube"),
+            "Cancel": IntentHandler(self.handle_cancel),
+            "Exit": IntentHandler(self.handle_exit),
+            None: IntentHandler(self.handle_default),
         }
+        self.handler_runner = HandlerRunner(self.config["handler_workers"])
+        
+        # Plugins add intents from manifests; their code is imported on first use
+        self.plugins = PluginRegistry(Path(self.config["plugin_dir"]))
+        with self.startup_phase("plugins"):
+            self.plugins.refresh()
+        with self.startup_phase("router_build"):
+            self.rebuild_router()
+        self.plugins.watch(self.config["plugin_watch_interval"], self.rebuild_router)
+    
+    def rebuild_router(self):
+        """Route over the built-in intents plus the current plugins"""
+        commands = dict(self.builtin_commands)
+        handlers = dict(self.builtin_handlers)
+        # A shared keyword only means its owner, which the keyword router already handles
+        examples = {intent: phrasings + [keyword for keyword in commands[intent] if keyword not in ROUTER_SHARED_OWNERS]
+                    for intent, phrasings in INTENT_EXAMPLES.items()}
+        for intent, manifest in self.plugins.manifests.items():
+            if intent in commands:
+                print(f"{Colors.YELLOW}Skipping plugin {manifest.name}: '{intent}' is a built-in intent{Colors.END}")
+                continue
+            commands[intent] = manifest.keywords
+            handlers[intent] = self.plugins.handler(manifest, self)
+            examples[intent] = manifest.examples + manifest.keywords
+        router = IntentRouter(commands)
+        # Paraphrase fallback for commands without a keyword, fitted off the startup path
+        semantic_router = None
+        if self.config["semantic_routing"]:
+            semantic_router = SemanticRouter(examples, self.config["semantic_threshold"])
+            threading.Thread(target=semantic_router.fit, daemon=True).start()
+        self.commands, self.handlers, self.router, self.semantic_router = commands, handlers, router, semantic_router
+    
+    @contextlib.contextmanager
+    def startup_phase(self, name: str):
+        """Record how long a startup phase takes"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.startup_phases[name] = time.perf_counter() - started
+    
+    @property
+    def user_name(self) -> str:
+        """The current server session's user, or the local user"""
+        session = CURRENT_SESSION.get()
+        return session.user_name if session is not None else self._user_name
+    
+    @user_name.setter
+    def user_name(self, name: str):
+        self._user_name = name
+    
+    def setup_metrics(self):
+        """Start the JSONL trace and the Prometheus endpoint if configured"""
+        if self.config["trace_file"]:
+            METRICS.trace_to(Path(self.config["trace_file"]))
+        if self.config["metrics_port"]:
+            try:
+                METRICS.serve(self.config["metrics_port"])
+                print(f"{Colors.GREEN}Metrics at http://127.0.0.1:{self.config['metrics_port']}/metrics{Colors.END}")
+            except OSError as e:
+                print(f"{Colors.YELLOW}Metrics endpoint unavailable: {e}{Colors.END}")
+    
+    def load_preferences(self) -> Dict:
+        """Read user_preferences.json, or nothing if it is missing or broken"""
+        try:
+            with open(self.config["preferences_file"], 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def load_startup_cache(self) -> Dict:
+        """Return the cached calibration and voice choice if it is fresh"""
+        try:
+            with open(self.config["startup_cache"], 'r') as f:
+                cache = json.load(f)
+            if time.time() - cache.get("saved_at", 0) < self.config["startup_cache_max_age_hours"] * 3600:
+                return cache
+        except (OSError, ValueError):
+            pass
+        return {}
+    
+    def save_startup_cache(self, **values):
+        """Persist calibration results for the next launch"""
+        self.startup_cache.update(values, saved_at=time.time())
+        path = Path(self.config["startup_cache"])
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(self.startup_cache, f, indent=2)
+        except OSError:
+            pass
+    
+    def start_engines(self):
+        """Set up TTS and speech recognition, on background threads in fast-start mode"""
+        if not self.config["fast_start"]:
+            self.setup_speech_recognition()
+            self.setup_text_to_speech()
+            return
+        
+        for name, target in (("tts", self.setup_text_to_speech), ("recognizer", self.setup_speech_recognition)):
+            thread = threading.Thread(target=target, name=f"aria-setup-{name}", daemon=True)
+            thread.start()
+            self._setup_threads.append(thread)
+    
+    def wait_until_ready(self):
+        """Block until background engine setup has finished"""
+        with self.startup_phase("wait_for_engines"):
+            for thread in self._setup_threads:
+                thread.join()
+        self._setup_threads = []
+    
+    def print_startup_profile(self):
+        """Print phase timings and an -X importtime style breakdown"""
+        print(f"\n{Colors.CYAN}{Colors.BOLD}Startup Profile:{Colors.END}")
+        print(f"{Colors.WHITE}{'module load':<22} {MODULE_LOAD_SECONDS * 1000:>8.1f} ms{Colors.END}")
+        for name, seconds in self.startup_phases.items():
+            print(f"{Colors.WHITE}{name:<22} {seconds * 1000:>8.1f} ms{Colors.END}")
+        for name, seconds in IMPORT_TIMINGS.items():
+            print(f"{Colors.WHITE}{'import ' + name:<22} {seconds * 1000:>8.1f} ms{Colors.END}")
+        
+        # Fresh interpreter so already-imported modules do not hide their cost
+        modules = [name for name, available in (("speech_recognition", SPEECH_RECOGNITION_AVAILABLE),
+                                                ("pyttsx3", TTS_AVAILABLE), ("requests", REQUESTS_AVAILABLE),
+                                                ("psutil", PSUTIL_AVAILABLE)) if available]
+        if not modules:
+            return
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+                                capture_output=True, text=True)
+        rows = []
+        for line in result.stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[1].strip().isdigit():
+                rows.append((int(parts[1]), parts[2].rstrip()))
+        print(f"{Colors.DIM}Slowest imports (cumulative, python -X importtime):{Colors.END}")
+        for cumulative, name in sorted(rows, reverse=True)[:10]:
+            print(f"{Colors.WHITE}{cumulative / 1000:>8.1f} ms {name}{Colors.END}")
     
     def print_banner(self):
         """Display startup banner"""
@@ -165,43 +4095,210 @@ class AriaAssistant:
         if not SPEECH_RECOGNITION_AVAILABLE or sr is None:
             return
             
-        self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        with self.startup_phase("recognizer_init"):
+            self.recognizer = sr.Recognizer()
+            self.noise = NoiseFloorEstimator(
+                window=self.config["noise_window_seconds"] * 1000 // self.config["vad_frame_ms"],
+                percentile=self.config["noise_percentile"],
+                ratio=self.config["noise_ratio"],
+            )
+            if self.config["capture"] == "vad":
+                # Frame-level capture needs a rate the WebRTC VAD accepts
+                self.microphone = sr.Microphone(sample_rate=16000)
+                self.frame_capture = FrameCapture(
+                    create_vad(self.config["vad_aggressiveness"], self.noise),
+                    frame_ms=self.config["vad_frame_ms"],
+                    pre_roll_ms=self.config["vad_pre_roll_ms"],
+                    min_silence_ms=self.config["vad_min_silence_ms"],
+                    max_silence_ms=self.config["vad_max_silence_ms"],
+                    max_seconds=self.config["vad_max_seconds"],
+                    noise=self.noise,
+                )
+            else:
+                self.microphone = sr.Microphone()
         
-        print(f"{Colors.BLUE}Calibrating microphone...{Colors.END}")
-        with self.microphone as source:
-            self.recognizer.adjust_for_ambient_noise(source, duration=1)
+        with self.startup_phase("mic_calibration"):
+            if "energy_threshold" in self.startup_cache:
+                self.recognizer.energy_threshold = self.startup_cache["energy_threshold"]
+            else:
+                print(f"{Colors.BLUE}Calibrating microphone...{Colors.END}")
+                with self.microphone as source:
+                    self.recognizer.adjust_for_ambient_noise(source, duration=1)
+                self.save_startup_cache(energy_threshold=self.recognizer.energy_threshold)
+            # Only a starting point: the estimator keeps following the room from here on
+            self.noise.seed(self.recognizer.energy_threshold / self.recognizer.dynamic_energy_ratio)
         
-        # Optimize settings
-        self.recognizer.energy_threshold = 300
+        # Keep the calibrated threshold; speech_recognition also nudges it while waiting for speech
         self.recognizer.dynamic_energy_threshold = True
         self.recognizer.pause_threshold = 0.8
         
         print(f"{Colors.GREEN}Microphone ready{Colors.END}")
+        with self.startup_phase("recognizer_backend"):
+            self.setup_recognition_backend()
+        with self.startup_phase("wake_word"):
+            self.setup_wake_word()
+    
+    def setup_recognition_backend(self):
+        """Select the configured speech-to-text engine and load it once"""
+        name = self.config["recognizer_backend"]
+        self.recognition_backend = create_recognizer_backend(name, self.recognizer, self.config)
+        try:
+            started = time.perf_counter()
+            self.recognition_backend.warm_up()
+            print(f"{Colors.GREEN}Recognizer '{name}' ready ({time.perf_counter() - started:.1f}s){Colors.END}")
+        except Exception as e:
+            print(f"{Colors.YELLOW}Recognizer '{name}' unavailable ({e}), using Google{Colors.END}")
+            self.recognition_backend = GoogleBackend(self.recognizer, self.config)
+    
+    def setup_wake_word(self):
+        """Load a local keyword spotter for the wake words in user_preferences.json"""
+        wake_words = self.preferences.get("wake_word", [])
+        if isinstance(wake_words, str):
+            wake_words = [wake_words]
+        if not self.config["wake_word"] or not wake_words:
+            return
+        
+        name = self.config["wake_word_engine"]
+        self.wake_spotter = create_wake_word_spotter(name, self.recognizer, wake_words, self.config)
+        if self.wake_spotter is None:
+            print(f"{Colors.YELLOW}No local wake word engine ({name}) available; listening to everything{Colors.END}")
+        else:
+            words = ", ".join(f"'{word}'" for word in self.wake_spotter.wake_words)
+            print(f"{Colors.GREEN}Wake word ready ({self.wake_spotter.name}): {words}{Colors.END}")
+    
+    def setup_recorder(self):
+        """Start recording the session's audio, transcripts and timings for replay"""
+        path = self.config["record"]
+        if path == "auto":
+            path = Path(self.config["record_dir"]) / f"{datetime.datetime.now():%Y%m%d-%H%M%S}.zip"
+        self.recorder = SessionRecorder(Path(path), {
+            "recognizer": self.recognition_backend.name,
+            "capture": self.config["capture"],
+            "wake_words": self.wake_spotter.wake_words if self.wake_spotter is not None else [],
+        })
+        print(f"{Colors.DIM}Recording session to {self.recorder.path}{Colors.END}")
+    
+    def setup_replay(self, path: Path, speed: float = 1.0):
+        """Take audio, transcripts and wake word decisions from a recorded session instead of live engines"""
+        self.replay = SessionArchive(path, speed)
+        self.recognition_backend = ReplayBackend(self.replay, self.config)
+        wake_words = self.replay.manifest.get("wake_words")
+        if wake_words:
+            self.wake_spotter = ReplaySpotter(self.replay, wake_words, self.config)
+            # The recorded decisions already reflect the wake window
+            self.config["wake_window_seconds"] = 0
+        self.tts = PacedTTS(self.config["voice_rate"], speed)
+    
+    def note_event(self, audio, **fields):
+        """Add stage results for a captured phrase to the session recording"""
+        if self.recorder is not None:
+            event = self.recorder.event_for(audio)
+            if event is not None:
+                event.update(fields)
+    
+    def passes_wake_gate(self, audio) -> bool:
+        """Whether a captured phrase should reach full recognition"""
+        if self.wake_spotter is None or time.monotonic() < self.awake_until:
+            self.note_event(audio, gate=True)
+            return True
+        self.wake_stats["phrases"] += 1
+        started = time.process_time()
+        wall = time.perf_counter()
+        with METRICS.span("listen.wake_word", engine=self.wake_spotter.name):
+            heard = self.wake_spotter.detect(audio)
+        self.wake_stats["cpu_ms"] += (time.process_time() - started) * 1000
+        self.note_event(audio, gate=heard is not None, wake_ms=round((time.perf_counter() - wall) * 1000, 3))
+        if heard is None:
+            self.wake_stats["ignored"] += 1
+            return False
+        self.wake_stats["woken"] += 1
+        self.awake_until = time.monotonic() + self.config["wake_window_seconds"]
+        return True
+    
+    def strip_wake_word(self, text: str) -> str:
+        """Remove a leading wake word ("hey aria, what time is it" -> "what time is it")"""
+        if self.wake_spotter is None:
+            return text
+        words = tokenize(text)
+        for wake_word in self.wake_spotter.wake_words:
+            wake_tokens = wake_word.split()
+            if words[:len(wake_tokens)] == wake_tokens:
+                # Keep the conversation open for a follow-up without the wake word
+                self.awake_until = time.monotonic() + self.config["wake_window_seconds"]
+                return " ".join(words[len(wake_tokens):])
+        return text
     
     def setup_text_to_speech(self):
         """Initialize text-to-speech"""
         if not TTS_AVAILABLE or pyttsx3 is None:
             return
-            
-        self.tts = pyttsx3.init()
         
-        # Get available voices and try to set a pleasant one
-        voices = self.tts.getProperty('voices')
-        for voice in voices:
-            if any(word in voice.name.lower() for word in ['zira', 'hazel', 'susan', 'female']):
-                self.tts.setProperty('voice', voice.id)
-                break
+        self.tts_worker.submit(self.create_tts_engine).result()
+        print(f"{Colors.GREEN}Voice engine ready{Colors.END}")
+        self.setup_tts_cache()
+    
+    def create_tts_engine(self):
+        """Create and configure the pyttsx3 engine; runs on the TTS worker"""
+        with self.startup_phase("tts_init"):
+            self.tts = pyttsx3.init()
+            self.tts.connect('started-word', self.stop_if_interrupted)
+        
+        with self.startup_phase("voice_selection"):
+            if self.startup_cache.get("voice_id"):
+                self.tts.setProperty('voice', self.startup_cache["voice_id"])
+            else:
+                # Get available voices and try to set a pleasant one
+                voices = self.tts.getProperty('voices')
+                for voice in voices:
+                    if any(word in voice.name.lower() for word in ['zira', 'hazel', 'susan', 'female']):
+                        self.tts.setProperty('voice', voice.id)
+                        break
+                self.save_startup_cache(voice_id=self.tts.getProperty('voice'))
         
         # Set voice properties
         self.tts.setProperty('rate', self.config['voice_rate'])
         self.tts.setProperty('volume', self.config['voice_volume'])
+    
+    def stop_if_interrupted(self, name, location, length):
+        """pyttsx3 word callback: cut the utterance short after a barge-in, from the engine's own thread"""
+        if self.speech_interrupted.is_set():
+            self.tts.stop()
+    
+    def setup_tts_cache(self):
+        """Enable cached playback of rendered phrases and pre-render the fixed ones"""
+        if not self.config["tts_cache"] or not self.player.available:
+            return
         
-        print(f"{Colors.GREEN}Voice engine ready{Colors.END}")
+        self.tts_cache = TTSCache(Path(self.config["tts_cache_dir"]), self.config["tts_cache_max_mb"] * 1024 * 1024)
+        self.tts_worker.submit(self.prerender_phrases, self.fixed_phrases())
     
-    def load_schedule(self) -> List[Dict]:
-        """Load schedule data"""
-        schedule_file = Path("schedule.json")
+    def fixed_phrases(self) -> List[str]:
+        """Responses that are identical every time they are spoken"""
+        greetings = [self.greeting_message(greeting) for greeting in ("Good morning", "Good afternoon", "Good evening")]
+        return [self.welcome_message(), self.goodbye_message()] + greetings + list(FIXED_RESPONSES.values())
+    
+    def prerender_phrases(self, phrases: List[str]):
+        """
+        Render fixed phrases into the TTS cache on the TTS worker, one job per
+        phrase so that speech queued in the meantime is not held up behind them
+        """
+        if not phrases:
+            return
+        text = phrases[0]
+        key = self.tts_cache_key(text)
+        if not (self.tts_cache.directory / f"{key}.wav").exists():
+            try:
+                self.tts_cache.render(self.tts, text, key)
+            except Exception:
+                return
+        self.tts_worker.submit(self.prerender_phrases, phrases[1:])
+    
+    def tts_cache_key(self, text: str) -> str:
+        """Cache key for text in the current voice settings"""
+        return TTSCache.key(text, str(self.tts.getProperty('voice')), self.config['voice_rate'], self.config['voice_volume'])
+    
+    def ensure_data_files(self):
+        """Create schedule and contacts files with sample data if missing"""
         default_schedule = [
             {
                 "time": "10:00",
@@ -216,43 +4313,149 @@ class AriaAssistant:
                 "priority": "medium"
             }
         ]
-        
-        if schedule_file.exists():
-            try:
-                with open(schedule_file, 'r') as f:
-                    return json.load(f)
-            except:
-                pass
-        
-        # Save default schedule
-        with open(schedule_file, 'w') as f:
-            json.dump(default_schedule, f, indent=2)
-        
-        return default_schedule
-    
-    def load_contacts(self) -> Dict:
-        """Load contacts data"""
-        contacts_file = Path("contacts.json")
         default_contacts = {
             "egi": {"name": "Egi", "phone": "+62-xxx-xxx-1234", "email": "egi@company.com"},
             "sophie": {"name": "Sophie", "phone": "+62-xxx-xxx-5678", "email": "sophie@example.com"}
         }
         
-        if contacts_file.exists():
-            try:
-                with open(contacts_file, 'r') as f:
-                    return json.load(f)
-            except:
-                pass
-        
-        with open(contacts_file, 'w') as f:
-            json.dump(default_contacts, f, indent=2)
+        for path, default in ((Path("schedule.json"), default_schedule), (Path("contacts.json"), default_contacts)):
+            if not path.exists():
+                with open(path, 'w') as f:
+                    json.dump(default, f, indent=2)
+    
+    def setup_data_store(self):
+        """Open the indexed data store and start watching the JSON files"""
+        self.ensure_data_files()
+        self.store = DataStore(Path(self.config["data_store"]), Path("schedule.json"), Path("contacts.json"))
+        self.store.refresh()
+        self.setup_conversation_log()
+        self.store.watch(self.config["data_watch_interval"])
         
-        return default_contacts
+        # Fuzzy name index, built off the startup path and kept in sync with contacts.json
+        self.contact_resolver = ContactResolver()
+        self.store.on_change.append(self.on_data_change)
+        threading.Thread(target=self.sync_contact_resolver, daemon=True).start()
+    
+    def setup_conversation_log(self):
+        """Open the segmented conversation log, importing the old single-file history once"""
+        directory = Path(self.config["history_dir"])
+        self.conversation = ConversationLog(directory, self.config["history_segment_mb"] << 20,
+                                            self.config["history_max_segments"], self.config["history_context_turns"],
+                                            self.config["history_flush_seconds"])
+        if directory.exists():
+            return
+        for legacy in (Path("conversation_history.json"), Path("conversation_history.jsonl")):
+            for record in self.read_legacy_history(legacy):
+                self.conversation.append(record)
+        self.conversation.flush()
+    
+    def read_legacy_history(self, path: Path) -> List[Dict]:
+        """Turns from an old history file; malformed files and lines are skipped with a warning"""
+        try:
+            text = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return []
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"{Colors.YELLOW}Skipping {path}: {e}{Colors.END}")
+            return []
+        if path.suffix == ".json":
+            try:
+                records = json.loads(text or "[]")
+            except ValueError as e:
+                print(f"{Colors.YELLOW}Skipping {path}: {e}{Colors.END}")
+                return []
+            if not isinstance(records, list):
+                print(f"{Colors.YELLOW}Skipping {path}: expected a list of turns{Colors.END}")
+                return []
+        else:
+            records = []
+            for line in text.splitlines():
+                if line.strip():
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        records.append(None)
+        turns = [record for record in records if isinstance(record, dict)]
+        if len(turns) < len(records):
+            print(f"{Colors.YELLOW}Skipped {len(records) - len(turns)} malformed turns in {path}{Colors.END}")
+        return turns
+    
+    def setup_reminders(self):
+        """Arm spoken reminders for upcoming schedule entries"""
+        self.reminders = ReminderScheduler(self.on_reminder_due)
+        self.sync_reminders()
+        self.reminders.start()
+    
+    def sync_reminders(self):
+        """Re-arm reminders from the schedule; only entries that changed touch the heap"""
+        if self.reminders is None:
+            return
+        now = datetime.datetime.now()
+        wanted = reminder_times(self.store.upcoming_schedule(now.date()), now, self.config["reminder_lead_minutes"])
+        # Undated entries repeat daily, so look again at midnight
+        midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+        wanted["midnight"] = (midnight.timestamp(), None)
+        self.reminders.sync(wanted)
+    
+    def on_reminder_due(self, key: str, payload: Optional[Dict]):
+        """Queue a reminder to be spoken once the conversation is idle"""
+        if payload is None:
+            self.sync_reminders()
+            return
+        minutes = round((payload["event"] - time.time()) / 60)
+        when = f"starts in {minutes} minutes" if minutes > 1 else "starts in a minute" if minutes == 1 else "is starting now"
+        place = f" at {payload['location']}" if payload.get("location") else ""
+        self.notifications.put((f"Reminder, {self.user_name}: {payload['title']}{place} {when}.", "neutral"))
+    
+    def conversation_idle(self) -> bool:
+        """Nothing being said, no wake window open and no turn for a few seconds"""
+        now = time.monotonic()
+        return (not self.is_speaking and now >= self.awake_until
+                and now - self.last_turn_ended >= self.config["reminder_quiet_seconds"])
+    
+    def pending_speech(self) -> List[tuple]:
+        """Late handler answers, then reminders if the conversation is idle"""
+        items = self.handler_runner.late_results()
+        if self.notifications.empty() or not self.conversation_idle():
+            return items
+        while True:
+            try:
+                items.append(self.notifications.get_nowait())
+            except queue.Empty:
+                return items
+            self.reminders_spoken += 1
+    
+    def sync_contact_resolver(self):
+        """Re-index contacts whose names changed"""
+        self.contact_resolver.update(self.store.contact_name_map())
+        # Fuzzy matches may differ now; forget cached contact answers
+        if self.response_cache is not None:
+            self.response_cache.invalidate({"contacts"})
+    
+    def on_data_change(self, tables: set):
+        """React to edits of the JSON data files"""
+        if "schedule" in tables and self.response_cache is not None:
+            self.response_cache.invalidate({"schedule"})
+        if "contacts" in tables:
+            self.sync_contact_resolver()
+        if "schedule" in tables:
+            self.sync_reminders()
+    
+    @property
+    def schedule(self) -> List[Dict]:
+        """All schedule entries"""
+        return self.store.all_schedule()
     
-    def speak(self, text: str, emotion: str = "neutral"):
-        """Speak with visual feedback"""
+    @property
+    def contacts(self) -> Dict:
+        """All contacts by key"""
+        return self.store.all_contacts()
+    
+    def speak(self, text: Union[str, Iterable[str]], emotion: str = "neutral") -> str:
+        """Speak with visual feedback, sentence by sentence"""
         self.is_speaking = True
+        self.speech_interrupted.clear()
+        started = time.perf_counter()
         
         # Emotion icons
         emotions = {
@@ -263,14 +4466,135 @@ class AriaAssistant:
         icon = emotions.get(emotion, "Speaking")
         
         # Visual feedback
-        print(f"{Colors.CYAN}{Colors.BOLD}[{icon}] {self.assistant_name}:{Colors.END} {Colors.WHITE}{text}{Colors.END}")
+        print(f"{Colors.CYAN}{Colors.BOLD}[{icon}] {self.assistant_name}:{Colors.END}{Colors.WHITE}", end="", flush=True)
         
-        # Speak the text
-        self.tts.say(text)
-        self.tts.runAndWait()
+        # Render the next sentence while the current one plays
+        spoken = []
+        sentences = split_sentences(text)
+        current = next(sentences, None)
+        rendering = self.tts_worker.submit(self.render_cached, current) if current is not None else None
+        while current is not None and not self.speech_interrupted.is_set():
+            path = rendering.result()
+            upcoming = next(sentences, None)
+            if upcoming is not None:
+                rendering = self.tts_worker.submit(self.render_cached, upcoming)
+            
+            print(f" {current}", end="", flush=True)
+            if not spoken:
+                self.first_audio_latencies.append(time.perf_counter() - started)
+                METRICS.observe("speak.first_audio", time.perf_counter() - started)
+            spoken.append(current)
+            
+            with METRICS.span("speak.playback", cached=path is not None):
+                if path is not None:
+                    self.player.play(path)
+                else:
+                    self.tts_worker.submit(self.say_now, current).result()
+            current = upcoming
+        print(Colors.END)
         
         self.is_speaking = False
         self.conversation_count += 1
+        return " ".join(spoken)
+    
+    def say_now(self, text: str):
+        """Speak text through the engine and wait until it finishes; runs on the TTS worker"""
+        self.tts.say(text)
+        self.tts.runAndWait()
+    
+    def render_cached(self, text: str) -> Optional[Path]:
+        """Return a rendered audio file for text from the TTS cache, rendering it on a miss; runs on the TTS worker"""
+        if self.tts_cache is None:
+            return None
+        
+        key = self.tts_cache_key(text)
+        path = self.tts_cache.get(key)
+        if path is None:
+            try:
+                with METRICS.span("speak.render"):
+                    path = self.tts_cache.render(self.tts, text, key)
+            except Exception:
+                return None
+        return path
+    
+    def is_barge_in(self, audio) -> bool:
+        """
+        Whether speech captured during playback should interrupt it. ARIA's own
+        voice leaking from the speaker into the microphone is quieter than
+        someone talking over it, so at least barge_in_min_ms of the utterance
+        must be barge_in_ratio times louder than the speech threshold
+        """
+        threshold = self.noise.threshold if self.noise is not None else 150.0
+        loud = sum(level > threshold * self.config["barge_in_ratio"]
+                   for level in frame_levels(audio, self.config["vad_frame_ms"]))
+        return loud * self.config["vad_frame_ms"] >= self.config["barge_in_min_ms"]
+    
+    def stop_speaking(self):
+        """Cancel in-flight speech (barge-in)"""
+        self.speech_interrupted.set()
+        # The engine itself stops at its next word callback (stop_if_interrupted)
+        if self.is_speaking:
+            try:
+                self.player.stop()
+            except Exception:
+                pass
+    
+    def capture_audio(self):
+        """Capture one utterance from the microphone, or the next one of a replayed session"""
+        started = time.perf_counter()
+        try:
+            with METRICS.span("listen.capture"):
+                if self.replay is not None:
+                    audio = self.replay.capture()
+                else:
+                    with self.microphone as source:
+                        if self.frame_capture is not None:
+                            audio = self.frame_capture.capture(source.stream, timeout=self.config['listen_timeout'])
+                        else:
+                            audio = self.recognizer.listen(source, timeout=self.config['listen_timeout'])
+                            self.follow_noise_floor(audio)
+        except Exception as e:
+            if self.recorder is not None:
+                self.recorder.capture(None, time.perf_counter() - started, e)
+            raise
+        if self.recorder is not None:
+            self.recorder.capture(audio, time.perf_counter() - started)
+        return audio
+    
+    def follow_noise_floor(self, audio):
+        """
+        Legacy capture: feed the phrase, with the pauses around it, to the noise
+        estimator and listen with its threshold from now on. speech_recognition's
+        own adjustment only learns from quiet buffers, so it never catches up
+        once the room gets louder than its threshold.
+        """
+        for level in frame_levels(audio, self.config["vad_frame_ms"]):
+            self.noise.update(level)
+        self.recognizer.energy_threshold = self.noise.threshold
+    
+    def recognize_audio(self, audio) -> str:
+        """Convert captured audio to text"""
+        started = time.perf_counter()
+        try:
+            with METRICS.span("listen.recognize", backend=self.recognition_backend.name):
+                text = self.recognition_backend.recognize(audio)
+        except Exception as e:
+            self.note_event(audio, error=type(e).__name__, recognize_ms=round((time.perf_counter() - started) * 1000, 3))
+            raise
+        self.note_event(audio, transcript=text, recognize_ms=round((time.perf_counter() - started) * 1000, 3))
+        return text
+    
+    def report_listen_error(self, e: Exception):
+        """Print a friendly message for capture/recognition failures"""
+        # Handle all speech recognition exceptions generically
+        if "WaitTimeoutError" in str(type(e)):
+            print(f"{Colors.DIM}Listening timeout{Colors.END}")
+        elif "UnknownValueError" in str(type(e)):
+            print(f"{Colors.RED}Could not understand audio{Colors.END}")
+        elif "RequestError" in str(type(e)):
+            print(f"{Colors.RED}Speech recognition error: {e}{Colors.END}")
+        else:
+            print(f"{Colors.RED}Error: {e}{Colors.END}")
     
     def listen(self) -> Optional[str]:
         """Listen for voice input"""
@@ -281,33 +4605,48 @@ class AriaAssistant:
         self.is_listening = True
         
         try:
-            print(f"{Colors.YELLOW}Listening... (speak now){Colors.END}")
-            
-            with self.microphone as source:
-                audio = self.recognizer.listen(source, timeout=self.config['listen_timeout'])
+            if self.wake_spotter is not None and time.monotonic() >= self.awake_until:
+                print(f"{Colors.YELLOW}Listening for '{self.wake_spotter.wake_words[-1]}'...{Colors.END}")
+            else:
+                print(f"{Colors.YELLOW}Listening... (speak now){Colors.END}")
+            audio = self.capture_audio()
+            if not self.passes_wake_gate(audio):
+                return None
             
             print(f"{Colors.BLUE}Processing...{Colors.END}")
-            text = self.recognizer.recognize_google(audio)
+            text = self.recognize_audio(audio)
             
             print(f"{Colors.GREEN}{Colors.BOLD}{self.user_name}:{Colors.END} {Colors.WHITE}{text}{Colors.END}")
-            return text.lower()
+            command = self.strip_wake_word(text.lower())
+            if not command:
+                self.speak(FIXED_RESPONSES["wake_ack"], "happy")
+                return None
+            return command
             
         except Exception as e:
-            # Handle all speech recognition exceptions generically
-            if "WaitTimeoutError" in str(type(e)):
-                print(f"{Colors.DIM}Listening timeout{Colors.END}")
-            elif "UnknownValueError" in str(type(e)):
-                print(f"{Colors.RED}Could not understand audio{Colors.END}")
-            elif "RequestError" in str(type(e)):
-                print(f"{Colors.RED}Speech recognition error: {e}{Colors.END}")
-            else:
-                print(f"{Colors.RED}Error: {e}{Colors.END}")
+            self.report_listen_error(e)
             return None
         finally:
             self.is_listening = False
     
-    def get_weather(self, city: str = "Jakarta") -> str:
+    def setup_weather(self):
+        """Create the weather client and prefetch the default city"""
+        self.weather: Optional[WeatherClient] = None
+        if not REQUESTS_AVAILABLE or not self.config['weather_api_key'] or self.config['weather_api_key'] == "demo_key":
+            return
+        
+        self.weather = WeatherClient(
+            self.config['weather_api_key'],
+            self.config['weather_url'],
+            Path(self.config['weather_cache']),
+            ttl=self.config['weather_ttl'],
+            stale_ttl=self.config['weather_stale_ttl'],
+        )
+        self.weather.prefetch(self.config['default_city'])
+    
+    def get_weather(self, city: Optional[str] = None) -> str:
         """Get weather information"""
+        city = city or self.config['default_city']
         if not REQUESTS_AVAILABLE or requests is None:
             return "Weather service requires the requests library. Please install it with: pip install requests"
         
@@ -316,22 +4655,9 @@ class AriaAssistant:
             return f"Demo weather for {city}: Partly cloudy, 28°C, humidity 65%. Get your free API key from OpenWeatherMap for real weather data!"
         
         try:
-            url = f"http://api.openweathermap.org/data/2.5/weather"
-            params = {
-                "q": city,
-                "appid": self.config['weather_api_key'],
-                "units": "metric"
-            }
-            
-            response = requests.get(url, params=params, timeout=5)
-            data = response.json()
-            
-            if response.status_code == 200:
-                temp = data['main']['temp']
-                description = data['weather'][0]['description']
-                humidity = data['main']['humidity']
-                
-                return f"Weather in {city}: {description}, {temp}°C, humidity {humidity}%"
+            weather = self.weather.get(city)
+            if weather is not None:
+                return f"Weather in {city}: {weather['description']}, {weather['temp']}°C, humidity {weather['humidity']}%"
             else:
                 return "Sorry, couldn't get weather information right now."
                 
@@ -339,52 +4665,21 @@ class AriaAssistant:
             return "Weather service is currently unavailable."
     
     def calculate(self, expression: str) -> str:
-        """Safe calculator"""
+        """Safe calculator for spoken math"""
         try:
-            # Clean the expression
-            expression = expression.replace('calculate', '').replace('what is', '').replace('what\'s', '').strip()
-            
-            # Word replacements
-            replacements = {
-                'plus': '+', 'add': '+', 'and': '+',
-                'minus': '-', 'subtract': '-', 'take away': '-',
-                'times': '*', 'multiply': '*', 'multiplied by': '*', 'x': '*',
-                'divided by': '/', 'divide': '/', 'over': '/',
-                'squared': '**2', 'cubed': '**3',
-                'to the power of': '**', 'power': '**'
-            }
-            
-            for word, symbol in replacements.items():
-                expression = expression.replace(word, symbol)
+            result = evaluate_math(compile_spoken_math(expression))
+            if not math.isfinite(result):
+                raise MathRangeError("result too large")
+            return f"The answer is {format_number(result)}"
             
-            # Handle common phrases
-            if 'square root' in expression:
-                num = expression.replace('square root of', '').strip()
-                try:
-                    result = float(num) ** 0.5
-                    return f"The square root of {num} is {result:.2f}"
-                except:
-                    return "Please specify a number for square root calculation."
-            
-            # Clean up extra spaces
-            expression = ' '.join(expression.split())
-            
-            # Safe evaluation - only allow basic math operations
-            allowed_chars = set('0123456789+-*/.() ')
-            if all(c in allowed_chars for c in expression):
-                # Replace common spoken numbers
-                expression = expression.replace('zero', '0').replace('one', '1').replace('two', '2')
-                expression = expression.replace('three', '3').replace('four', '4').replace('five', '5')
-                expression = expression.replace('six', '6').replace('seven', '7').replace('eight', '8')
-                expression = expression.replace('nine', '9').replace('ten', '10')
-                
-                result = eval(expression)
-                return f"The answer is {result}"
-            else:
-                return "I can only do basic math calculations with numbers and operators."
-                
         except ZeroDivisionError:
             return "Cannot divide by zero!"
+        except MathVocabularyError:
+            return "I can only do basic math calculations with numbers and operators."
+        except (MathRangeError, OverflowError):
+            return "That number is too large for me to calculate."
+        except MathDomainError as e:
+            return str(e)
         except Exception:
             return "I couldn't understand that calculation. Try saying something like 'calculate 5 plus 3' or 'what is 10 times 2'."
     
@@ -392,153 +4687,418 @@ class AriaAssistant:
         """Get system information"""
         try:
             if not PSUTIL_AVAILABLE or psutil is None:
-                import platform
                 return f"Basic system info: Running on {platform.system()} {platform.release()}. For detailed monitoring, install psutil with: pip install psutil"
             
-            # Get system info
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            battery = None
-            
-            try:
-                battery = psutil.sensors_battery()
-            except:
-                pass
+            # Answer from the background sampler instead of blocking on a CPU sample
+            sample = self.telemetry.latest()
+            if sample is None:
+                self.telemetry.sample()
+                sample = self.telemetry.latest()
             
             # Format response
-            response = f"System status: CPU usage {cpu_percent}%, Memory usage {memory.percent}%"
+            response = f"System status: CPU usage {sample['cpu']:.0f}%, Memory usage {sample['memory']:.0f}%"
+            
+            if sample['battery'] == sample['battery']:  # NaN when there is no battery
+                battery_status = "charging" if sample['plugged'] else "on battery"
+                response += f", Battery {sample['battery']:.0f}% ({battery_status})"
             
-            if battery:
-                battery_status = "charging" if battery.power_plugged else "on battery"
-                response += f", Battery {battery.percent}% ({battery_status})"
+            response += f", Disk usage {sample['disk']:.0f}%"
+            
+            # Trend over the configured window once there is enough history
+            cpu_average, span = self.telemetry.average("cpu", self.config['telemetry_trend_seconds'])
+            if cpu_average is not None and span >= 60:
+                response += f". CPU averaged {cpu_average:.0f}% over the last {span / 60:.0f} minutes"
             
             # Add OS info
-            import platform
             response += f". Running on {platform.system()}"
             
             return response
             
         except ImportError:
             # Fallback system info without psutil
-            import platform
             return f"Basic system info: Running on {platform.system()} {platform.release()}. For detailed monitoring, install psutil with: pip install psutil"
         except Exception as e:
             return f"Could not retrieve complete system information. {str(e)}"
     
-    def process_command(self, command: str) -> tuple[str, str]:
-        """Process voice commands intelligently"""
+    def open_url(self, url: str):
+        """Open a URL in the browser (recorded instead when headless, returned to the client in server mode)"""
+        captured = _URL_CAPTURE.get()
+        if captured is not None:
+            captured.append(url)
+        session = CURRENT_SESSION.get()
+        if session is not None:
+            session.opened_urls.append(url)
+        elif self.config["headless"]:
+            self.opened_urls.append(url)
+        else:
+            webbrowser.open(url)
+    
+    def process_command(self, command: str, wait: bool = False) -> tuple[Union[str, Iterator[str]], str]:
+        """
+        Process voice commands intelligently, answering repeats from the response cache.
+        The response is a string, or an iterator of sentence chunks for long answers.
+        A handler that overruns its deadline is answered with its acknowledgement
+        and finishes in the background (see speak_pending) unless wait is set
+        """
+        with METRICS.span("command.route"):
+            intent = self.router.best(command)
+        with METRICS.span("command.context"):
+            resolved, intent = self.resolve_follow_up(command, intent)
+        if intent is None and self.semantic_router is not None:
+            with METRICS.span("command.semantic"):
+                intent, _ = self.semantic_router.classify(resolved)
         
-        # Greetings
-        if any(word in command for word in self.commands["Greetings"]):
-            hour = datetime.datetime.now().hour
-            if hour < 12:
-                greeting = "Good morning"
-            elif hour < 17:
-                greeting = "Good afternoon"
+        response, emotion = self.answer(resolved, intent, wait)
+        turn = _TURN.get()
+        if turn is not None:
+            turn.update(timestamp=time.time(), intent=intent or "Default")
+            if resolved != command:
+                turn["resolved"] = resolved
+            if isinstance(response, str):
+                turn["response"] = response
             else:
-                greeting = "Good evening"
-            
-            return f"{greeting}, {self.user_name}! I'm {self.assistant_name}, your voice assistant. How can I help you today?", "greeting"
+                response = self._log_stream(turn, response)
+        return response, emotion
+    
+    def answer(self, command: str, intent: Optional[str], wait: bool = False) -> tuple[Union[str, Iterator[str]], str]:
+        """Response for a routed command, from the response cache or its handler"""
+        key = self.response_cache.key(command, intent, self.user_name) if self.response_cache is not None else None
+        if key is not None:
+            with METRICS.span("command.cache"):
+                cached = self.response_cache.get(key)
+            if cached is not None:
+                response, emotion, urls = cached
+                for url in urls:
+                    self.open_url(url)
+                return response, emotion
         
-        # Time & Date
-        elif any(word in command for word in self.commands["Time & Date"]):
-            now = datetime.datetime.now()
-            if 'time' in command or 'clock' in command:
-                return f"The current time is {now.strftime('%I:%M %p')}", "neutral"
-            else:
-                return f"Today is {now.strftime('%A, %B %d, %Y')}", "neutral"
-        
-        # Schedule
-        elif any(word in command for word in self.commands["Schedule"]):
-            if self.schedule:
-                schedule_text = "Your schedule for today: "
-                for item in self.schedule:
-                    schedule_text += f"{item['time']} - {item['title']} at {item['location']}. "
-                return schedule_text, "neutral"
+        handlers = self.handlers
+        handler = handlers.get(intent, handlers[None])
+        urls: List[str] = []
+        token = _URL_CAPTURE.set(urls)
+        started = time.perf_counter()
+        try:
+            with METRICS.span(f"command.{intent or 'Default'}"):
+                result = self.handler_runner.run(intent or "Default", handler, command, wait=wait)
+        finally:
+            _URL_CAPTURE.reset(token)
+        if result is None:
+            return handler.acknowledgement or FIXED_RESPONSES["working_ack"], "thinking"
+        response, emotion = result
+        if key is None:
+            return response, emotion
+        cost = time.perf_counter() - started
+        if isinstance(response, str):
+            self.response_cache.put(key, response, emotion, urls, cost)
+            return response, emotion
+        return self.response_cache.record_stream(key, response, emotion, urls, cost), emotion
+    
+    # Intent handlers, registered in self.handlers
+    def handle_greetings(self, command: str) -> tuple[str, str]:
+        hour = datetime.datetime.now().hour
+        if hour < 12:
+            greeting = "Good morning"
+        elif hour < 17:
+            greeting = "Good afternoon"
+        else:
+            greeting = "Good evening"
+        
+        return self.greeting_message(greeting), "greeting"
+    
+    def handle_time(self, command: str) -> tuple[str, str]:
+        now = datetime.datetime.now()
+        if 'time' in command or 'clock' in command:
+            return f"The current time is {now.strftime('%I:%M %p')}", "neutral"
+        else:
+            return f"Today is {now.strftime('%A, %B %d, %Y')}", "neutral"
+    
+    def handle_schedule(self, command: str) -> tuple[Union[str, Iterator[str]], str]:
+        day, label = parse_day(command)
+        entries = self.store.schedule_for(day)
+        if entries:
+            return self.iter_schedule(entries, label), "neutral"
+        elif label == "today":
+            return FIXED_RESPONSES["no_schedule"], "neutral"
+        else:
+            return f"You have no appointments scheduled for {label}.", "neutral"
+    
+    def handle_weather(self, command: str) -> tuple[str, str]:
+        city = self.config['default_city']
+        words = command.split()
+        if 'in' in words:
+            city_index = words.index('in') + 1
+            if city_index < len(words):
+                city = words[city_index]
+        
+        return self.get_weather(city), "neutral"
+    
+    def handle_search(self, command: str) -> tuple[str, str]:
+        # Extract search query
+        search_query = command
+        for word in ['search', 'for', 'google', 'find', 'look up', 'look for']:
+            search_query = search_query.replace(word, '', 1).strip()
+        
+        if search_query:
+            search_url = f"https://www.google.com/search?q={search_query.replace(' ', '+')}"
+            try:
+                self.open_url(search_url)
+                return f"I've opened a web search for '{search_query}' in your browser", "happy"
+            except Exception:
+                return f"I would search for '{search_query}' but couldn't open your browser. Try opening Google manually.", "concerned"
+        else:
+            return FIXED_RESPONSES["search_prompt"], "neutral"
+    
+    def handle_calculator(self, command: str) -> tuple[str, str]:
+        return self.calculate(command), "thinking"
+    
+    def handle_system(self, command: str) -> tuple[str, str]:
+        return self.get_system_info(), "neutral"
+    
+    def handle_contacts(self, command: str) -> tuple[str, str]:
+        # Check if user mentioned a specific contact (indexed lookup)
+        mentioned = self.store.find_contacts_in(command)
+        if not mentioned:
+            # Fall back to fuzzy/phonetic matching for misheard names
+            candidates = self.contact_resolver.resolve(command, limit=2)
+            if len(candidates) == 2 and candidates[0][1] - candidates[1][1] < self.config["contact_ambiguity_margin"]:
+                first, second = (self.store.get_contact(key)['name'] for key, _ in candidates)
+                return f"Did you mean {first} or {second}?", "thinking"
+            mentioned = [self.store.get_contact(key) for key, _ in candidates[:1]]
+        if mentioned:
+            contact = mentioned[0]
+            if 'call' in command or 'phone' in command:
+                return f"I would call {contact['name']} at {contact['phone']}, but I can't make actual calls yet. You can call them manually!", "neutral"
             else:
-                return "You have no appointments scheduled for today.", "neutral"
+                return f"{contact['name']}'s contact information: Phone {contact['phone']}, Email {contact['email']}", "neutral"
         
-        # Weather
-        elif any(word in command for word in self.commands["Weather"]):
-            city = "Jakarta"
-            words = command.split()
-            if 'in' in words:
-                try:
-                    city_index = words.index('in') + 1
-                    if city_index < len(words):
-                        city = words[city_index]
-                except:
-                    pass
-            
-            return self.get_weather(city), "neutral"
-        
-        # Search
-        elif any(word in command for word in self.commands["Search"]):
-            # Extract search query
-            search_query = command
-            for word in ['search', 'for', 'google', 'find', 'look up', 'look for']:
-                search_query = search_query.replace(word, '', 1).strip()
-            
-            if search_query:
-                search_url = f"https://www.google.com/search?q={search_query.replace(' ', '+')}"
+        contact_names = self.store.contact_names(limit=5)
+        remaining = self.store.contact_count() - len(contact_names)
+        listing = ', '.join(contact_names) + (f" and {remaining} more" if remaining > 0 else "")
+        return f"I have contacts for: {listing}. Try saying 'call [name]' or 'contact [name]'", "neutral"
+    
+    def handle_media(self, command: str) -> tuple[str, str]:
+        if 'play' in command:
+            # Extract song/artist name
+            music_query = command.replace('play', '').strip()
+            if music_query:
+                # Open YouTube search for the song
+                youtube_url = f"https://www.youtube.com/results?search_query={music_query.replace(' ', '+')}"
                 try:
-                    webbrowser.open(search_url)
-                    return f"I've opened a web search for '{search_query}' in your browser", "happy"
+                    self.open_url(youtube_url)
+                    return f"I've opened YouTube search for '{music_query}'. Click on a video to play it!", "excited"
                 except Exception:
-                    return f"I would search for '{search_query}' but couldn't open your browser. Try opening Google manually.", "concerned"
+                    return f"I would play '{music_query}' but couldn't open your browser. Try opening YouTube manually.", "concerned"
             else:
-                return "What would you like me to search for? Try saying 'search for Python programming'", "neutral"
-        
-        # Calculator
-        elif any(word in command for word in self.commands["Calculator"]):
-            return self.calculate(command), "thinking"
-        
-        # System
-        elif any(word in command for word in self.commands["System"]):
-            return self.get_system_info(), "neutral"
-        
-        # Contacts
-        elif any(word in command for word in self.commands["Contacts"]):
-            # Check if user mentioned a specific contact
-            contact_found = False
-            for name, contact in self.contacts.items():
-                if name.lower() in command or contact['name'].lower() in command:
-                    contact_found = True
-                    if 'call' in command or 'phone' in command:
-                        return f"I would call {contact['name']} at {contact['phone']}, but I can't make actual calls yet. You can call them manually!", "neutral"
-                    else:
-                        return f"{contact['name']}'s contact information: Phone {contact['phone']}, Email {contact['email']}", "neutral"
-            
-            if not contact_found:
-                contact_names = [c['name'] for c in self.contacts.values()]
-                return f"I have contacts for: {', '.join(contact_names)}. Try saying 'call [name]' or 'contact [name]'", "neutral"
-        
-        # Media
-        elif any(word in command for word in self.commands["Media"]):
-            if 'play' in command:
-                # Extract song/artist name
-                music_query = command.replace('play', '').strip()
-                if music_query:
-                    # Open YouTube search for the song
-                    youtube_url = f"https://www.youtube.com/results?search_query={music_query.replace(' ', '+')}"
-                    try:
-                        webbrowser.open(youtube_url)
-                        return f"I've opened YouTube search for '{music_query}'. Click on a video to play it!", "excited"
-                    except:
-                        return f"I would play '{music_query}' but couldn't open your browser. Try opening YouTube manually.", "concerned"
-                else:
-                    return "What would you like me to play? Try saying 'play some jazz music' or 'play Taylor Swift'", "neutral"
-            elif 'pause' in command or 'stop' in command:
-                return "I can't control media playback directly yet, but you can use your keyboard spacebar to pause/play most media players!", "neutral"
+                return FIXED_RESPONSES["play_prompt"], "neutral"
+        elif 'pause' in command or 'stop' in command:
+            return FIXED_RESPONSES["media_controls"], "neutral"
+        else:
+            return FIXED_RESPONSES["media_help"], "excited"
+    
+    def handle_cancel(self, command: str) -> tuple[str, str]:
+        cancelled = self.handler_runner.cancel()
+        if not cancelled:
+            return FIXED_RESPONSES["nothing_to_cancel"], "neutral"
+        return f"Okay, I stopped {' and '.join(request.handler.activity for request in cancelled)}.", "neutral"
+    
+    def handle_exit(self, command: str) -> tuple[str, str]:
+        return "goodbye", "happy"
+    
+    def handle_default(self, command: str) -> tuple[str, str]:
+        return FIXED_RESPONSES["help"], "thinking"
+    
+    def recent_turns(self) -> deque:
+        """The in-memory ring of recent turns for this user or server session"""
+        session = CURRENT_SESSION.get()
+        return session.history if session is not None else self.conversation.recent
+    
+    def resolve_follow_up(self, command: str, intent: Optional[str]) -> Tuple[str, Optional[str]]:
+        """Rewrite "and tomorrow?" or "call her" into a full command using the recent turns"""
+        turns = self.recent_turns()
+        if not turns:
+            return command, intent
+        match = _FOLLOW_UP.match(command) if intent is None else None
+        if match:
+            previous = next((turn for turn in reversed(turns)
+                             if turn.get("intent") not in (None, "Default", "Cancel", "Exit")), None)
+            if previous is None:
+                return command, intent
+            rest = match.group("rest")
+            before = previous.get("resolved", previous["utterance"])
+            template = self.FOLLOW_UP_TEMPLATES.get(previous["intent"])
+            if tokenize(rest)[:1] and tokenize(rest)[0] in DAY_WORDS:
+                # Same question, another day
+                command = " ".join(word for word in before.split() if word.lower().strip("?.!,") not in DAY_WORDS)
+                command = f"{command} {rest}"
+            elif template:
+                command = template.format(rest=rest)
             else:
-                return "I can help you find music on YouTube! Try saying 'play [song name]' or 'play [artist name]'", "excited"
+                command = f"{before} {rest}"
+            return command, self.router.best(command) or previous["intent"]
+        if intent == "Contacts" and _PRONOUN.search(command) and not self.store.find_contacts_in(command):
+            for turn in reversed(turns):
+                mentioned = (self.store.find_contacts_in(turn.get("resolved", turn["utterance"]))
+                             or self.store.find_contacts_in(str(turn.get("response", ""))))
+                if mentioned:
+                    return _PRONOUN.sub(mentioned[0]["name"], command, count=1), intent
+        return command, intent
+    
+    @contextlib.contextmanager
+    def conversation_turn(self, persist: bool = True, **fields):
+        """
+        Collect one turn (utterance, intent, response and the stage timings
+        recorded on this thread) and log it when the block ends; a response
+        still streaming is logged once it has been spoken
+        """
+        turn = {"timestamp": time.time(), "user": self.user_name}
+        turn.update(fields)
+        token = _TURN.set(turn)
+        try:
+            with METRICS.collect() as latencies:
+                yield turn
+        finally:
+            _TURN.reset(token)
+            if turn.get("utterance"):
+                turn["latencies"] = {name: round(ms, 3) for name, ms in latencies.items()}
+                self.recent_turns().append(turn)
+                self.last_turn_ended = time.monotonic()
+                for sink in (self.recorder, self.replay):
+                    if sink is not None:
+                        sink.turn(turn)
+                if "response" not in turn:
+                    turn["_log"] = persist
+                elif persist:
+                    self.conversation.append(turn)
+    
+    def _log_stream(self, turn: Dict, pieces: Iterable[str]) -> Iterator[str]:
+        """Pass a streamed response through, recording its text in the turn"""
+        spoken = []
+        for piece in pieces:
+            spoken.append(piece)
+            yield piece
+        turn["response"] = " ".join(spoken)
+        if turn.pop("_log", False):
+            self.conversation.append(turn)
+    
+    def serve_turn(self, wait: bool = False, persist: bool = True) -> Optional[bool]:
+        """Listen for one command and answer it; None if nothing was heard, False once the user says goodbye"""
+        with self.conversation_turn(persist) as turn:
+            command = self.listen()
+            if command is None:
+                return None
+            
+            turn["utterance"] = command
+            response, emotion = self.process_command(command, wait)
+            
+            if response == "goodbye":
+                self.speak(self.goodbye_message(), "happy")
+                return False
+            
+            self.speak(response, emotion)
+        return True
+    
+    def run_replay(self, quiet: bool = False) -> Dict:
+        """Play a recorded session back through listen(), process_command() and speak() and time it"""
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            while self.replay.remaining:
+                if self.serve_turn(wait=True, persist=False) is False:
+                    break
+        wall = time.perf_counter() - started
+        
+        recorded, replayed = self.replay.manifest["turns"], self.replay.turns
+        pairs = [(before, after) for before, after in zip(recorded, replayed)
+                 if before.get("intent") and before.get("utterance") == after.get("utterance")]
+        stages: Dict[str, Dict[str, List[float]]] = {}
+        for name, turns in (("recorded", recorded), ("replayed", replayed)):
+            for turn in turns:
+                latencies = turn.get("latencies")
+                if not latencies:
+                    continue
+                for stage, ms in list(latencies.items()) + [("response", response_ms(latencies))]:
+                    stages.setdefault(stage, {"recorded": [], "replayed": []})[name].append(ms)
+        events = self.replay.events
+        return {
+            "archive": str(self.replay.path),
+            "speed": self.replay.speed,
+            "events": len(events),
+            "turns": len(replayed),
+            "wall_seconds": wall,
+            "recorded_seconds": events[-1]["at"] if events else 0.0,
+            "compared": len(pairs),
+            "intent_agreement": sum(before.get("intent") == after.get("intent") for before, after in pairs) / len(pairs)
+                                if pairs else None,
+            "stages": {
+                stage: {
+                    "recorded_p50_ms": percentile(samples["recorded"], 50) if samples["recorded"] else None,
+                    "recorded_p95_ms": percentile(samples["recorded"], 95) if samples["recorded"] else None,
+                    "p50_ms": percentile(samples["replayed"], 50) if samples["replayed"] else None,
+                    "p95_ms": percentile(samples["replayed"], 95) if samples["replayed"] else None,
+                }
+                for stage, samples in sorted(stages.items())
+            },
+        }
+    
+    def speak_pending(self):
+        """Speak late handler answers and any reminders that are due"""
+        for response, emotion in self.pending_speech():
+            self.speak(response, emotion)
+    
+    def iter_schedule(self, entries: List[Dict], label: str = "today") -> Iterator[str]:
+        """Yield the schedule readout one sentence at a time"""
+        yield f"Your schedule for {label}."
+        for item in entries:
+            yield f"{item['time']} - {item['title']} at {item['location']}."
+    
+    def run_headless(self, utterances: Iterable[Dict], quiet: bool = False) -> Dict:
+        """Run utterances through process_command at full speed and measure it"""
+        latencies: Dict[str, List[float]] = {}
+        responses: Counter = Counter()
+        labelled = correct = 0
+        busy = 0.0
+        started = time.perf_counter()
         
-        # Exit
-        elif any(word in command for word in self.commands["Exit"]):
-            return "goodbye", "happy"
+        for record in utterances:
+            command = record["utterance"]
+            
+            handler_started = time.perf_counter()
+            with self.conversation_turn(persist=False, utterance=command) as turn:
+                response, emotion = self.process_command(command, wait=True)
+                if not isinstance(response, str):
+                    response = " ".join(split_sentences(response))
+            elapsed = time.perf_counter() - handler_started
+            intent = turn["intent"]
+            busy += elapsed
+            
+            latencies.setdefault(intent, []).append(elapsed * 1000)
+            responses[response] += 1
+            if record.get("intent"):
+                labelled += 1
+                correct += record["intent"] == intent
+            if not quiet:
+                print(f"{Colors.GREEN}{self.user_name}:{Colors.END} {command}")
+                self.speak(self.goodbye_message() if response == "goodbye" else response, emotion)
         
-        # Default case - this ensures there's always a return
-        return "I can help with time, weather, schedule, calculations, web search, and more. What would you like to do?", "thinking"
+        count = sum(len(values) for values in latencies.values())
+        return {
+            "utterances": count,
+            "wall_seconds": time.perf_counter() - started,
+            "throughput": count / busy if busy else 0.0,
+            "labelled": labelled,
+            "intent_accuracy": correct / labelled if labelled else None,
+            "intents": {
+                intent: {
+                    "count": len(values),
+                    "p50_ms": percentile(values, 50),
+                    "p95_ms": percentile(values, 95),
+                    "p99_ms": percentile(values, 99),
+                }
+                for intent, values in sorted(latencies.items())
+            },
+            "responses": responses.most_common(5),
+            "response_cache": {"hits": self.response_cache.hits, "misses": self.response_cache.misses}
+                              if self.response_cache is not None else None,
+        }
     
     def show_session_stats(self):
         """Show session statistics"""
@@ -547,6 +5107,59 @@ class AriaAssistant:
         print(f"{Colors.WHITE}Duration: {duration}{Colors.END}")
         print(f"{Colors.WHITE}Conversations: {self.conversation_count}{Colors.END}")
         print(f"{Colors.WHITE}Commands available: {len(self.commands)}{Colors.END}")
+        if self.weather is not None and (self.weather.hits + self.weather.stale_hits + self.weather.misses):
+            upstream = [value * 1000 for value in self.weather.upstream_latencies]
+            print(f"{Colors.WHITE}Weather cache: {self.weather.hit_rate:.0%} hit rate "
+                  f"({self.weather.stale_hits} stale), upstream p50 {percentile(upstream, 50):.0f} ms{Colors.END}")
+        if self.first_audio_latencies:
+            samples = [value * 1000 for value in self.first_audio_latencies]
+            print(f"{Colors.WHITE}Time to first audio: p50 {percentile(samples, 50):.0f} ms, "
+                  f"p95 {percentile(samples, 95):.0f} ms{Colors.END}")
+        if self.response_cache is not None and self.response_cache.hits + self.response_cache.misses:
+            cache = self.response_cache
+            print(f"{Colors.WHITE}Response cache: {cache.hits} hits, {cache.misses} misses ({cache.hit_rate:.0%}), "
+                  f"{len(cache)} entries, {cache.evictions} evicted, {cache.invalidated} invalidated, "
+                  f"~{cache.seconds_saved * 1000:.1f} ms handler time saved{Colors.END}")
+        if self.handler_runner.overruns:
+            overruns = ", ".join(f"{intent} {count}" for intent, count in self.handler_runner.overruns.most_common())
+            print(f"{Colors.WHITE}Handlers past deadline: {overruns}; {self.handler_runner.late} answered late, "
+                  f"{self.handler_runner.cancelled} cancelled{Colors.END}")
+        if self.reminders is not None:
+            print(f"{Colors.WHITE}Reminders: {self.reminders_spoken} spoken, {len(self.reminders)} pending{Colors.END}")
+        if self.tts_cache is not None:
+            print(f"{Colors.WHITE}TTS cache: {self.tts_cache.hits} hits, {self.tts_cache.misses} misses, "
+                  f"~{self.tts_cache.seconds_saved:.1f}s synthesis saved{Colors.END}")
+        if self.frame_capture is not None and self.frame_capture.endpoint_latencies:
+            trailing = self.frame_capture.endpoint_latencies
+            print(f"{Colors.WHITE}End of speech detected after p50 {percentile(trailing, 50):.0f} ms of silence "
+                  f"(fixed pause was {self.recognizer.pause_threshold * 1000:.0f} ms){Colors.END}")
+        if self.noise is not None and self.noise.history:
+            noise = self.noise
+            thresholds = [threshold for _, _, threshold in noise.history]
+            print(f"{Colors.WHITE}Noise floor: {noise.floor:.0f} RMS, speech threshold {noise.threshold:.0f} "
+                  f"(ranged {min(thresholds):.0f}-{max(thresholds):.0f} this session){Colors.END}")
+        if self.wake_stats["phrases"]:
+            print(f"{Colors.WHITE}Wake word: {self.wake_stats['woken']} of {self.wake_stats['phrases']} phrases "
+                  f"woke ARIA, {self.wake_stats['ignored']} ignored locally "
+                  f"({self.wake_stats['cpu_ms'] / self.wake_stats['phrases']:.0f} ms CPU each){Colors.END}")
+        if self.pipeline is not None:
+            self.pipeline.report()
+        if METRICS.histograms:
+            print(f"{Colors.CYAN}{Colors.BOLD}Stage latencies:{Colors.END}")
+            METRICS.report()
+    
+    def welcome_message(self) -> str:
+        """Greeting spoken at startup"""
+        return (f"Hello {self.user_name}! I'm {self.assistant_name}, your advanced voice assistant. "
+                f"I'm ready to help you with various tasks. Just speak naturally!")
+    
+    def greeting_message(self, greeting: str) -> str:
+        """Reply to a greeting for the given time of day"""
+        return f"{greeting}, {self.user_name}! I'm {self.assistant_name}, your voice assistant. How can I help you today?"
+    
+    def goodbye_message(self) -> str:
+        """Farewell spoken when the user exits"""
+        return f"Goodbye, {self.user_name}! Thank you for using {self.assistant_name}. Have a wonderful day!"
     
     def run(self):
         """Main application loop"""
@@ -555,58 +5168,149 @@ class AriaAssistant:
             os.system('cls' if os.name == 'nt' else 'clear')
             self.print_banner()
             self.print_features()
+            self.wait_until_ready()
+            if self.config["record"]:
+                self.setup_recorder()
+            if self.config["startup_profile"]:
+                self.print_startup_profile()
             
             # Initial greeting
-            self.speak(
-                f"Hello {self.user_name}! I'm {self.assistant_name}, your advanced voice assistant. "
-                f"I'm ready to help you with various tasks. Just speak naturally!",
-                "greeting"
-            )
+            self.speak(self.welcome_message(), "greeting")
+            
+            if self.config["pipeline"]:
+                print(f"{Colors.DIM}Pipelined mode: listening while responding{Colors.END}")
+                self.pipeline = VoicePipeline(self, barge_in=self.config["barge_in"])
+                try:
+                    self.pipeline.run()
+                except KeyboardInterrupt:
+                    print(f"\n{Colors.YELLOW}Manual exit detected{Colors.END}")
+                    self.speak(FIXED_RESPONSES["manual_exit"], "happy")
+                return
             
             # Main conversation loop
             while True:
                 try:
-                    command = self.listen()
-                    
-                    if command is None:
-                        continue
-                    
-                    response, emotion = self.process_command(command)
-                    
-                    if response == "goodbye":
-                        self.speak(f"Goodbye, {self.user_name}! Thank you for using {self.assistant_name}. Have a wonderful day!", "happy")
+                    self.speak_pending()
+                    answered = self.serve_turn()
+                    if answered is False:
                         break
-                    
-                    self.speak(response, emotion)
-                    time.sleep(0.5)
+                    if answered:
+                        time.sleep(0.5)
                     
                 except KeyboardInterrupt:
                     print(f"\n{Colors.YELLOW}Manual exit detected{Colors.END}")
-                    self.speak("Goodbye! Exiting gracefully.", "happy")
+                    self.speak(FIXED_RESPONSES["manual_exit"], "happy")
                     break
                 except Exception as e:
                     print(f"{Colors.RED}Error: {e}{Colors.END}")
-                    self.speak("I encountered an error. Let me try again.", "concerned")
+                    self.speak(FIXED_RESPONSES["error"], "concerned")
         
         except Exception as e:
             print(f"{Colors.RED}Critical error: {e}{Colors.END}")
         
         finally:
             # Show session stats and cleanup
+            self.handler_runner.shutdown()
+            if self.reminders is not None:
+                self.reminders.stop()
+            self.plugins.close()
+            self.conversation.close()
+            if self.recorder is not None:
+                self.recorder.close()
+                print(f"{Colors.DIM}Session recorded to {self.recorder.path}{Colors.END}")
+            if self.noise is not None and self.noise.updates:
+                # Start the next launch from the room as it sounds now
+                self.save_startup_cache(energy_threshold=self.noise.floor * self.recognizer.dynamic_energy_ratio)
             self.show_session_stats()
             print(f"\n{Colors.CYAN}{Colors.BOLD}Thank you for using {self.assistant_name}!{Colors.END}")
 
 def main():
     """Application entry point"""
+    parser = argparse.ArgumentParser(description="ARIA - Advanced Responsive Intelligence Assistant")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="overlap listening, recognition and speech on separate threads")
+    parser.add_argument("--barge-in", action="store_true",
+                        help="in pipelined mode, new speech interrupts the current response")
+    parser.add_argument("--recognizer", choices=sorted(RECOGNIZER_BACKENDS),
+                        help="speech-to-text engine (default: $ARIA_RECOGNIZER or google)")
+    parser.add_argument("--fast-start", action="store_true",
+                        help="set up voice and microphone in the background while the banner prints")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="print startup phase timings and an import-time breakdown")
+    parser.add_argument("--capture", choices=["vad", "legacy"],
+                        help="vad: frame-level voice activity endpointing (default); legacy: recognizer.listen")
+    parser.add_argument("--no-wake-word", action="store_true",
+                        help="send every phrase to the recognizer instead of waiting for the wake word")
+    parser.add_argument("--headless", action="store_true",
+                        help="no microphone or speaker: read utterances as text and report timings")
+    parser.add_argument("--input", default="-",
+                        help="with --headless: text file, JSONL corpus or - for stdin (default)")
+    parser.add_argument("--quiet", action="store_true", help="with --headless or --replay: only print the report")
+    parser.add_argument("--record", nargs="?", const="auto", metavar="PATH",
+                        help="save each phrase's audio, transcript and timings to a zip for replay "
+                             "(default: sessions/<date-time>.zip)")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="play a recorded session back offline and compare its stage latencies")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="with --replay: 1 for real time, 10 for ten times faster, 0 for no waiting")
+    parser.add_argument("--serve", type=int, metavar="PORT",
+                        help="serve many clients over HTTP instead of using the local microphone")
+    parser.add_argument("--host", default="127.0.0.1", help="with --serve: address to listen on")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on 127.0.0.1:PORT/metrics (default: $ARIA_METRICS_PORT)")
+    parser.add_argument("--trace", metavar="PATH", help="append a JSONL event per timed stage (default: $ARIA_TRACE)")
+    parser.add_argument("--profile", action="store_true",
+                        help="run the session under cProfile plus a thread sampler and print the hot spots")
+    args = parser.parse_args()
+    
+    def session():
+        if args.serve:
+            assistant = AriaAssistant(headless=True, recognizer_backend=args.recognizer,
+                                      metrics_port=args.metrics_port, trace_file=args.trace)
+            server = AriaServer(assistant)
+            server.load_engines()
+            print(f"{Colors.GREEN}ARIA serving on http://{args.host}:{args.serve} (Ctrl+C to stop){Colors.END}")
+            try:
+                asyncio.run(server.serve(args.host, args.serve))
+            except KeyboardInterrupt:
+                print(f"\n{Colors.YELLOW}Server stopped{Colors.END}")
+            finally:
+                assistant.conversation.close()
+            return
+        
+        if args.replay:
+            assistant = AriaAssistant(headless=True, metrics_port=args.metrics_port, trace_file=args.trace,
+                                      replay=args.replay, replay_speed=args.replay_speed)
+            print_replay_report(assistant.run_replay(quiet=args.quiet))
+            assistant.conversation.close()
+            return
+        
+        if args.headless:
+            assistant = AriaAssistant(headless=True, metrics_port=args.metrics_port, trace_file=args.trace)
+            print_headless_report(assistant.run_headless(load_utterances(args.input), quiet=args.quiet))
+            if args.profile or args.trace:
+                METRICS.report()
+            return
+        
+        try:
+            assistant = AriaAssistant(pipeline=args.pipeline, barge_in=args.barge_in,
+                                      recognizer_backend=args.recognizer, fast_start=args.fast_start,
+                                      startup_profile=args.startup_profile, wake_word=not args.no_wake_word,
+                                      capture=args.capture, metrics_port=args.metrics_port, trace_file=args.trace,
+                                      record=args.record)
+            assistant.run()
+        except KeyboardInterrupt:
+            print(f"\n{Colors.YELLOW}Goodbye!{Colors.END}")
+        except Exception as e:
+            print(f"{Colors.RED}Error starting assistant: {e}{Colors.END}")
+    
     try:
-        assistant = AriaAssistant()
-        assistant.run()
-    except KeyboardInterrupt:
-        print(f"\n{Colors.YELLOW}Goodbye!{Colors.END}")
-    except Exception as e:
-        print(f"{Colors.RED}Error starting assistant: {e}{Colors.END}")
+        if args.profile:
+            profile_session(session, Path(".aria_cache"))
+        else:
+            session()
+    finally:
+        METRICS.close()
 
 if __name__ == "__main__":
     main()
-
-
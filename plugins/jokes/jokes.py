@@ -0,0 +1,20 @@
+"""
+Jokes plugin for ARIA
+Example intent plugin: plugin.json declares the intent and its phrasings,
+and this module is only imported the first time someone asks for a joke.
+"""
+
+import random
+
+JOKES = [
+    "Why do programmers prefer dark mode? Because light attracts bugs.",
+    "I told my computer I needed a break, and it said: no problem, I'll go to sleep.",
+    "Why did the developer go broke? Because he used up all his cache.",
+    "There are 10 kinds of people: those who understand binary and those who don't.",
+    "I would tell you a UDP joke, but you might not get it.",
+]
+
+
+def handle(command: str, assistant) -> tuple:
+    """Tell a random joke"""
+    return random.choice(JOKES), "happy"
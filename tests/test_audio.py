@@ -0,0 +1,77 @@
+import math
+import struct
+
+import pytest
+
+from aria_voice_assistant import AriaAssistant, EnergyVAD, NoiseFloorEstimator
+
+sr = pytest.importorskip("speech_recognition")
+
+RATE = 16000
+
+
+def tone(amplitude: float, seconds: float) -> bytes:
+    samples = int(RATE * seconds)
+    return struct.pack(f"<{samples}h", *(int(amplitude * math.sin(2 * math.pi * 220 * i / RATE)) for i in range(samples)))
+
+
+def clip(*parts: bytes):
+    return sr.AudioData(b"".join(parts), RATE, 2)
+
+
+@pytest.fixture(scope="module")
+def assistant():
+    assistant = AriaAssistant(headless=True)
+    assistant.noise = NoiseFloorEstimator(window=50)
+    assistant.recognizer = sr.Recognizer()
+    return assistant
+
+
+def test_estimator_follows_a_louder_room():
+    noise = NoiseFloorEstimator(window=50, smoothing=0.5)
+    for _ in range(50):
+        noise.update(100.0)
+    quiet = noise.threshold
+    for _ in range(50):
+        noise.update(400.0)
+    assert noise.floor == pytest.approx(400.0, rel=0.01)
+    assert noise.threshold > quiet
+
+
+def test_estimator_ignores_short_speech():
+    noise = NoiseFloorEstimator(window=100)
+    noise.seed(100.0)
+    for level in [100.0] * 80 + [3000.0] * 20:
+        noise.update(level)
+    assert noise.floor == pytest.approx(100.0)
+
+
+def test_energy_vad_judges_onset_against_previous_threshold():
+    vad = EnergyVAD(NoiseFloorEstimator())
+    assert not vad.is_speech(tone(50, 0.03), RATE)
+    assert vad.is_speech(tone(5000, 0.03), RATE)
+
+
+def test_legacy_capture_sets_recognizer_threshold(assistant):
+    assistant.follow_noise_floor(clip(tone(300, 1.0)))
+    assert assistant.recognizer.energy_threshold == assistant.noise.threshold
+    assert assistant.noise.threshold > assistant.noise.min_threshold
+
+
+@pytest.fixture
+def speaking(assistant):
+    assistant.noise = NoiseFloorEstimator()
+    assistant.noise.seed(100.0)
+    return assistant
+
+
+def test_speaker_echo_does_not_barge_in(speaking):
+    assert not speaking.is_barge_in(clip(tone(400, 1.5)))
+
+
+def test_loud_speech_barges_in(speaking):
+    assert speaking.is_barge_in(clip(tone(400, 0.5), tone(3000, 0.6)))
+
+
+def test_short_loud_click_does_not_barge_in(speaking):
+    assert not speaking.is_barge_in(clip(tone(400, 1.0), tone(3000, 0.1)))
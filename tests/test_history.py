@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from aria_voice_assistant import AriaAssistant
+
+
+@pytest.fixture(scope="module")
+def assistant():
+    return AriaAssistant(headless=True)
+
+
+def test_reads_json_list(assistant, tmp_path):
+    path = tmp_path / "conversation_history.json"
+    path.write_text(json.dumps([{"user": "hi", "assistant": "hello"}]))
+    assert assistant.read_legacy_history(path) == [{"user": "hi", "assistant": "hello"}]
+
+
+def test_missing_file_is_empty(assistant, tmp_path):
+    assert assistant.read_legacy_history(tmp_path / "conversation_history.json") == []
+
+
+@pytest.mark.parametrize("text", ["[{", '{"user": "hi"}', "\xff"])
+def test_unusable_json_file_is_skipped(assistant, tmp_path, capsys, text):
+    path = tmp_path / "conversation_history.json"
+    path.write_text(text, encoding="latin-1")
+    assert assistant.read_legacy_history(path) == []
+    assert "Skipping" in capsys.readouterr().out
+
+
+def test_malformed_jsonl_lines_are_skipped(assistant, tmp_path, capsys):
+    path = tmp_path / "conversation_history.jsonl"
+    path.write_text('{"user": "hi"}\n{broken\n[1, 2]\n\n{"user": "bye"}\n')
+    assert assistant.read_legacy_history(path) == [{"user": "hi"}, {"user": "bye"}]
+    assert "Skipped 2 malformed turns" in capsys.readouterr().out
@@ -0,0 +1,39 @@
+import pytest
+
+from aria_voice_assistant import CalculationError, MathDomainError, compile_spoken_math, evaluate_math
+
+
+def calculate(text: str):
+    return evaluate_math(compile_spoken_math(text))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("two plus three times four", 14),
+    ("minus 2 squared", -4),
+    ("minus 3 factorial", -6),
+    ("two to the power of three to the power of two", 512),
+    ("square root of 16", 4),
+])
+def test_evaluates(text, expected):
+    assert calculate(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "square root of minus 4",
+    "log of 0",
+    "2.5 factorial",
+    "(minus 3) factorial",
+    "(minus 8) to the power of 0.5",
+])
+def test_undefined_operations_raise_domain_error(text):
+    with pytest.raises(MathDomainError):
+        calculate(text)
+
+
+def test_domain_error_is_a_calculation_error():
+    assert issubclass(MathDomainError, CalculationError)
+
+
+def test_no_numbers():
+    with pytest.raises(CalculationError):
+        compile_spoken_math("plus times")
@@ -0,0 +1,96 @@
+import datetime
+import threading
+
+from aria_voice_assistant import ReminderScheduler, SimulatedClock, reminder_times
+
+LEAD = {"high": 15, "medium": 10, "low": 5}
+NOW = datetime.datetime(2026, 3, 2, 9, 0)
+
+
+def scheduler_at(now: datetime.datetime):
+    fired = []
+    clock = SimulatedClock(now.timestamp())
+    scheduler = ReminderScheduler(lambda key, payload: fired.append(payload["title"]), clock)
+    return scheduler, clock, fired
+
+
+def test_fires_within_lead_time():
+    scheduler, clock, fired = scheduler_at(NOW)
+    scheduler.sync(reminder_times([{"time": "10:00", "title": "Sales", "priority": "high"}], NOW, LEAD))
+    clock.advance(44 * 60)
+    assert scheduler.run_due() == 0
+    clock.advance(60)
+    assert scheduler.run_due() == 1
+    assert fired == ["Sales"]
+
+
+def test_fires_in_due_order():
+    scheduler, clock, fired = scheduler_at(NOW)
+    entries = [
+        {"time": "11:00", "title": "Lunch", "priority": "low"},
+        {"time": "10:00", "title": "Sales", "priority": "medium"},
+        {"time": "10:02", "title": "Standup", "priority": "high"},
+    ]
+    scheduler.sync(reminder_times(entries, NOW, LEAD))
+    clock.advance(3 * 60 * 60)
+    scheduler.run_due()
+    assert fired[:3] == ["Standup", "Sales", "Lunch"]
+
+
+def test_background_thread_fires_on_advance():
+    fired = threading.Event()
+    clock = SimulatedClock(NOW.timestamp())
+    scheduler = ReminderScheduler(lambda key, payload: fired.set(), clock)
+    scheduler.start()
+    try:
+        scheduler.schedule("tea", NOW.timestamp() + 60)
+        clock.advance(30)
+        assert not fired.wait(0.1)
+        clock.advance(30)
+        assert fired.wait(2)
+    finally:
+        scheduler.stop()
+
+
+def test_sync_cancels_removed_entries():
+    scheduler, clock, fired = scheduler_at(NOW)
+    entry = {"time": "10:00", "title": "Sales"}
+    scheduler.sync(reminder_times([entry], NOW, LEAD))
+    assert len(scheduler) == 2
+    assert scheduler.sync({}) == (0, 2)
+    clock.advance(24 * 60 * 60)
+    assert scheduler.run_due() == 0
+    assert fired == []
+
+
+def test_sync_rearms_moved_entry_only():
+    scheduler, clock, fired = scheduler_at(NOW)
+    scheduler.sync(reminder_times([{"time": "10:00", "title": "Sales"}], NOW, LEAD))
+    clock.advance(50 * 60)
+    assert scheduler.run_due() == 1
+    # Syncing the unchanged schedule again does not repeat a spoken reminder
+    assert scheduler.sync(reminder_times([{"time": "10:00", "title": "Sales"}], NOW, LEAD)) == (0, 0)
+    # A new priority moves the due time, so the spoken reminder is armed again
+    moved = reminder_times([{"time": "10:00", "title": "Sales", "priority": "low"}], NOW, LEAD)
+    assert scheduler.sync(moved) == (2, 0)
+    clock.advance(5 * 60)
+    assert scheduler.run_due() == 1
+    assert fired == ["Sales", "Sales"]
+
+
+def test_reminder_times_skips_malformed_entries():
+    entries = [
+        {"time": "25:00", "title": "Bad hour"},
+        {"time": "10:75", "title": "Bad minute"},
+        {"time": "noon", "title": "Not a time"},
+        {"title": "No time"},
+        {"time": "10:00", "date": "someday", "title": "Bad date"},
+        {"time": "10:00", "title": "Sales"},
+    ]
+    wanted = reminder_times(entries, NOW, LEAD)
+    assert {payload["title"] for _, payload in wanted.values()} == {"Sales"}
+
+
+def test_reminder_times_skips_past_entries():
+    wanted = reminder_times([{"time": "08:00", "date": "2026-03-02", "title": "Breakfast"}], NOW, LEAD)
+    assert wanted == {}
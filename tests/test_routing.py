@@ -0,0 +1,36 @@
+import pytest
+
+from aria_voice_assistant import AriaAssistant, IntentRouter
+
+
+@pytest.fixture(scope="module")
+def router():
+    return AriaAssistant(headless=True).router
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("stop", "Exit"),
+    ("stop it", "Exit"),
+    ("please stop listening", "Exit"),
+    ("stop the song", "Media"),
+    ("what time is it", "Time & Date"),
+])
+def test_routes(router, text, intent):
+    assert router.best(text) == intent
+
+
+@pytest.mark.parametrize("text", ["remind me to stop", "stop the timer"])
+def test_stop_inside_a_longer_request_is_not_exit(router, text):
+    assert router.best(text) != "Exit"
+
+
+def test_keywords_match_on_word_boundaries():
+    router = IntentRouter({"Time": ["time"], "Weather": ["weather"]})
+    assert router.best("sometimes") is None
+    assert router.best("what's the weather this time") == "Time"
+
+
+def test_longer_phrase_outscores_its_prefix():
+    router = IntentRouter({"Music": ["play"], "Radio": ["play radio"]})
+    assert router.best("play radio") == "Radio"
+    assert router.best("play something") == "Music"
@@ -0,0 +1,99 @@
+import io
+import json
+import urllib.error
+import urllib.request
+import wave
+
+import pytest
+
+from aria_voice_assistant import AriaAssistant, AriaServer, ConversationLog
+
+sr = pytest.importorskip("speech_recognition")
+
+
+class FailingBackend:
+    name = "failing"
+
+    def __init__(self):
+        self.recognizer = sr.Recognizer()
+        self.error = sr.UnknownValueError()
+
+    def recognize(self, audio):
+        raise self.error
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    assistant = AriaAssistant(headless=True)
+    assistant.conversation = ConversationLog(tmp_path_factory.mktemp("history"))
+    server = AriaServer(assistant)
+    port = server.start_background()
+    server.recognition_backend = FailingBackend()
+    yield server, f"http://127.0.0.1:{port}"
+    server.stop()
+
+
+def post(url: str, body: bytes):
+    request = urllib.request.Request(url, data=body, method="POST")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.fixture
+def session(server):
+    _, base = server
+    status, body = post(f"{base}/sessions", b"{}")
+    assert status == 201
+    return f"{base}/sessions/{body['session_id']}"
+
+
+def silence() -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(b"\0" * 32000)
+    return buffer.getvalue()
+
+
+def test_text_turn(session):
+    status, body = post(f"{session}/text", b'{"text": "what time is it"}')
+    assert status == 200
+    assert body["intent"] == "Time & Date"
+
+
+@pytest.mark.parametrize("body", [b"{bad", b"[1]", b'"text"', b'{"text": 5}', b"{}"])
+def test_unparseable_text_request_is_400(session, body):
+    status, reply = post(f"{session}/text", body)
+    assert status == 400
+    assert "error" in reply
+
+
+@pytest.mark.parametrize("body", [b"[]", b'{"user_name": 5}', b'{"preferences": []}'])
+def test_invalid_session_request_is_400(server, body):
+    _, base = server
+    assert post(f"{base}/sessions", body)[0] == 400
+
+
+def test_new_session_does_not_inherit_local_preferences(server, session):
+    with urllib.request.urlopen(session) as response:
+        state = json.loads(response.read())
+    assert state["preferences"] == {}
+
+
+def test_unreadable_audio_is_400(session):
+    assert post(f"{session}/audio", b"not a wav")[0] == 400
+
+
+def test_unintelligible_audio_is_422(server, session):
+    server[0].recognition_backend.error = sr.UnknownValueError()
+    assert post(f"{session}/audio", silence()) == (422, {"error": "could not understand audio"})
+
+
+def test_recognizer_outage_is_502(server, session):
+    server[0].recognition_backend.error = sr.RequestError("down")
+    assert post(f"{session}/audio", silence())[0] == 502
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from aria_voice_assistant import DataStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DataStore(tmp_path / "aria.db", tmp_path / "schedule.json", tmp_path / "contacts.json")
+    yield store
+    store.close()
+
+
+def write(path, data):
+    path.write_text(json.dumps(data))
+
+
+def test_imports_valid_files(store):
+    write(store.schedule_path, [{"time": "10:00", "title": "Sales"}])
+    write(store.contacts_path, {"egi": {"name": "Egi", "phone": "1"}})
+    assert store.refresh() == {"schedule", "contacts"}
+    assert [entry["title"] for entry in store.all_schedule()] == ["Sales"]
+    assert list(store.all_contacts()) == ["egi"]
+
+
+def test_skips_malformed_entries(store):
+    write(store.schedule_path, [{"time": "10:00", "title": "Sales"}, "lunch", {"title": {"nested": 1}}])
+    write(store.contacts_path, {"egi": {"name": "Egi"}, "bad": ["Bob"], "worse": {"name": 5}})
+    store.refresh()
+    assert [entry["title"] for entry in store.all_schedule()] == ["Sales"]
+    assert list(store.all_contacts()) == ["egi"]
+
+
+def test_wrong_shape_keeps_previous_data(store):
+    write(store.schedule_path, [{"time": "10:00", "title": "Sales"}])
+    write(store.contacts_path, {"egi": {"name": "Egi"}})
+    store.refresh()
+    write(store.schedule_path, {"time": "10:00"})
+    write(store.contacts_path, [{"name": "Egi"}])
+    assert store.refresh() == set()
+    assert [entry["title"] for entry in store.all_schedule()] == ["Sales"]
+    assert list(store.all_contacts()) == ["egi"]
+
+
+def test_invalid_json_is_reported_once(store, capsys):
+    store.schedule_path.write_text("[{")
+    store.refresh()
+    store.refresh()
+    assert capsys.readouterr().out.count("Could not read") == 1
@@ -0,0 +1,45 @@
+import threading
+
+import pytest
+
+import aria_voice_assistant
+from aria_voice_assistant import AriaAssistant, NullTTS
+
+
+class RecordingEngine(NullTTS):
+    """pyttsx3 stand-in that records which threads touch it"""
+
+    def __init__(self):
+        self.threads = set()
+        self.spoken = []
+
+    def __getattribute__(self, name):
+        if not name.startswith("__") and name not in ("threads", "spoken"):
+            object.__getattribute__(self, "threads").add(threading.current_thread().name)
+        return object.__getattribute__(self, name)
+
+    def connect(self, topic, callback):
+        pass
+
+    def getProperty(self, name):
+        return [] if name == "voices" else "voice"
+
+    def say(self, text):
+        self.spoken.append(text)
+
+
+@pytest.fixture
+def assistant(monkeypatch):
+    monkeypatch.setattr(aria_voice_assistant, "TTS_AVAILABLE", True)
+    monkeypatch.setattr(aria_voice_assistant, "pyttsx3", type("pyttsx3", (), {"init": RecordingEngine}))
+    assistant = AriaAssistant(headless=True)
+    monkeypatch.setattr(assistant, "save_startup_cache", lambda **fields: None)
+    assistant.setup_text_to_speech()
+    return assistant
+
+
+def test_engine_is_only_used_on_the_tts_worker(assistant):
+    assistant.speak("First sentence. Second sentence. Third one.")
+    assistant.tts_worker.submit(lambda: None).result()
+    assert assistant.tts.threads == {"aria-tts_0"}
+    assert assistant.tts.spoken == ["First sentence.", "Second sentence.", "Third one."]